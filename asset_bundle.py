@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import sys
+import json
+import mmap
+import struct
+from pathlib import Path
+from PyQt5.QtGui import QIcon, QIconEngine, QPixmap, QPainter
+from PyQt5.QtSvg import QSvgRenderer
+from PyQt5.QtCore import Qt, QByteArray, QRectF, QRect, QPoint
+from PyQt5 import QtWidgets
+
+ROOT_DIR = Path(__file__).parent
+BUNDLE_FILE = ROOT_DIR / 'assets.bundle'
+ICONS_DIR = ROOT_DIR / 'icons'
+STYLE_SHEET_DIR = ROOT_DIR / 'stylesheets'
+# Magic and format version of the bundle file, a bundle of another version is ignored:
+BUNDLE_MAGIC = b'MMAB\x03'
+INDEX_LENGTH_FORMAT = '<I'
+
+# Placeholders in the stylesheets, which are replaced by the absolute paths of the icons (relative to ROOT_DIR) when
+# the bundle is built or, without a bundle, when the stylesheet is read:
+STYLE_SHEET_PLACEHOLDERS = {
+    'main_settings.stylesheet': (
+        ('unchecked_icon_file', Path('icons') / 'radio_unchecked.svg'),
+        ('checked_icon_file', Path('icons') / 'radio_checked.svg'),
+                                 ),
+                            }
+
+
+def resolve_style_sheet(file_name, style_sheet):
+    """Replaces the placeholders of the stylesheet with the given file name by the absolute paths of the related icons.
+    Returns the resolved stylesheet string.
+    """
+    for placeholder, icon_file in STYLE_SHEET_PLACEHOLDERS.get(file_name, ()):
+        style_sheet = style_sheet.replace(placeholder, str(ROOT_DIR / icon_file))
+    return style_sheet
+
+
+def build_bundle(bundle_file=BUNDLE_FILE):
+    """Packs all stylesheets (with resolved placeholders) and all icons into one indexed bundle file.
+    Layout: magic, length of the index, json index {'root': ROOT_DIR the icon paths of the stylesheets point to,
+    'assets': {name: (offset, length)}}, data of all assets.
+    The bundle isn't checked against the single files at launch, it has to be built again after changing an asset.
+    Returns the number of packed assets.
+    """
+    blob_list = []
+    index_dict = {}
+    offset = 0
+    for style_sheet_file in sorted(STYLE_SHEET_DIR.glob('*.stylesheet')):
+        data = resolve_style_sheet(style_sheet_file.name, style_sheet_file.read_text('utf-8')).encode('utf-8')
+        index_dict[style_sheet_file.relative_to(ROOT_DIR).as_posix()] = (offset, len(data))
+        blob_list.append(data)
+        offset += len(data)
+    for icon_file in sorted(ICONS_DIR.rglob('*.svg')):
+        data = icon_file.read_bytes()
+        index_dict[icon_file.relative_to(ROOT_DIR).as_posix()] = (offset, len(data))
+        blob_list.append(data)
+        offset += len(data)
+
+    index = json.dumps({'root': str(ROOT_DIR), 'assets': index_dict}, separators=(',', ':')).encode('utf-8')
+    temp_file = bundle_file.with_suffix('.tmp')
+    with temp_file.open('wb') as bundle:
+        bundle.write(BUNDLE_MAGIC)
+        bundle.write(struct.pack(INDEX_LENGTH_FORMAT, len(index)))
+        bundle.write(index)
+        for data in blob_list:
+            bundle.write(data)
+    temp_file.replace(bundle_file)
+    return len(index_dict)
+
+
+class SvgIconEngine(QIconEngine):
+    """Icon engine rendering svg data held in memory, so icons from the bundle stay sharp at every size.
+    """
+    def __init__(self, svg_data):
+        super().__init__()
+        self.svg_data = svg_data
+        self.renderer = None
+
+    def get_renderer(self):
+        """Returns the svg renderer. Parses the svg data on first use.
+        """
+        if self.renderer is None:
+            self.renderer = QSvgRenderer(QByteArray(self.svg_data))
+        return self.renderer
+
+    def actualSize(self, size, mode, state):
+        return self.get_renderer().defaultSize().scaled(size, Qt.KeepAspectRatio)
+
+    def paint(self, painter, rect, mode, state):
+        self.get_renderer().render(painter, QRectF(rect))
+
+    def pixmap(self, size, mode, state):
+        actual_size = self.actualSize(size, mode, state)
+        pixmap = QPixmap(actual_size)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        self.paint(painter, QRect(QPoint(0, 0), actual_size), mode, state)
+        painter.end()
+        if mode == QIcon.Disabled and QtWidgets.QApplication.instance():
+            pixmap = QtWidgets.QApplication.style().generatedIconPixmap(mode, pixmap, QtWidgets.QStyleOption())
+        return pixmap
+
+    def clone(self):
+        return SvgIconEngine(self.svg_data)
+
+
+class AssetBundle(object):
+    """Read access to the stylesheets and icons. Maps the bundle file built by 'build_bundle' into memory, if it
+    exists, and reads the assets from there. Falls back to the single files otherwise, also if the bundle is corrupt or
+    was built in another MultiMon directory.
+    """
+    def __init__(self, bundle_file=BUNDLE_FILE):
+        self.mapped_bundle = None
+        self.index_dict = {}
+        self.data_offset = 0
+        try:
+            with open(bundle_file, 'rb') as bundle:
+                self.mapped_bundle = mmap.mmap(bundle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        try:
+            self.index_dict, self.data_offset = self.read_index()
+        except (struct.error, ValueError, KeyError, TypeError):
+            self.index_dict, self.data_offset = {}, 0
+        if not self.index_dict:
+            self.mapped_bundle.close()
+            self.mapped_bundle = None
+
+    def read_index(self):
+        """Returns a tuple (index {name: (offset, length)}, offset of the data) of the mapped bundle. Returns an empty
+        index, if the bundle has another format or was built in another MultiMon directory.
+        Raises struct.error, ValueError, KeyError or TypeError, if the bundle is corrupt.
+        """
+        header_length = len(BUNDLE_MAGIC) + struct.calcsize(INDEX_LENGTH_FORMAT)
+        if self.mapped_bundle[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            return {}, 0
+        index_length, = struct.unpack(INDEX_LENGTH_FORMAT, self.mapped_bundle[len(BUNDLE_MAGIC):header_length])
+        if header_length + index_length > len(self.mapped_bundle):
+            raise ValueError('Truncated bundle index.')
+        index = json.loads(self.mapped_bundle[header_length:header_length + index_length])
+        if index['root'] != str(ROOT_DIR):
+            return {}, 0
+        data_length = len(self.mapped_bundle) - header_length - index_length
+        if any(offset + length > data_length for offset, length in index['assets'].values()):
+            raise ValueError('Truncated bundle data.')
+        return index['assets'], header_length + index_length
+
+    @staticmethod
+    def get_asset_name(path):
+        """Returns the name of the asset in the bundle index for the given path (absolute or relative to the
+        MultiMon directory).
+        """
+        path = Path(path)
+        if path.is_absolute():
+            path = path.relative_to(ROOT_DIR)
+        return path.as_posix()
+
+    def read(self, path):
+        """Returns the content of the asset with the given path as bytes. Stylesheets are returned with resolved
+        placeholders.
+        """
+        name = self.get_asset_name(path)
+        if name in self.index_dict:
+            offset, length = self.index_dict[name]
+            start = self.data_offset + offset
+            return self.mapped_bundle[start:start + length]
+        data = (ROOT_DIR / name).read_bytes()
+        if name.endswith('.stylesheet'):
+            data = resolve_style_sheet(Path(name).name, data.decode('utf-8')).encode('utf-8')
+        return data
+
+    def style_sheet(self, file_name):
+        """Returns the stylesheet with the given file name with all icon paths resolved.
+        """
+        return self.read(STYLE_SHEET_DIR / file_name).decode('utf-8')
+
+    def icon(self, path):
+        """Returns a QIcon for the svg icon with the given path.
+        """
+        return QIcon(SvgIconEngine(self.read(path)))
+
+
+ASSETS = AssetBundle()
+
+
+def main():
+    bundle_file = Path(sys.argv[1]) if len(sys.argv) > 1 else BUNDLE_FILE
+    asset_count = build_bundle(bundle_file)
+    print(f'Packed {asset_count} assets into {bundle_file}')
+
+
+if __name__ == '__main__':
+    main()
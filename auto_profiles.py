@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import sys
+import json
+import time
+import select
+import randr
+from switch_queue import SwitchQueue
+from config_store import CONFIG_DIR
+
+PROFILES_FILE = CONFIG_DIR / 'auto_profiles.json'
+# Seconds without RandR events before a profile is applied, to wait out EDID flapping while docking:
+DEBOUNCE_SECONDS = 2.0
+# Seconds between two RandR state checks, if python-xlib isn't installed:
+POLL_SECONDS = 3.0
+
+
+def get_fingerprint_key(fingerprint):
+    """Returns the key of the profile store for the given output fingerprint {port: edid_hash}.
+    """
+    return '|'.join(f'{port}={edid_hash}' for port, edid_hash in sorted(fingerprint.items()))
+
+
+class ProfileStore(object):
+    """The last chosen mode for each set of connected monitors, fingerprinted by the ports and EDID hashes.
+    Every profile holds the mode label and the screen tuples (port, resolution, rate, screen type) it was chosen with.
+    """
+    def __init__(self, profiles_file=PROFILES_FILE):
+        self.profiles_file = profiles_file
+        self.profile_dict = {}
+        self.modification_time = None
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        """Reloads the profiles from the profiles file, if it changed since it was read the last time.
+        """
+        try:
+            modification_time = self.profiles_file.stat().st_mtime_ns
+        except OSError:
+            modification_time = None
+        if modification_time == self.modification_time:
+            return
+        self.modification_time = modification_time
+        try:
+            with self.profiles_file.open('r') as profiles_file:
+                self.profile_dict = json.load(profiles_file)
+        except (OSError, ValueError):
+            self.profile_dict = {}
+
+    def get_profile(self, fingerprint):
+        """Returns the profile {'mode': mode, 'screens': screen tuples} for the given output fingerprint.
+        Returns None, if there is no profile for the fingerprint.
+        """
+        return self.profile_dict.get(get_fingerprint_key(fingerprint))
+
+    def set_profile(self, fingerprint, mode, tuples_all_screens):
+        """Saves the given mode and screen tuples as profile for the given output fingerprint.
+        """
+        profile = {'mode': mode, 'screens': [list(tuple_screen) for tuple_screen in tuples_all_screens]}
+        key = get_fingerprint_key(fingerprint)
+        if self.profile_dict.get(key) == profile:
+            return
+        self.profile_dict[key] = profile
+        temp_file = self.profiles_file.with_suffix('.tmp')
+        with temp_file.open('w') as profiles_file:
+            json.dump(self.profile_dict, profiles_file, indent=1)
+        temp_file.replace(self.profiles_file)
+        self.modification_time = self.profiles_file.stat().st_mtime_ns
+
+
+def remember_mode(mode, tuples_all_screens, display_name=None):
+    """Saves the given mode and screen tuples as profile for the monitors currently connected to the given X display
+    (default: $DISPLAY).
+    """
+    try:
+        ProfileStore().set_profile(randr.get_output_fingerprint(display_name=display_name), mode, tuples_all_screens)
+    except OSError as error:
+        print(f'Could not save the auto profile: {error}')
+
+
+def apply_profile(profile, display_name=None):
+    """Changes the given X display (default: $DISPLAY) into the mode of the given profile. Returns the SwitchResult of
+    the mode change.
+    """
+    from multi_mon import ScreenSetup
+    screen_setup = ScreenSetup(*(tuple(tuple_screen) for tuple_screen in profile['screens']),
+                               display_name=display_name)
+    return screen_setup.switch_to_mode(profile['mode'])
+
+
+class HotplugWatcher(object):
+    """Applies the remembered mode of the connected monitors after docking. Listens to RandR events over one
+    python-xlib connection and reads the output fingerprint from the RandR state of the X server, so there is no
+    Xrandr call and no output probing before the modeset itself. Polls 'xrandr --current' if python-xlib isn't
+    installed.
+    """
+    def __init__(self, profile_store=None, debounce_seconds=DEBOUNCE_SECONDS):
+        self.profile_store = profile_store or ProfileStore()
+        self.debounce_seconds = debounce_seconds
+        self.display = randr.open_x_display()
+        self.last_fingerprint_key = None
+
+    def get_fingerprint(self):
+        """Returns the output fingerprint {port: edid_hash} of the connected monitors.
+        """
+        if self.display is None:
+            return randr.get_output_fingerprint()
+        return randr.get_output_fingerprint_xlib(self.display)
+
+    def check_profile(self):
+        """Applies the profile of the connected monitors, if they changed since the last check and a profile exists.
+        """
+        fingerprint = self.get_fingerprint()
+        fingerprint_key = get_fingerprint_key(fingerprint)
+        if fingerprint_key == self.last_fingerprint_key:
+            return
+        self.last_fingerprint_key = fingerprint_key
+        self.profile_store.reload_if_changed()
+        profile = self.profile_store.get_profile(fingerprint)
+        if profile is not None:
+            SwitchQueue().submit(profile['mode'], profile['screens'])
+
+    def wait_for_quiet(self):
+        """Discards RandR events until no new event arrived for the debounce time.
+        """
+        while True:
+            while self.display.pending_events():
+                self.display.next_event()
+            readable, _, _ = select.select([self.display], [], [], self.debounce_seconds)
+            if not readable:
+                return
+
+    def run(self):
+        """Watches for docking and undocking until interrupted.
+        """
+        self.last_fingerprint_key = get_fingerprint_key(self.get_fingerprint())
+        if self.display is None:
+            while True:
+                time.sleep(POLL_SECONDS)
+                self.check_profile()
+        from Xlib.ext import randr as xlib_randr
+        self.display.screen().root.xrandr_select_input(
+            xlib_randr.RRScreenChangeNotifyMask | xlib_randr.RROutputChangeNotifyMask |
+            xlib_randr.RROutputPropertyNotifyMask
+                                                       )
+        while True:
+            self.display.next_event()
+            self.wait_for_quiet()
+            self.check_profile()
+
+
+def main():
+    watcher = HotplugWatcher()
+    if watcher.display is None:
+        print('python-xlib not found, polling the RandR state instead of listening to hotplug events.')
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
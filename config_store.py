@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import io
+import fcntl
+import tempfile
+import configparser
+from pathlib import Path
+
+# Directory of the conf file and the caches, can be replaced with the environment variable MULTI_MON_CONFIG_DIR, e.g.
+# to run tests and benchmarks without touching the conf file of the user:
+CONFIG_DIR = Path(os.environ.get('MULTI_MON_CONFIG_DIR') or Path(__file__).parent)
+CONF_FILE = CONFIG_DIR / 'multi_mon_conf.conf'
+# First line of the conf file, carrying the generation number increased by every write:
+GENERATION_PREFIX = '# generation = '
+
+
+def get_generation(conf_file=CONF_FILE):
+    """Returns the generation number of the given conf file by reading its first line only. Returns 0 for a conf file
+    without generation and -1, if there is no readable conf file.
+    """
+    try:
+        with open(conf_file, 'r') as conf:
+            first_line = conf.readline()
+    except OSError:
+        return -1
+    if first_line.startswith(GENERATION_PREFIX):
+        try:
+            return int(first_line[len(GENERATION_PREFIX):])
+        except ValueError:
+            pass
+    return 0
+
+
+def read_config(conf_file=CONF_FILE):
+    """Returns a config parser with the content of the given conf file. It is empty, if there is no conf file.
+    Needs no lock, because the conf file is only ever replaced as a whole.
+    """
+    config = configparser.ConfigParser()
+    config.read(conf_file)
+    return config
+
+
+def write_config(config, conf_file=CONF_FILE):
+    """Writes the given config parser to the given conf file atomically with the next generation number: writes a
+    temp file next to it and renames it over the conf file, so readers see either the old or the new file.
+    Writers are serialized with a lock file. Returns the new generation number.
+    """
+    conf_file = Path(conf_file)
+    with open(conf_file.with_name(f'{conf_file.name}.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        generation = max(get_generation(conf_file), 0) + 1
+        content = io.StringIO()
+        config.write(content)
+        file_descriptor, temp_file = tempfile.mkstemp(dir=conf_file.parent, prefix=f'{conf_file.name}.')
+        try:
+            with os.fdopen(file_descriptor, 'w') as conf:
+                conf.write(f'{GENERATION_PREFIX}{generation}\n')
+                conf.write(content.getvalue())
+                conf.flush()
+                os.fsync(conf.fileno())
+            os.chmod(temp_file, 0o644)
+            os.replace(temp_file, conf_file)
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.unlink(temp_file)
+            raise
+    return generation
+
+
+class ConfigCache(object):
+    """The config parser of a conf file for long running processes. Rereads the conf file only, if its generation
+    number changed.
+    """
+    def __init__(self, conf_file=CONF_FILE):
+        self.conf_file = conf_file
+        self.generation = None
+        self.config = None
+
+    def is_changed(self):
+        """Returns True, if the conf file changed since it was read the last time.
+        """
+        return get_generation(self.conf_file) != self.generation
+
+    def get_config(self):
+        """Returns the config parser of the conf file. Rereads the conf file, if it changed.
+        """
+        generation = get_generation(self.conf_file)
+        if generation != self.generation or self.config is None:
+            self.config = read_config(self.conf_file)
+            self.generation = generation
+        return self.config
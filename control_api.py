@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import sys
+import json
+import queue
+import socket
+import inspect
+import functools
+import selectors
+import threading
+import randr
+import auto_profiles
+from switch_queue import SwitchQueue, FileLock, get_runtime_file
+from config_store import ConfigCache
+
+SOCKET_NAME = 'control.sock'
+# JSON-RPC 2.0 error codes:
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SWITCH_FAILED = -32000
+
+
+class ControlError(Exception):
+    """Raised by the ControlClient, if the control server answered a call with an error.
+    """
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class ControlServer(object):
+    """JSON-RPC 2.0 server on a Unix socket in the runtime directory of the user, one per X display. Requests and
+    responses are JSON values separated by newlines, a JSON array is a batch. All responses to the requests of one read
+    are sent in one write.
+    Methods: list_modes, current_mode, switch(mode), undo and subscribe(changes). Subscribed clients get a
+    'mode_changed' notification whenever the mode changes.
+    'switch' and 'undo' are answered at once with {'queued': True}. A worker thread runs them one after the other
+    through the switch queue, so a slow mode change doesn't hold up the other clients. Their outcome is sent as
+    'switch_finished' notification to the requesting client and the subscribed clients.
+    Keeps one python-xlib connection to the X server open to listen to RandR events and reuses the RandR state until it
+    changes. Reads the RandR state for every request, if python-xlib isn't installed.
+    Reads and changes the given X display (default: $DISPLAY).
+    """
+    def __init__(self, display_name=None):
+        self.config_cache = ConfigCache()
+        self.display_name = display_name
+        self.socket_file = get_runtime_file(SOCKET_NAME, display_name)
+        self.server_lock = FileLock('control.lock', display_name)
+        self.switch_queue = SwitchQueue(display_name)
+        self.display = randr.open_x_display(display_name)
+        self.selector = selectors.DefaultSelector()
+        self.server_socket = None
+        self.client_dict = {}
+        self.screen_setup = None
+        self.randr_state = None
+        self.current_mode = None
+        self.job_queue = queue.Queue()
+        self.finished_queue = queue.Queue()
+        self.switch_count = 0
+        self.worker_thread = None
+        self.wakeup_socket = None
+        self.worker_wakeup_socket = None
+        self.method_dict = {
+            'list_modes': self.list_modes,
+            'current_mode': self.get_current_mode,
+            'switch': self.switch,
+            'undo': self.undo,
+            'subscribe': self.subscribe
+                            }
+
+    def get_screen_setup(self):
+        """Returns the ScreenSetup of the conf file. Reloads the conf file, if its generation changed since it was read
+        the last time. Returns None, if there is no valid conf file.
+        """
+        from multi_mon import ScreenSetup, load_screen_config
+        if self.config_cache.is_changed() or self.screen_setup is None:
+            config = self.config_cache.get_config()
+            try:
+                self.screen_setup = ScreenSetup(*load_screen_config(config), config=config,
+                                                display_name=self.display_name)
+            except (KeyError, ValueError):
+                self.screen_setup = None
+        return self.screen_setup
+
+    def get_randr_state(self):
+        """Returns the current RandR state. Reuses the last state, as long as no RandR event arrived.
+        """
+        if self.randr_state is None or self.display is None:
+            self.randr_state = randr.get_randr_state(self.display_name)
+        return self.randr_state
+
+    def update_current_mode(self):
+        """Reads the current mode from the RandR state and notifies all subscribed clients, if it changed.
+        """
+        screen_setup = self.get_screen_setup()
+        mode = screen_setup.get_mode_from_randr_state(self.get_randr_state()) if screen_setup else None
+        if mode != self.current_mode:
+            self.current_mode = mode
+            notification = self.encode({'jsonrpc': '2.0', 'method': 'mode_changed', 'params': {'mode': mode}})
+            for client_socket, client in tuple(self.client_dict.items()):
+                if client['subscribed']:
+                    self.send(client_socket, notification)
+
+    def list_modes(self):
+        """Returns a list of dicts {'mode': label, 'description': description} of all modes possible with the
+        screen setup.
+        """
+        from multi_mon import MODE_TUPLE, MODE_TOOL_TIP_TUPLE
+        description_dict = dict(zip(MODE_TUPLE, MODE_TOOL_TIP_TUPLE))
+        screen_setup = self.get_screen_setup()
+        if screen_setup is None:
+            return []
+        return [{'mode': mode, 'description': description_dict[mode]} for mode in screen_setup.get_possible_modes()]
+
+    def get_current_mode(self):
+        """Returns a dict {'mode': label} of the current mode. The label is None, if no mode of the screen setup
+        matches.
+        """
+        if self.display is None:
+            self.update_current_mode()
+        return {'mode': self.current_mode}
+
+    def switch(self, mode, client_socket=None):
+        """Queues the change into the mode with the given label for the worker thread (see 'run_switch').
+        Returns a dict {'mode': label, 'queued': True}. Raises ControlError, if the mode isn't possible.
+        """
+        screen_setup = self.get_screen_setup()
+        if screen_setup is None:
+            raise ControlError(SWITCH_FAILED, 'No configuration file found.')
+        if mode not in screen_setup.get_possible_modes():
+            raise ControlError(INVALID_PARAMS, f'The mode {mode} isn\'t possible with the screen setup.')
+        self.switch_count += 1
+        job = functools.partial(self.run_switch, self.switch_count, mode, screen_setup.tuples_all_screens)
+        self.job_queue.put((client_socket, 'switch', mode, job))
+        return {'mode': mode, 'queued': True}
+
+    def run_switch(self, switch_nr, mode, tuples_all_screens):
+        """Changes into the mode with the given label and screen tuples through the switch queue and remembers it as
+        auto profile. Leaves out the switch, if a later one was requested in the meantime. Runs in the worker thread.
+        Returns the SwitchResult or None, if the switch was left out or handed over to the switch in progress.
+        """
+        if switch_nr != self.switch_count:
+            return None
+        switch_result = self.switch_queue.submit(mode, tuples_all_screens)
+        if switch_result:
+            auto_profiles.remember_mode(mode, tuples_all_screens, self.display_name)
+        return switch_result
+
+    def undo(self, client_socket=None):
+        """Queues the restore of the RandR state saved before the last switch for the worker thread.
+        Returns a dict {'queued': True}. Raises ControlError, if there is nothing to undo.
+        """
+        from snapshot import load_snapshot, undo_last_switch
+        if load_snapshot(self.display_name) is None:
+            raise ControlError(SWITCH_FAILED, 'No switch to undo.')
+        self.job_queue.put((client_socket, 'undo', None, functools.partial(undo_last_switch, self.display_name)))
+        return {'queued': True}
+
+    def run_jobs(self):
+        """Runs the queued switches (tuples (client socket, method, mode label, function returning a SwitchResult)) one
+        after the other and hands their outcome over to the server loop. Stops at None. Runs in the worker thread.
+        """
+        for client_socket, method, mode, job in iter(self.job_queue.get, None):
+            try:
+                switch_result = job()
+            except Exception as error:
+                params = {'queued': False, 'success': False, 'error': f'Internal error: {error!r}', 'duration': None}
+            else:
+                params = {'queued': switch_result is None, 'success': bool(switch_result),
+                          'error': '' if switch_result is None or switch_result else str(switch_result),
+                          'duration': None if switch_result is None else switch_result.duration}
+            self.finished_queue.put((client_socket, {'method': method, 'mode': mode, **params}))
+            try:
+                self.worker_wakeup_socket.send(b'\0')
+            except OSError:
+                pass
+
+    def read_finished_jobs(self, _):
+        """Rereads the RandR state after queued switches finished and sends their 'switch_finished' notifications to
+        the requesting clients and the subscribed clients.
+        """
+        self.wakeup_socket.recv(4096)
+        self.randr_state = None
+        try:
+            self.update_current_mode()
+        except Exception as error:
+            print(f'Could not read the current mode: {error!r}')
+        while not self.finished_queue.empty():
+            requesting_socket, params = self.finished_queue.get()
+            if params['mode'] is None:
+                params['mode'] = self.current_mode
+            notification = self.encode({'jsonrpc': '2.0', 'method': 'switch_finished', 'params': params})
+            for client_socket, client in tuple(self.client_dict.items()):
+                if client['subscribed'] or client_socket is requesting_socket:
+                    self.send(client_socket, notification)
+
+    def subscribe(self, changes=True, client_socket=None):
+        """Subscribes the client to 'mode_changed' notifications or unsubscribes it, if changes is False.
+        Returns a dict {'subscribed': bool, 'mode': label of the current mode}.
+        """
+        self.client_dict[client_socket]['subscribed'] = bool(changes)
+        return {'subscribed': bool(changes), **self.get_current_mode()}
+
+    def get_client_methods(self):
+        """Returns a tuple of the methods, which get the socket of the requesting client as parameter 'client_socket'.
+        """
+        return self.subscribe, self.switch, self.undo
+
+    def handle_request(self, request, client_socket):
+        """Runs a single JSON-RPC request. Returns the response dict or None, if the request is a notification.
+        """
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': INVALID_REQUEST, 'message': 'Invalid request.'}}
+        request_id = request.get('id')
+        method = self.method_dict.get(request['method'])
+        params = request.get('params', {})
+        try:
+            if method is None:
+                raise ControlError(METHOD_NOT_FOUND, f'Unknown method {request["method"]}.')
+            if not isinstance(params, (list, dict)):
+                raise ControlError(INVALID_PARAMS, 'Params have to be an object or an array.')
+            server_params = {'client_socket': client_socket} if method in self.get_client_methods() else {}
+            try:
+                if isinstance(params, list):
+                    bound_arguments = inspect.signature(method).bind(*params, **server_params)
+                else:
+                    bound_arguments = inspect.signature(method).bind(**{**params, **server_params})
+            except TypeError as error:
+                raise ControlError(INVALID_PARAMS, str(error))
+            # an error of a method mustn't stop the server:
+            #
+            try:
+                result = method(*bound_arguments.args, **bound_arguments.kwargs)
+            except ControlError:
+                raise
+            except Exception as error:
+                raise ControlError(INTERNAL_ERROR, f'Internal error: {error!r}')
+        except ControlError as error:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': error.code, 'message': str(error)}}
+        else:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+        return response if 'id' in request else None
+
+    def handle_line(self, line, client_socket):
+        """Runs the request or batch of requests in the given line. Returns the response or list of responses,
+        or None if there is nothing to answer.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': PARSE_ERROR, 'message': 'Parse error.'}}
+        if not isinstance(request, list):
+            return self.handle_request(request, client_socket)
+        if not request:
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': INVALID_REQUEST, 'message': 'Empty batch.'}}
+        response_list = [self.handle_request(single_request, client_socket) for single_request in request]
+        return [response for response in response_list if response is not None] or None
+
+    @staticmethod
+    def encode(message):
+        """Returns the given message as newline terminated JSON bytes.
+        """
+        return json.dumps(message).encode('utf-8') + b'\n'
+
+    def send(self, client_socket, data):
+        """Sends the given bytes to the client. Closes the connection, if the client is gone.
+        """
+        try:
+            client_socket.sendall(data)
+        except OSError:
+            self.close_client(client_socket)
+
+    def close_client(self, client_socket):
+        """Closes the connection to the given client.
+        """
+        if self.client_dict.pop(client_socket, None) is not None:
+            self.selector.unregister(client_socket)
+            client_socket.close()
+
+    def accept_client(self):
+        """Accepts a new client connection.
+        """
+        client_socket, _ = self.server_socket.accept()
+        self.client_dict[client_socket] = {'buffer': b'', 'subscribed': False}
+        self.selector.register(client_socket, selectors.EVENT_READ, self.read_client)
+
+    def read_client(self, client_socket):
+        """Reads from the given client and answers all complete requests with one write.
+        """
+        try:
+            data = client_socket.recv(65536)
+        except OSError:
+            data = b''
+        if not data:
+            self.close_client(client_socket)
+            return
+        client = self.client_dict[client_socket]
+        *line_list, client['buffer'] = (client['buffer'] + data).split(b'\n')
+        response_data = b''
+        for line in line_list:
+            if line.strip():
+                response = self.handle_line(line, client_socket)
+                if response is not None:
+                    response_data += self.encode(response)
+        if response_data and client_socket in self.client_dict:
+            self.send(client_socket, response_data)
+
+    def read_x_events(self, _):
+        """Discards the pending RandR events, rereads the RandR state and notifies the subscribed clients.
+        """
+        while self.display.pending_events():
+            self.display.next_event()
+        self.randr_state = None
+        try:
+            self.update_current_mode()
+        except Exception as error:
+            print(f'Could not read the current mode: {error!r}')
+
+    def start(self):
+        """Binds the socket and starts listening to RandR events. Returns False, if another control server is already
+        running on the X display.
+        """
+        if not self.server_lock.acquire():
+            return False
+        if self.socket_file.exists():
+            self.socket_file.unlink()
+        self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server_socket.bind(str(self.socket_file))
+        self.socket_file.chmod(0o600)
+        self.server_socket.listen()
+        self.selector.register(self.server_socket, selectors.EVENT_READ, lambda _: self.accept_client())
+        self.wakeup_socket, self.worker_wakeup_socket = socket.socketpair()
+        self.selector.register(self.wakeup_socket, selectors.EVENT_READ, self.read_finished_jobs)
+        self.worker_thread = threading.Thread(target=self.run_jobs, name='switches')
+        self.worker_thread.start()
+        if self.display is not None:
+            from Xlib.ext import randr as xlib_randr
+            self.display.screen().root.xrandr_select_input(
+                xlib_randr.RRScreenChangeNotifyMask | xlib_randr.RROutputChangeNotifyMask
+                                                           )
+            self.display.flush()
+            self.selector.register(self.display, selectors.EVENT_READ, self.read_x_events)
+        self.update_current_mode()
+        return True
+
+    def run(self):
+        """Serves the clients until interrupted.
+        """
+        try:
+            while True:
+                for key, _ in self.selector.select():
+                    key.data(key.fileobj)
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Lets the worker thread finish the switch in progress, closes all connections and removes the socket.
+        """
+        if self.worker_thread is not None:
+            self.job_queue.put(None)
+            self.worker_thread.join()
+            self.worker_thread = None
+            self.wakeup_socket.close()
+            self.worker_wakeup_socket.close()
+        for client_socket in tuple(self.client_dict):
+            self.close_client(client_socket)
+        if self.server_socket is not None:
+            self.server_socket.close()
+            self.server_socket = None
+            if self.socket_file.exists():
+                self.socket_file.unlink()
+        self.server_lock.release()
+
+
+class ControlClient(object):
+    """Client of the ControlServer on the given X display (default: $DISPLAY). Keeps the connection open, so every
+    call costs one round-trip.
+    """
+    def __init__(self, display_name=None):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(str(get_runtime_file(SOCKET_NAME, display_name)))
+        self.socket_file = self.socket.makefile('rwb')
+        self.request_id = 0
+        self.notification_list = []
+
+    def read_message(self):
+        """Returns the next message from the server. Raises ConnectionError, if the server closed the connection.
+        """
+        line = self.socket_file.readline()
+        if not line:
+            raise ConnectionError('The control server closed the connection.')
+        return json.loads(line)
+
+    def call_batch(self, *calls):
+        """Runs the given calls (method, params dict) as one batch. Returns a list of the results in the same order.
+        Raises ControlError for the first failed call.
+        """
+        request_list = []
+        for method, params in calls:
+            self.request_id += 1
+            request_list.append({'jsonrpc': '2.0', 'id': self.request_id, 'method': method, 'params': params})
+        self.socket_file.write(json.dumps(request_list).encode('utf-8') + b'\n')
+        self.socket_file.flush()
+        message = self.read_message()
+        while isinstance(message, dict) and 'id' not in message:
+            self.notification_list.append(message)
+            message = self.read_message()
+        if isinstance(message, dict):
+            raise ControlError(message['error']['code'], message['error']['message'])
+        response_dict = {response['id']: response for response in message}
+        result_list = []
+        for request in request_list:
+            response = response_dict[request['id']]
+            if 'error' in response:
+                raise ControlError(response['error']['code'], response['error']['message'])
+            result_list.append(response['result'])
+        return result_list
+
+    def call(self, method, **params):
+        """Runs the given method with the given params. Returns its result. Raises ControlError, if the call failed.
+        """
+        return self.call_batch((method, params))[0]
+
+    def wait_for_notification(self, method):
+        """Waits for the next notification with the given method, e.g. 'switch_finished' after a switch. Skips the
+        notifications of other methods. Returns the params of the notification.
+        """
+        while True:
+            notification = self.notification_list.pop(0) if self.notification_list else self.read_message()
+            if notification.get('method') == method:
+                return notification['params']
+
+    def wait_for_change(self):
+        """Waits for the next 'mode_changed' notification after subscribing. Returns the label of the new mode.
+        """
+        return self.wait_for_notification('mode_changed')['mode']
+
+    def close(self):
+        """Closes the connection.
+        """
+        self.socket_file.close()
+        self.socket.close()
+
+
+def main():
+    if len(sys.argv) > 1:
+        client = ControlClient()
+        try:
+            if sys.argv[1] in ('switch', 'undo'):
+                client.call(sys.argv[1], **({'mode': sys.argv[2]} if sys.argv[1] == 'switch' else {}))
+                finished_params = client.wait_for_notification('switch_finished')
+                print(json.dumps(finished_params))
+                sys.exit(0 if finished_params['success'] or finished_params['queued'] else 1)
+            elif sys.argv[1] == 'subscribe':
+                print(json.dumps(client.call('subscribe', changes=True)))
+                while True:
+                    print(json.dumps({'mode': client.wait_for_change()}), flush=True)
+            else:
+                print(json.dumps(client.call(sys.argv[1])))
+        except ControlError as error:
+            print(error)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            sys.exit(0)
+        finally:
+            client.close()
+        return
+    server = ControlServer()
+    if not server.start():
+        print('The control server is already running.')
+        sys.exit(1)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import json
+import randr
+from config_store import CONFIG_DIR
+
+EDID_CACHE_FILE = CONFIG_DIR / 'edid_cache.json'
+EDID_HEADER = bytes((0x00, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0x00))
+# Offsets of the four 18 byte descriptors of the EDID base block:
+DESCRIPTOR_OFFSET_TUPLE = (54, 72, 90, 108)
+# Tags of the display descriptors holding text:
+MONITOR_NAME_TAG = 0xfc
+MONITOR_SERIAL_TAG = 0xff
+
+
+def get_descriptor_text(descriptor):
+    """Returns the text of the given display descriptor, which ends at a line feed and is padded with spaces.
+    """
+    return descriptor[5:18].split(b'\n')[0].decode('cp437').strip()
+
+
+def get_detailed_timing_mode(descriptor):
+    """Returns the mode of the given detailed timing descriptor as list [resolution, rate], e.g. ['1920x1080',
+    '60.00'], like it is stored in the EDID cache file.
+    """
+    pixel_clock = int.from_bytes(descriptor[0:2], 'little') * 10000
+    width = descriptor[2] | (descriptor[4] & 0xf0) << 4
+    horizontal_blanking = descriptor[3] | (descriptor[4] & 0x0f) << 8
+    height = descriptor[5] | (descriptor[7] & 0xf0) << 4
+    vertical_blanking = descriptor[6] | (descriptor[7] & 0x0f) << 8
+    interlaced = bool(descriptor[17] & 0x80)
+    if interlaced:
+        height *= 2
+    total_pixel_count = (width + horizontal_blanking) * (height + vertical_blanking)
+    rate = pixel_clock / total_pixel_count if total_pixel_count else 0.0
+    return [f'{width}x{height}{"i" if interlaced else ""}', f'{rate:.2f}']
+
+
+def decode_edid(edid):
+    """Decodes the base block of the given EDID (bytes). Returns a dict {'manufacturer': PNP id, 'model': monitor name
+    or product code, 'serial': serial number, 'native_mode': [resolution, rate] of the preferred timing or None}.
+    Returns None, if the EDID is invalid.
+    """
+    if len(edid) < 128 or edid[:8] != EDID_HEADER:
+        return None
+    manufacturer_code = int.from_bytes(edid[8:10], 'big')
+    manufacturer = ''.join(chr(ord('A') - 1 + (manufacturer_code >> shift & 0x1f)) for shift in (10, 5, 0))
+    edid_info = {'manufacturer': manufacturer,
+                 'model': f'{int.from_bytes(edid[10:12], "little"):04X}',
+                 'serial': str(int.from_bytes(edid[12:16], 'little') or ''),
+                 'native_mode': None}
+    for offset in DESCRIPTOR_OFFSET_TUPLE:
+        descriptor = edid[offset:offset + 18]
+        if descriptor[0:2] != b'\x00\x00':
+            # the first detailed timing is the preferred, i.e. native, mode:
+            #
+            if edid_info['native_mode'] is None:
+                edid_info['native_mode'] = get_detailed_timing_mode(descriptor)
+        elif descriptor[3] == MONITOR_NAME_TAG:
+            edid_info['model'] = get_descriptor_text(descriptor) or edid_info['model']
+        elif descriptor[3] == MONITOR_SERIAL_TAG:
+            edid_info['serial'] = get_descriptor_text(descriptor) or edid_info['serial']
+    return edid_info
+
+
+def load_edid_cache():
+    """Returns the content of the EDID cache file: {EDID hash: decoded EDID (see 'decode_edid')}.
+    Returns an empty dict, if there is no readable EDID cache file.
+    """
+    try:
+        with EDID_CACHE_FILE.open('r') as edid_cache_file:
+            edid_cache = json.load(edid_cache_file)
+    except (OSError, ValueError):
+        return {}
+    return edid_cache if isinstance(edid_cache, dict) else {}
+
+
+def save_edid_cache(edid_cache):
+    """Saves the given decoded EDIDs {EDID hash: decoded EDID} in the EDID cache file.
+    """
+    temp_file = EDID_CACHE_FILE.with_suffix('.tmp')
+    try:
+        with temp_file.open('w') as edid_cache_file:
+            json.dump(edid_cache, edid_cache_file)
+        temp_file.replace(EDID_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def get_cached_edid_infos(fingerprint):
+    """Returns a dict {port: decoded EDID or None} for the given output fingerprint {port: EDID hash} (see
+    'randr.get_output_fingerprint') with the decoded EDIDs of the EDID cache file. Doesn't start Xrandr, so it can be
+    used to label the ports instantly with the fingerprint of the probe cache.
+    """
+    edid_cache = load_edid_cache()
+    return {port: edid_cache.get(edid_hash) for port, edid_hash in fingerprint.items()}
+
+
+def get_connected_edid_infos():
+    """Returns a dict {port: decoded EDID or None} for all connected outputs, whether active or not. Reads the EDIDs
+    with 'xrandr --current --prop' without probing the outputs and decodes only EDIDs missing in the EDID cache, which
+    is updated afterwards.
+    """
+    output_dict = randr.parse_xrandr_output(randr.run_xrandr('--current', '--prop'))
+    edid_cache = load_edid_cache()
+    cache_changed = False
+    edid_info_dict = {}
+    for port, output in output_dict.items():
+        if not output['connected']:
+            continue
+        edid_hash = randr.get_edid_hash(output['edid'])
+        if edid_hash and edid_hash not in edid_cache:
+            try:
+                edid_cache[edid_hash] = decode_edid(bytes.fromhex(output['edid']))
+            except ValueError:
+                edid_cache[edid_hash] = None
+            cache_changed = True
+        edid_info_dict[port] = edid_cache.get(edid_hash)
+    if cache_changed:
+        save_edid_cache(edid_cache)
+    return edid_info_dict
+
+
+def get_port_labels(port_tuple, edid_info_dict):
+    """Returns a tuple of labels for the given ports with the model, manufacturer and native mode of their decoded
+    EDIDs from the given dict {port: decoded EDID or None}, e.g. 'HDMI-1: DELL U2415 by DEL, 1920x1200'. Adds the
+    serial number, if several ports show the same model. Ports without decoded EDID are labelled with their name.
+    """
+    model_list = [
+        (edid_info['manufacturer'], edid_info['model']) for edid_info in map(edid_info_dict.get, port_tuple)
+        if edid_info is not None
+                  ]
+    label_list = []
+    for port in port_tuple:
+        edid_info = edid_info_dict.get(port)
+        if edid_info is None:
+            label_list.append(port)
+            continue
+        label = f'{port}: {edid_info["model"]} by {edid_info["manufacturer"]}'
+        if model_list.count((edid_info['manufacturer'], edid_info['model'])) > 1 and edid_info['serial']:
+            label += f' ({edid_info["serial"]})'
+        if edid_info['native_mode'] is not None:
+            label += f', {edid_info["native_mode"][0]}'
+        label_list.append(label)
+    return tuple(label_list)
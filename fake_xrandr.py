@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import re
+import sys
+import json
+from pathlib import Path
+
+# State file of the fake screens, can be replaced with the environment variable MULTI_MON_FAKE_XRANDR_STATE:
+STATE_FILE = Path(os.environ.get('MULTI_MON_FAKE_XRANDR_STATE') or Path(__file__).parent / 'fake_xrandr_state.json')
+# Leading size of a mode name, e.g. of '1920x1080' or '1920x1080_60.00':
+MODE_SIZE_PATTERN = re.compile(r'(\d+)x(\d+)')
+# Capability bits of a provider: source output, sink output, source offload and sink offload:
+ALL_CAPABILITIES = 0xf
+SINK_CAPABILITIES = 0xa
+
+
+def make_output(provider, modes_dict=None, edid='', mode=None, pos=None, primary=False, crtc=None, crtcs=(0, 1, 2)):
+    """Returns an output of the fake state driven by the provider with the given number. The output is connected, if
+    it has modes ({resolution: rates}, the best first), and enabled, if it has a mode.
+    """
+    modes_dict = modes_dict or {}
+    return {'provider': provider, 'connected': bool(modes_dict), 'edid': edid, 'modes': modes_dict, 'mode': mode,
+            'rate': modes_dict[mode][0] if mode else None, 'pos': pos if mode else None, 'primary': primary,
+            'crtc': crtc if mode else None, 'crtcs': list(crtcs), 'rotation': 'normal'}
+
+
+def make_default_state():
+    """Returns the default fake state: a laptop panel and a monitor on the first GPU, a disconnected port and a second
+    GPU, which isn't set up as output sink yet, with a connected monitor.
+    """
+    panel_modes = {'1920x1080': ['60.00', '48.00'], '1280x720': ['60.00']}
+    monitor_modes = {'2560x1440': ['75.00', '60.00'], '1920x1080': ['75.00', '60.00', '50.00'],
+                     '1280x720': ['60.00', '50.00']}
+    return {
+        'maximum': [16384, 16384],
+        'providers': [
+            {'id': '0x47', 'name': 'modesetting', 'capabilities': ALL_CAPABILITIES, 'crtc_count': 3,
+             'associated': False},
+            {'id': '0x2a6', 'name': 'NVIDIA-G0', 'capabilities': SINK_CAPABILITIES, 'crtc_count': 2,
+             'associated': False}
+                     ],
+        'outputs': {
+            'eDP-1': make_output(0, panel_modes, '00ffffffffffff0006af' * 6, '1920x1080', [0, 0], True, 0),
+            'HDMI-1': make_output(0, monitor_modes, '00ffffffffffff004c2d' * 6, '1920x1080', [1920, 0], False, 1),
+            'DP-1': make_output(0),
+            'HDMI-A-2': make_output(1, monitor_modes, '00ffffffffffff0010ac' * 6, crtcs=(3, 4))
+                   }
+           }
+
+
+def load_state():
+    """Returns the fake state of the state file. Returns the default state, if there is no readable state file.
+    """
+    try:
+        with STATE_FILE.open('r') as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return make_default_state()
+
+
+def save_state(state):
+    """Saves the given fake state in the state file.
+    """
+    temp_file = STATE_FILE.with_suffix('.tmp')
+    with temp_file.open('w') as state_file:
+        json.dump(state, state_file, indent=1)
+    temp_file.replace(STATE_FILE)
+
+
+def get_listed_ports(state):
+    """Returns a list of the ports the X server lists: the outputs of the first provider, then the ones of every
+    provider set up as output sink, in the order of the providers.
+    """
+    listed_provider_list = [index for index, provider in enumerate(state['providers'])
+                            if index == 0 or provider['associated']]
+    return [port for provider_index in listed_provider_list
+            for port, output in state['outputs'].items() if output['provider'] == provider_index]
+
+
+def get_output_size(output):
+    """Returns a tuple (width, height) the given enabled output covers with its mode and rotation.
+    """
+    width, height = (int(value) for value in MODE_SIZE_PATTERN.match(output['mode']).groups())
+    return (height, width) if output['rotation'] in ('left', 'right') else (width, height)
+
+
+def get_screen_size(state):
+    """Returns a tuple (width, height) of the screen covering all enabled outputs.
+    """
+    enabled_output_list = [output for output in state['outputs'].values() if output['mode']]
+    return (max((output['pos'][0] + get_output_size(output)[0] for output in enabled_output_list), default=0),
+            max((output['pos'][1] + get_output_size(output)[1] for output in enabled_output_list), default=0))
+
+
+def print_providers(state):
+    """Prints the providers like 'xrandr --listproviders'.
+    """
+    provider_list = state['providers']
+    print(f'Providers: number : {len(provider_list)}')
+    for index, provider in enumerate(provider_list):
+        output_count = sum(output['provider'] == index for output in state['outputs'].values())
+        # the first provider is the output source of all sinks:
+        #
+        if index == 0:
+            associated_count = sum(bool(sink_provider['associated']) for sink_provider in provider_list[1:])
+        else:
+            associated_count = int(provider['associated'])
+        print(f'Provider {index}: id: {provider["id"]} cap: {hex(provider["capabilities"])} '
+              f'crtcs: {provider["crtc_count"]} outputs: {output_count} '
+              f'associated providers: {associated_count} name:{provider["name"]}')
+
+
+def print_outputs(state, verbose, show_properties):
+    """Prints the screen and the listed outputs like 'xrandr -q', with their properties or as 'xrandr --verbose'.
+    """
+    print('Screen 0: minimum 8 x 8, current {} x {}, maximum {} x {}'.format(*get_screen_size(state),
+                                                                             *state['maximum']))
+    for port in get_listed_ports(state):
+        output = state['outputs'][port]
+        geometry = ''
+        if output['mode']:
+            geometry = '{}x{}+{}+{} '.format(*get_output_size(output), *output['pos'])
+            if verbose:
+                geometry += f'(0x4a) {output["rotation"]} '
+            elif output['rotation'] != 'normal':
+                geometry += f'{output["rotation"]} '
+        print(f'{port} {"connected" if output["connected"] else "disconnected"} '
+              f'{"primary " if output["primary"] else ""}{geometry}(normal left inverted right x axis y axis)')
+        if verbose:
+            print('\tIdentifier: 0x48')
+            if output['crtc'] is not None:
+                print(f'\tCRTC:       {output["crtc"]}')
+            print('\tCRTCs:      ' + ' '.join(str(crtc) for crtc in output['crtcs']))
+        if (verbose or show_properties) and output['edid']:
+            print('\tEDID: ')
+            for index in range(0, len(output['edid']), 32):
+                print('\t\t' + output['edid'][index:index + 32])
+        for resolution, rate_list in output['modes'].items():
+            if verbose:
+                width, height = MODE_SIZE_PATTERN.match(resolution).groups()
+                for rate in rate_list:
+                    current = ' *current' if (resolution, rate) == (output['mode'], output['rate']) else ''
+                    print(f'  {resolution} (0x4b) 148.500MHz +HSync +VSync{current}')
+                    print(f'        h: width  {width} start 2008 end 2052 total 2200 skew    0 clock  67.50KHz')
+                    print(f'        v: height {height} start 1084 end 1089 total 1125           clock  {rate}Hz')
+                continue
+            print(f'   {resolution:<14}' + ''.join(
+                f'{rate:>6}{"*" if (resolution, rate) == (output["mode"], output["rate"]) else " "} '
+                for rate in rate_list
+                                                      ))
+
+
+def set_up_provider(state, provider_id, source_id):
+    """Sets up the provider with the given id as output sink of the given source provider, or detaches it, if the
+    source is 0x0. Returns an error message or None.
+    """
+    provider = next((provider for provider in state['providers'] if provider['id'] == provider_id), None)
+    if provider is None or source_id not in ('0x0', *(provider['id'] for provider in state['providers'])):
+        return f'Could not find provider with name {provider_id}'
+    provider['associated'] = source_id != '0x0'
+    return None
+
+
+def apply_output_arguments(state, args):
+    """Applies the given '--output' and '--fb' arguments to the state like Xrandr does in one call.
+    Returns an error message or None.
+    """
+    listed_port_list = get_listed_ports(state)
+    output = None
+    arguments = iter(args)
+    for argument in arguments:
+        if argument == '--output':
+            port = next(arguments)
+            if port not in listed_port_list:
+                return f'warning: output {port} not found; ignoring'
+            output = state['outputs'][port]
+        elif argument == '--fb':
+            next(arguments)
+        elif output is None:
+            continue
+        elif argument == '--off':
+            output.update(mode=None, rate=None, pos=None, crtc=None)
+        elif argument == '--auto':
+            resolution = next(iter(output['modes']), None)
+            output.update(mode=resolution, rate=output['modes'][resolution][0] if resolution else None,
+                          pos=output['pos'] or [0, 0])
+        elif argument == '--primary':
+            for other_output in state['outputs'].values():
+                other_output['primary'] = False
+            output['primary'] = True
+        elif argument == '--mode':
+            resolution = next(arguments)
+            if resolution not in output['modes']:
+                return f'cannot find mode {resolution}'
+            output.update(mode=resolution, rate=output['modes'][resolution][0], pos=output['pos'] or [0, 0])
+        elif argument == '--rate':
+            rate = next(arguments)
+            rate_list = output['modes'].get(output['mode'], [])
+            output['rate'] = min(rate_list, key=lambda listed_rate: abs(float(listed_rate) - float(rate)),
+                                 default=None)
+        elif argument == '--rotate':
+            output['rotation'] = next(arguments)
+        elif argument == '--pos':
+            output['pos'] = [int(value) for value in next(arguments).split('x')]
+        elif argument == '--crtc':
+            output['crtc'] = int(next(arguments))
+        elif argument in ('--left-of', '--right-of', '--above', '--below', '--same-as'):
+            relative_output = state['outputs'][next(arguments)]
+            if output['mode'] is None or relative_output['mode'] is None:
+                continue
+            x, y = relative_output['pos']
+            relative_width, relative_height = get_output_size(relative_output)
+            width, height = get_output_size(output)
+            output['pos'] = {'--left-of': [x - width, y], '--right-of': [x + relative_width, y],
+                             '--above': [x, y - height], '--below': [x, y + relative_height],
+                             '--same-as': [x, y]}[argument]
+    return assign_crtcs(state)
+
+
+def assign_crtcs(state):
+    """Gives every enabled output without CRTC a free CRTC it can use and moves the layout to the origin.
+    Returns an error message or None.
+    """
+    enabled_output_list = [output for output in state['outputs'].values() if output['mode']]
+    for output in enabled_output_list:
+        used_crtc_set = {other_output['crtc'] for other_output in enabled_output_list if other_output is not output}
+        if output['crtc'] is None or output['crtc'] in used_crtc_set:
+            output['crtc'] = next((crtc for crtc in output['crtcs'] if crtc not in used_crtc_set), None)
+        if output['crtc'] is None:
+            return 'xrandr: cannot find crtc for output'
+    if enabled_output_list:
+        min_x = min(output['pos'][0] for output in enabled_output_list)
+        min_y = min(output['pos'][1] for output in enabled_output_list)
+        for output in enabled_output_list:
+            output['pos'] = [output['pos'][0] - min_x, output['pos'][1] - min_y]
+    if any(size > maximum for size, maximum in zip(get_screen_size(state), state['maximum'])):
+        return 'xrandr: screen cannot be larger than the maximum size'
+    return None
+
+
+def main(args):
+    """Answers the given Xrandr arguments from the state file and changes the state like Xrandr changes the RandR state
+    of the X server. Returns the exit code.
+    """
+    state = load_state()
+    if '--listproviders' in args:
+        print_providers(state)
+        return 0
+    if '--setprovideroutputsource' in args:
+        index = args.index('--setprovideroutputsource')
+        error = set_up_provider(state, *args[index + 1:index + 3])
+    elif '--output' in args or '--fb' in args:
+        error = apply_output_arguments(state, args)
+    else:
+        print_outputs(state, '--verbose' in args, '--prop' in args)
+        return 0
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 1
+    save_state(state)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
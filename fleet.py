@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import sys
+import time
+import argparse
+import functools
+import configparser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config_store import read_config
+
+# Default number of X displays switched at the same time:
+MAX_WORKERS = 4
+
+
+def get_display_config(config, display_name):
+    """Returns a config parser with the options of the given X display: every section of the given config parser,
+    replaced by the section of the display with the same name and the display name appended, if there is one, for
+    example [Screens :1] replaces [Screens] and [Rate policy :1] replaces [Rate policy].
+    """
+    display_config = configparser.ConfigParser()
+    suffix = f' {display_name}'
+    for section in config.sections():
+        if section.endswith(suffix):
+            continue
+        display_section = section + suffix if config.has_section(section + suffix) else section
+        display_config[section] = dict(config[display_section])
+    for section in config.sections():
+        if section.endswith(suffix) and not display_config.has_section(section[:-len(suffix)]):
+            display_config[section[:-len(suffix)]] = dict(config[section])
+    return display_config
+
+
+def switch_display(display_name, mode, display_config):
+    """Changes the X display with the given name into the mode with the given label with the screens and options of
+    the given config parser (see 'get_display_config'). Runs in a worker process, which addresses the display through
+    $DISPLAY like a MultiMon started on it.
+    Returns a dict {'display', 'success', 'queued', 'error', 'duration'}.
+    """
+    os.environ['DISPLAY'] = display_name
+    from switch_queue import SwitchQueue
+    from multi_mon import ScreenSetup, load_screen_config
+    from metrics import METRICS
+    from hooks import wait_for_background_hooks
+    start_time = time.monotonic()
+    try:
+        tuples_all_screens = load_screen_config(display_config)
+        screen_setup = ScreenSetup(*tuples_all_screens, config=display_config)
+        switch_result = SwitchQueue(display_name).run_or_submit(
+            functools.partial(screen_setup.switch_to_mode, mode), mode, tuples_all_screens
+                                                                )
+    except OSError as error:
+        switch_result = None
+        error_message = str(error)
+    else:
+        error_message = '' if switch_result is None or switch_result else str(switch_result)
+    finally:
+        # the worker process exits without running the atexit handlers:
+        #
+        wait_for_background_hooks()
+        METRICS.flush()
+    return {'display': display_name,
+            'success': bool(switch_result) and not error_message,
+            'queued': switch_result is None and not error_message,
+            'error': error_message,
+            'duration': time.monotonic() - start_time}
+
+
+class Fleet(object):
+    """Several X displays driven by one machine, for example the X servers :0 and :1 of a signage host. Every display
+    uses the sections of the given config parser (default: the conf file) with its display name appended, e.g.
+    [Screens :N] or [Mode :N], and the plain sections otherwise (see 'get_display_config').
+    Applies a mode to all displays concurrently with a bounded pool of worker processes.
+    """
+    def __init__(self, display_names, config=None, max_workers=MAX_WORKERS):
+        from multi_mon import load_screen_config
+        if config is None:
+            config = read_config()
+        self.max_workers = max(1, min(max_workers, len(display_names)))
+        self.config_dict = {display_name: get_display_config(config, display_name) for display_name in display_names}
+        # invalid screen sections fail here, before any display is switched:
+        #
+        for display_config in self.config_dict.values():
+            load_screen_config(display_config)
+
+    def switch_to_mode(self, mode):
+        """Changes all displays into the mode with the given label.
+        Returns a tuple (list of the result dicts of all displays in the given order, total seconds).
+        """
+        start_time = time.monotonic()
+        result_dict = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            future_dict = {
+                executor.submit(switch_display, display_name, mode, display_config): display_name
+                for display_name, display_config in self.config_dict.items()
+                           }
+            for future in as_completed(future_dict):
+                display_name = future_dict[future]
+                try:
+                    result_dict[display_name] = future.result()
+                except Exception as error:
+                    result_dict[display_name] = {'display': display_name, 'success': False, 'queued': False,
+                                                 'error': str(error), 'duration': 0.0}
+        return [result_dict[display_name] for display_name in self.config_dict], time.monotonic() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Change several X displays into the same MultiMon mode.')
+    parser.add_argument('mode', help='label of the mode, e.g. tv_extended')
+    parser.add_argument('displays', nargs='+', help='X displays, e.g. :0 :1')
+    parser.add_argument('-j', '--workers', type=int, default=MAX_WORKERS,
+                        help=f'number of displays switched at the same time (default: {MAX_WORKERS})')
+    args = parser.parse_args()
+
+    result_list, total_duration = Fleet(args.displays, max_workers=args.workers).switch_to_mode(args.mode)
+    for result in result_list:
+        if result['success']:
+            status = 'ok'
+        elif result['queued']:
+            status = 'queued behind a running switch'
+        else:
+            status = f'failed: {result["error"]}'
+        print(f'{result["display"]}: {status} ({result["duration"]:.2f} s)')
+    success_count = sum(result['success'] or result['queued'] for result in result_list)
+    print(f'{success_count}/{len(result_list)} displays switched in {total_duration:.2f} s '
+          f'(sum of all displays: {sum(result["duration"] for result in result_list):.2f} s)')
+    sys.exit(0 if success_count == len(result_list) else 1)
+
+
+if __name__ == '__main__':
+    main()
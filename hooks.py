@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import time
+import signal
+import threading
+import functools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from metrics import METRICS, get_desktop_environment
+from power_policy import RATE_POLICY_MODE_LABEL
+from randr import get_display_environment
+
+# Conf file section with the options 'workers' (number of hooks run at the same time) and 'blocking_budget' (seconds
+# the blocking pre hooks may delay a mode change in total):
+HOOKS_SECTION = 'Hooks'
+# Prefix of the conf file sections declaring a hook, e.g. [Hook tv_audio] with the options 'command', 'phase' (pre or
+# post), 'modes' (labels separated by spaces, default: all), 'excluded_modes' (labels separated by spaces, default:
+# none), 'timeout' (seconds), 'desktop_environment' (kde, cinnamon or other, default: all), 'after' (names of hooks of
+# the same phase, which have to finish before) and 'blocking' (true for a pre hook, which has to finish before the mode
+# change):
+HOOK_SECTION_PREFIX = 'Hook '
+PHASE_TUPLE = ('pre', 'post')
+MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_BLOCKING_BUDGET = 2.0
+# Threads running hooks in the background, see 'wait_for_background_hooks':
+BACKGROUND_THREAD_SET = set()
+
+
+class Hook(object):
+    """Shell command run before ('pre') or after ('post') a mode change into one of the given modes. The command is
+    killed together with its child processes, if it takes longer than the timeout. Only a blocking pre hook delays
+    the mode change, all other hooks run in the background.
+    """
+    def __init__(self, name, command, phase, modes=(), timeout=DEFAULT_TIMEOUT, desktop_environment=None, after=(),
+                 blocking=False, excluded_modes=()):
+        if phase not in PHASE_TUPLE:
+            raise ValueError(f'Unknown phase {phase} of the hook {name}, possible phases: {", ".join(PHASE_TUPLE)}.')
+        self.name = name
+        self.command = command
+        self.phase = phase
+        self.modes = tuple(modes)
+        self.timeout = timeout
+        self.desktop_environment = desktop_environment
+        self.after = tuple(after)
+        self.blocking = blocking and phase == 'pre'
+        self.excluded_modes = tuple(excluded_modes)
+
+    @classmethod
+    def from_config_section(cls, name, section, blocking=False, excluded_modes=()):
+        """Returns the hook declared in the given conf file section. The options 'blocking' and 'excluded_modes' default
+        to the given values.
+        """
+        excluded_mode_option = section.get('excluded_modes')
+        return cls(name, section.get('command', ''), section.get('phase', 'post'),
+                   section.get('modes', '').split(), section.getfloat('timeout', DEFAULT_TIMEOUT),
+                   section.get('desktop_environment') or None, section.get('after', '').split(),
+                   section.getboolean('blocking', blocking),
+                   excluded_modes if excluded_mode_option is None else excluded_mode_option.split())
+
+    def applies_to(self, phase, mode, desktop_environment):
+        """Returns True, if the hook has to run in the given phase of a mode change into the mode with the given label
+        in the given desktop environment.
+        """
+        return bool(self.command) and self.phase == phase and (not self.modes or mode in self.modes) and \
+            mode not in self.excluded_modes and self.desktop_environment in (None, desktop_environment)
+
+    def run(self, timeout=None, env=None):
+        """Runs the command with the given environment (default: the one of this process) and waits for it at most the
+        timeout of the hook or the given shorter timeout.
+        Returns a dict {'hook': name, 'phase': phase, 'returncode': exit status or None, if timed out, 'duration':
+        seconds}.
+        """
+        timeout = self.timeout if timeout is None else min(self.timeout, timeout)
+        start_time = time.monotonic()
+        try:
+            proc = subprocess.Popen(self.command, shell=True, start_new_session=True, env=env)
+        except OSError as error:
+            print(f'The hook {self.name} couldn\'t be started: {error}')
+            returncode = -1
+        else:
+            try:
+                returncode = proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+                returncode = None
+                print(f'The hook {self.name} was killed after {timeout:g} s.')
+        return {'hook': self.name, 'phase': self.phase, 'returncode': returncode,
+                'duration': time.monotonic() - start_time}
+
+
+# Commands of the desktop environments, which can be replaced or turned off ('command =') by a conf file section with
+# the same name. The compositor has to be suspended before the mode change. A refresh rate change of the power policy
+# keeps the layout, so none of them runs for it:
+DESKTOP_ENVIRONMENT_HOOK_TUPLE = (
+    Hook('suspend_compositor', 'qdbus org.kde.KWin /Compositor suspend', 'pre', desktop_environment='kde',
+         blocking=True, excluded_modes=(RATE_POLICY_MODE_LABEL,)),
+    Hook('resume_compositor', 'qdbus org.kde.KWin /Compositor resume', 'post', desktop_environment='kde',
+         excluded_modes=(RATE_POLICY_MODE_LABEL,)),
+    Hook('restart_cinnamon', 'killall cinnamon', 'post', desktop_environment='cinnamon',
+         excluded_modes=(RATE_POLICY_MODE_LABEL,)),
+                                  )
+
+
+def load_hooks(config):
+    """Returns a list of the hooks of the desktop environments and the hooks declared in the given config parser.
+    Raises ValueError, if a hook is declared wrong.
+    """
+    hook_dict = {hook.name: hook for hook in DESKTOP_ENVIRONMENT_HOOK_TUPLE}
+    for section in config.sections():
+        if section.startswith(HOOK_SECTION_PREFIX):
+            name = section[len(HOOK_SECTION_PREFIX):].strip()
+            built_in_hook = hook_dict.get(name)
+            if built_in_hook is None:
+                hook_dict[name] = Hook.from_config_section(name, config[section])
+            else:
+                hook_dict[name] = Hook.from_config_section(name, config[section], built_in_hook.blocking,
+                                                           built_in_hook.excluded_modes)
+    return list(hook_dict.values())
+
+
+def wait_for_background_hooks(timeout=None):
+    """Waits at most the given seconds for the hooks running in the background (see 'HookPipeline.start_background'),
+    e.g. before a process exits without running the atexit handlers.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for thread in tuple(BACKGROUND_THREAD_SET):
+        thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+
+class HookPipeline(object):
+    """Runs the hooks of one phase of a mode change. Hooks without unfinished 'after' hooks run concurrently in a
+    bounded pool of threads, each at most for its timeout. Only the blocking pre hooks delay the mode change, all
+    together at most for the blocking budget. The other hooks run in a background thread, which records the duration
+    of every hook in the metrics, when it finishes. The hooks run with the given X display (default: $DISPLAY) as
+    $DISPLAY.
+    """
+    def __init__(self, hook_list, max_workers=MAX_WORKERS, blocking_budget=DEFAULT_BLOCKING_BUDGET, display_name=None):
+        self.hook_list = hook_list
+        self.max_workers = max(1, max_workers)
+        self.blocking_budget = blocking_budget
+        self.environment = get_display_environment(display_name)
+
+    @classmethod
+    def from_config(cls, config, display_name=None):
+        """Returns the HookPipeline of the hooks declared in the given config parser for the given X display. Leaves out
+        the declared hooks, if one is declared wrong.
+        """
+        try:
+            hook_list = load_hooks(config)
+        except ValueError as error:
+            print(error)
+            hook_list = list(DESKTOP_ENVIRONMENT_HOOK_TUPLE)
+        return cls(hook_list, config.getint(HOOKS_SECTION, 'workers', fallback=MAX_WORKERS),
+                   config.getfloat(HOOKS_SECTION, 'blocking_budget', fallback=DEFAULT_BLOCKING_BUDGET), display_name)
+
+    def get_stages(self, phase, mode, desktop_environment, blocking=False):
+        """Returns a list of the stages of the blocking or the other hooks of the given phase: tuples of hooks, which
+        only wait for hooks of the stages before. Hooks waiting for each other are left out.
+        """
+        pending_hook_list = [hook for hook in self.hook_list
+                             if hook.applies_to(phase, mode, desktop_environment) and hook.blocking == blocking]
+        pending_name_set = {hook.name for hook in pending_hook_list}
+        stage_list = []
+        while pending_hook_list:
+            stage = tuple(hook for hook in pending_hook_list if pending_name_set.isdisjoint(hook.after))
+            if not stage:
+                print(f'The hooks {", ".join(sorted(pending_name_set))} wait for each other and are left out.')
+                break
+            stage_list.append(stage)
+            pending_hook_list = [hook for hook in pending_hook_list if hook not in stage]
+            pending_name_set.difference_update(hook.name for hook in stage)
+        return stage_list
+
+    def run_stages(self, stage_list, desktop_environment, result_list, budget=None):
+        """Runs the given stages (see 'get_stages') one after the other, all together at most for the given seconds,
+        and appends the results of the hooks (see 'Hook.run') to the given list. Records the durations in the metrics.
+        """
+        deadline = None if budget is None else time.monotonic() + budget
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(map(len, stage_list)))) as executor:
+            for stage_nr, stage in enumerate(stage_list):
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    left_out_name_tuple = tuple(hook.name for left_out_stage in stage_list[stage_nr:]
+                                                for hook in left_out_stage)
+                    print(f'The hooks {", ".join(left_out_name_tuple)} '
+                          f'are left out, the blocking budget of {budget:g} s is used up.')
+                    break
+                for result in executor.map(functools.partial(Hook.run, timeout=timeout, env=self.environment), stage):
+                    METRICS.observe_phase(desktop_environment, result['hook'], result['duration'])
+                    result_list.append(result)
+
+    def run_blocking(self, mode):
+        """Runs the blocking pre hooks of a mode change into the mode with the given label within the blocking budget.
+        Returns a list of the results of the hooks (see 'Hook.run').
+        """
+        desktop_environment = get_desktop_environment()
+        result_list = []
+        stage_list = self.get_stages('pre', mode, desktop_environment, blocking=True)
+        if stage_list:
+            self.run_stages(stage_list, desktop_environment, result_list, self.blocking_budget)
+        return result_list
+
+    def start_background(self, phase, mode, result_list):
+        """Starts the hooks of the given phase of a mode change into the mode with the given label, which aren't
+        blocking, in a background thread. Their results (see 'Hook.run') are appended to the given list, when they
+        finish. The thread isn't a daemon, so a process exiting normally waits for it.
+        """
+        desktop_environment = get_desktop_environment()
+        stage_list = self.get_stages(phase, mode, desktop_environment)
+        if not stage_list:
+            return
+        thread = threading.Thread(target=self.run_in_background, args=(stage_list, desktop_environment, result_list),
+                                  name=f'{phase} hooks')
+        BACKGROUND_THREAD_SET.add(thread)
+        thread.start()
+
+    def run_in_background(self, stage_list, desktop_environment, result_list):
+        """Runs the given stages like 'run_stages' without budget. Runs in a background thread.
+        """
+        try:
+            self.run_stages(stage_list, desktop_environment, result_list)
+        finally:
+            BACKGROUND_THREAD_SET.discard(threading.current_thread())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import sys
+import shutil
+import subprocess
+import randr
+import auto_profiles
+from switch_queue import SwitchQueue, FileLock
+from config_store import ConfigCache
+try:
+    from Xlib import X, XK, error as xlib_error
+    from Xlib.error import CatchError
+except ImportError:
+    xlib_error = None
+
+# Conf file section with the key combos, e.g. 'tv_mirror = Super+F2' or 'cycle = Ctrl+Alt+M':
+HOTKEYS_SECTION = 'Hotkeys'
+# Key of the combo cycling through the buttons enabled in the Customize section:
+CYCLE_KEY = 'cycle'
+# Key of the option to show the new mode as desktop notification:
+HINT_KEY = 'show_hint'
+# Modifier names of the key combos and the names of their X modifier masks:
+MODIFIER_DICT = {'shift': 'ShiftMask', 'ctrl': 'ControlMask', 'control': 'ControlMask', 'alt': 'Mod1Mask',
+                 'super': 'Mod4Mask', 'win': 'Mod4Mask'}
+# Names of the lock modifier masks, which mustn't prevent a hotkey (Caps Lock and Num Lock):
+LOCK_MODIFIER_TUPLE = ('LockMask', 'Mod2Mask')
+
+
+def get_lock_modifier_combinations():
+    """Returns a tuple of all combinations of the lock modifier masks, including none.
+    """
+    lock_mask_tuple = tuple(getattr(X, lock_modifier) for lock_modifier in LOCK_MODIFIER_TUPLE)
+    return 0, lock_mask_tuple[0], lock_mask_tuple[1], lock_mask_tuple[0] | lock_mask_tuple[1]
+
+
+def parse_key_combo(key_combo):
+    """Parses a key combo like 'Ctrl+Alt+M'. Returns a tuple (modifier mask, keysym).
+    Raises ValueError, if the combo contains an unknown modifier or key.
+    """
+    *modifier_names, key_name = (part.strip() for part in key_combo.split('+'))
+    modifier_mask = 0
+    for modifier_name in modifier_names:
+        if modifier_name.lower() not in MODIFIER_DICT:
+            raise ValueError(f'Unknown modifier {modifier_name} in the hotkey {key_combo}.')
+        modifier_mask |= getattr(X, MODIFIER_DICT[modifier_name.lower()])
+    keysym = XK.string_to_keysym(key_name)
+    if not keysym:
+        keysym = XK.string_to_keysym(key_name.lower())
+    if not keysym:
+        raise ValueError(f'Unknown key {key_name} in the hotkey {key_combo}.')
+    return modifier_mask, keysym
+
+
+class HotkeyListener(object):
+    """Grabs the key combos of the Hotkeys section of the conf file on the root window (XGrabKey) and changes into the
+    related mode without opening the MultiMon dialog. The combo of 'cycle' changes into the next mode of the buttons
+    enabled in the Customize section.
+    """
+    def __init__(self, conf_file=None, display_name=None):
+        self.config_cache = ConfigCache(conf_file) if conf_file else ConfigCache()
+        self.display_name = display_name
+        self.display = randr.open_x_display(display_name)
+        self.root = self.display.screen().root
+        self.config = self.config_cache.get_config()
+        self.hotkey_dict = {}
+
+    def grab_hotkeys(self):
+        """Grabs all key combos of the Hotkeys section. Returns a list of error messages of the combos, which couldn't
+        be grabbed.
+        """
+        from multi_mon import MODE_TUPLE
+        error_list = []
+        if not self.config.has_section(HOTKEYS_SECTION):
+            return ['No [Hotkeys] section in the configuration file.']
+        for mode, key_combo in self.config[HOTKEYS_SECTION].items():
+            if mode == HINT_KEY or not key_combo:
+                continue
+            if mode not in MODE_TUPLE and mode != CYCLE_KEY:
+                error_list.append(f'Unknown mode {mode} in the [Hotkeys] section.')
+                continue
+            try:
+                modifier_mask, keysym = parse_key_combo(key_combo)
+            except ValueError as error:
+                error_list.append(str(error))
+                continue
+            keycode = self.display.keysym_to_keycode(keysym)
+            catch_error = CatchError(xlib_error.BadAccess)
+            for lock_modifier in get_lock_modifier_combinations():
+                self.root.grab_key(keycode, modifier_mask | lock_modifier, True, X.GrabModeAsync, X.GrabModeAsync,
+                                   onerror=catch_error)
+            self.display.sync()
+            if catch_error.get_error():
+                error_list.append(f'The hotkey {key_combo} is already grabbed by another program.')
+                continue
+            self.hotkey_dict[(keycode, modifier_mask)] = mode
+        return error_list
+
+    def get_mode_for_key(self, keycode, state):
+        """Returns the mode of the hotkey with the given keycode and modifier state. Returns None, if there is none.
+        """
+        modifier_mask = state & ~get_lock_modifier_combinations()[-1]
+        return self.hotkey_dict.get((keycode, modifier_mask))
+
+    def get_next_mode(self, screen_setup):
+        """Returns the mode following the current mode in the order of the buttons enabled in the Customize section.
+        """
+        from multi_mon import MODE_TUPLE
+        possible_mode_tuple = screen_setup.get_possible_modes()
+        enabled_mode_list = [
+            mode for mode in MODE_TUPLE
+            if mode in possible_mode_tuple and self.config.getboolean('Customize', mode, fallback=False)
+                             ]
+        if not enabled_mode_list:
+            return None
+        current_mode = screen_setup.get_mode_from_randr_state(randr.get_randr_state())
+        if current_mode not in enabled_mode_list:
+            return enabled_mode_list[0]
+        return enabled_mode_list[(enabled_mode_list.index(current_mode) + 1) % len(enabled_mode_list)]
+
+    def switch_to_mode(self, mode):
+        """Changes into the mode with the given label (or the next mode for 'cycle') like the MultiMon dialog does and
+        shows the new mode as hint, if enabled.
+        """
+        from multi_mon import ScreenSetup, MODE_TUPLE, MODE_TOOL_TIP_TUPLE, load_screen_config
+        self.config = self.config_cache.get_config()
+        tuples_all_screens = load_screen_config(self.config)
+        if mode == CYCLE_KEY:
+            mode = self.get_next_mode(ScreenSetup(*tuples_all_screens))
+            if mode is None:
+                return
+        switch_result = SwitchQueue(self.display_name).submit(mode, tuples_all_screens)
+        if switch_result:
+            auto_profiles.remember_mode(mode, tuples_all_screens)
+        elif switch_result is not None:
+            print(switch_result)
+        if self.config.getboolean(HOTKEYS_SECTION, HINT_KEY, fallback=False) and shutil.which('notify-send'):
+            description = dict(zip(MODE_TUPLE, MODE_TOOL_TIP_TUPLE)).get(mode, mode)
+            if switch_result is not None and not switch_result:
+                description = f'{description} failed'
+            subprocess.Popen(('notify-send', '--expire-time=1500', 'MultiMon', description))
+
+    def run(self):
+        """Waits for hotkeys until interrupted.
+        """
+        while True:
+            x_event = self.display.next_event()
+            if x_event.type != X.KeyPress:
+                continue
+            mode = self.get_mode_for_key(x_event.detail, x_event.state)
+            if mode is not None:
+                self.switch_to_mode(mode)
+
+
+def main():
+    if xlib_error is None:
+        print('The hotkeys need python-xlib.')
+        sys.exit(1)
+    # only one listener per display, a second one couldn't grab the keys anyway:
+    #
+    instance_lock = FileLock('hotkeys.lock')
+    if not instance_lock.acquire():
+        sys.exit(0)
+    listener = HotkeyListener()
+    for error_message in listener.grab_hotkeys():
+        print(error_message)
+    if not listener.hotkey_dict:
+        sys.exit(1)
+    try:
+        listener.run()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import gc
+import sys
+import json
+import time
+import select
+import argparse
+import tempfile
+import functools
+import subprocess
+import configparser
+from pathlib import Path
+import fake_xrandr
+
+# Long running MultiMon processes, which can be benchmarked:
+TARGET_TUPLE = ('dialog', 'tray', 'settings')
+# Share of the cycles run before the baseline sample, so caches and lazily created objects are filled:
+WARM_UP_SHARE = 0.2
+SAMPLE_COUNT = 10
+XVFB_START_SECONDS = 10
+FAKE_XRANDR = Path(fake_xrandr.__file__).resolve()
+# Screens of the generated conf file, a laptop panel and a monitor of the default state of the fake Xrandr:
+SCREEN_TUPLE = (('eDP-1', '1920x1080', '60.00', 'main'), ('HDMI-1', '1920x1080', '75.00', 'secondary'))
+
+
+def get_rss_kb():
+    """Returns the resident set size of this process in KiB.
+    """
+    with open('/proc/self/statm', 'r') as statm_file:
+        resident_pages = int(statm_file.read().split()[1])
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def get_context_switch_count():
+    """Returns the number of context switches of all threads of this process, i.e. the number of times any of them
+    was woken up.
+    """
+    switch_count = 0
+    for task_dir in Path('/proc/self/task').iterdir():
+        try:
+            status = (task_dir / 'status').read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith(('voluntary_ctxt_switches:', 'nonvoluntary_ctxt_switches:')):
+                switch_count += int(line.split()[1])
+    return switch_count
+
+
+def count_qobjects(app):
+    """Returns the number of QObjects reachable from the application and its top level widgets.
+    """
+    from PyQt5.QtCore import QObject
+    return sum(1 + len(qobject.findChildren(QObject)) for qobject in (app, *app.topLevelWidgets()))
+
+
+def count_server_pixmaps(display):
+    """Returns the number of pixmaps all clients hold in the X server (XRes extension). Returns None, if python-xlib
+    isn't installed or the X server doesn't support XRes.
+    """
+    if display is None or not display.has_extension('X-Resource'):
+        return None
+    pixmap_count = 0
+    for client in display.res_query_clients().clients:
+        for resource_type in display.res_query_client_resources(client.resource_base).types:
+            if display.get_atom_name(resource_type.resource_type) == 'PIXMAP':
+                pixmap_count += resource_type.count
+    return pixmap_count
+
+
+def settle(app):
+    """Processes all pending events including deferred deletions, which the event loop only runs at its top level.
+    """
+    from PyQt5.QtCore import QEvent
+    app.processEvents()
+    app.sendPostedEvents(None, QEvent.DeferredDelete)
+    app.processEvents()
+
+
+def switch_mode(screen_setup, tuples_all_screens, mode):
+    """Changes into the mode with the given label like a MultiMon process does, without asking to keep it.
+    Returns the SwitchResult.
+    """
+    from switch_queue import SwitchQueue
+    command = screen_setup.get_command_for_mode(mode)
+    return SwitchQueue().run_or_submit(functools.partial(screen_setup.change_to_prepared_mode, mode, command),
+                                       mode, tuples_all_screens)
+
+
+def make_driver(target):
+    """Creates the long running MultiMon process of the given target in this process.
+    Returns a tuple (function showing and hiding it once, function switching into the mode with the given label or
+    None, labels of the modes to switch into).
+    """
+    from PyQt5.QtCore import QPoint
+    from multi_mon import MultiMon, MODE_TUPLE
+    if target == 'dialog':
+        tool = MultiMon()
+
+        def show_and_hide():
+            tool.showFullScreen()
+            tool.reload_config()
+            tool.hide()
+        screen_setup, tuples_all_screens, config = tool.screen_setup, tool.all_screens_tuple, tool.config
+    elif target == 'tray':
+        from tray import MultiMonTray
+        tray = MultiMonTray()
+        tray.show()
+
+        def show_and_hide():
+            tray.menu.popup(QPoint(0, 0))
+            tray.menu.hide()
+            tray.invalidate_randr_state()
+        screen_setup, tuples_all_screens, config = tray.screen_setup, tray.tuples_all_screens, tray.config
+    else:
+        from settings_main import SettingsMainWindow
+        settings_window = SettingsMainWindow()
+
+        def show_and_hide():
+            settings_window.show()
+            settings_window.reload_window()
+            settings_window.probe_thread.wait()
+            settings_window.edid_thread.wait()
+            settings_window.hide()
+        return show_and_hide, None, ()
+    mode_tuple = tuple(
+        mode for mode in MODE_TUPLE
+        if mode in screen_setup.get_possible_modes() and config.getboolean('Customize', mode, fallback=False)
+                       )
+    return show_and_hide, functools.partial(switch_mode, screen_setup, tuples_all_screens), mode_tuple
+
+
+def measure_idle_wakeups(app, idle_seconds):
+    """Runs the event loop for the given seconds without any input. Returns the number of wakeups of all threads
+    per minute, not counting the timer ending the measurement.
+    """
+    from PyQt5.QtCore import QTimer
+    switch_count_list = []
+
+    def stop():
+        switch_count_list.append(get_context_switch_count())
+        app.quit()
+    switch_count_list.append(get_context_switch_count())
+    QTimer.singleShot(int(idle_seconds * 1000), stop)
+    app.exec_()
+    wakeup_count = max(0, switch_count_list[1] - switch_count_list[0] - 1)
+    return wakeup_count * 60 / idle_seconds
+
+
+def run_target(target, cycle_count, switch_every, idle_seconds):
+    """Starts the given target in this process, runs the given number of show/hide cycles and a mode switch every
+    given number of cycles, and measures the idle wakeups afterwards.
+    Returns a dict {'target', 'samples': list of {'cycle', 'rss_kb', 'qobjects', 'pixmaps'}, 'idle_wakeups_per_minute',
+    'cycle_seconds', 'switches', 'failed_switches'}. The first sample is taken after the warm-up.
+    """
+    from PyQt5 import QtWidgets
+    import randr
+    app = QtWidgets.QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    display = randr.open_x_display()
+    show_and_hide, switch_function, mode_tuple = make_driver(target)
+    warm_up_count = max(1, int(cycle_count * WARM_UP_SHARE))
+    sample_every = max(1, (cycle_count - warm_up_count) // SAMPLE_COUNT)
+    sample_list = []
+    switch_count = failed_switch_count = 0
+    start_time = time.monotonic()
+    for cycle in range(1, cycle_count + 1):
+        show_and_hide()
+        if switch_function is not None and mode_tuple and switch_every and cycle % switch_every == 0:
+            switch_result = switch_function(mode_tuple[cycle // switch_every % len(mode_tuple)])
+            switch_count += 1
+            if not switch_result:
+                failed_switch_count += 1
+                if failed_switch_count == 1:
+                    print(f'Switch failed: {switch_result}', file=sys.stderr)
+        settle(app)
+        if cycle == warm_up_count or cycle > warm_up_count and (cycle - warm_up_count) % sample_every == 0:
+            gc.collect()
+            settle(app)
+            sample_list.append({'cycle': cycle, 'rss_kb': get_rss_kb(), 'qobjects': count_qobjects(app),
+                                'pixmaps': count_server_pixmaps(display)})
+    cycle_seconds = (time.monotonic() - start_time) / cycle_count
+    return {'target': target, 'samples': sample_list, 'cycle_seconds': cycle_seconds,
+            'switches': switch_count, 'failed_switches': failed_switch_count,
+            'idle_wakeups_per_minute': measure_idle_wakeups(app, idle_seconds)}
+
+
+def get_failures(result, max_rss_growth_kb, max_idle_wakeups):
+    """Returns a list of the failed limits of the given benchmark result (see 'run_target').
+    """
+    baseline, final = result['samples'][0], result['samples'][-1]
+    failure_list = []
+    # a benchmark without working mode switches would miss their leaks:
+    #
+    if result['failed_switches']:
+        failure_list.append(f'{result["failed_switches"]} of {result["switches"]} mode switches failed')
+    if final['rss_kb'] - baseline['rss_kb'] > max_rss_growth_kb:
+        failure_list.append(f'RSS grew by {final["rss_kb"] - baseline["rss_kb"]} KiB after the warm-up '
+                            f'(limit {max_rss_growth_kb} KiB)')
+    if final['qobjects'] > baseline['qobjects']:
+        failure_list.append(f'{final["qobjects"] - baseline["qobjects"]} QObjects leaked')
+    if final['pixmaps'] is not None and final['pixmaps'] > baseline['pixmaps']:
+        failure_list.append(f'{final["pixmaps"] - baseline["pixmaps"]} pixmaps leaked in the X server')
+    if result['idle_wakeups_per_minute'] > max_idle_wakeups:
+        failure_list.append(f'{result["idle_wakeups_per_minute"]:.1f} wakeups per minute while idle '
+                            f'(limit {max_idle_wakeups})')
+    return failure_list
+
+
+def start_xvfb(screen_size='1920x1080x24'):
+    """Starts Xvfb with a screen of the given size on a free display number. Returns a tuple (Xvfb process, display
+    name). Raises OSError, if Xvfb couldn't be started.
+    """
+    read_descriptor, write_descriptor = os.pipe()
+    xvfb_proc = subprocess.Popen(('Xvfb', '-displayfd', str(write_descriptor), '-screen', '0', screen_size,
+                                  '-nolisten', 'tcp'), pass_fds=(write_descriptor,), stderr=subprocess.DEVNULL)
+    os.close(write_descriptor)
+    with os.fdopen(read_descriptor, 'r') as display_pipe:
+        readable, _, _ = select.select([display_pipe], [], [], XVFB_START_SECONDS)
+        display_number = display_pipe.readline().strip() if readable else ''
+    if not display_number:
+        xvfb_proc.kill()
+        raise OSError('Xvfb didn\'t report its display.')
+    return xvfb_proc, f':{display_number}'
+
+
+def make_benchmark_config():
+    """Returns a config parser with the conf file of the benchmark: the screens of the default state of the fake
+    Xrandr (see 'fake_xrandr.make_default_state') with a button for each of their modes and no hooks.
+    """
+    from multi_mon import MODE_TUPLE, ScreenSetup
+    config = configparser.ConfigParser()
+    config['Screens'] = {'screen_count': str(len(SCREEN_TUPLE)), 'tv_count': '0'}
+    for screen_nr, (port, resolution, rate, screen_type) in enumerate(SCREEN_TUPLE):
+        config['Screens'].update({f'port_screen_{screen_nr}': port, f'resolution_screen_{screen_nr}': resolution,
+                                  f'rate_screen_{screen_nr}': rate, f'type_screen_{screen_nr}': screen_type})
+    config['Mode'] = {'edge': 'right', 'reclaim_outputs': 'false', 'revert_timeout': '0'}
+    possible_mode_tuple = ScreenSetup(*SCREEN_TUPLE, config=config).get_possible_modes()
+    config['Customize'] = {mode: str(mode in possible_mode_tuple) for mode in MODE_TUPLE}
+    config['Customize']['button_count'] = str(len(possible_mode_tuple))
+    return config
+
+
+def run_benchmark(args):
+    """Runs every target of the given arguments in its own process on one Xvfb server and prints the results.
+    The processes get a clean environment without desktop session, a generated conf file in a temporary directory and
+    the fake Xrandr, so they never touch the screens, the conf file or the caches of the user.
+    Returns True, if all targets stayed within the limits.
+    """
+    try:
+        xvfb_proc, display_name = start_xvfb()
+    except OSError as error:
+        print(f'Could not start Xvfb: {error}')
+        return False
+    all_passed = True
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_dir = Path(temp_dir) / 'config'
+            config_dir.mkdir()
+            with (config_dir / 'multi_mon_conf.conf').open('w') as conf_file:
+                make_benchmark_config().write(conf_file)
+            env = {'PATH': os.environ.get('PATH', os.defpath), 'HOME': temp_dir, 'DISPLAY': display_name,
+                   'XDG_RUNTIME_DIR': temp_dir, 'QT_QPA_PLATFORM': 'xcb', 'MULTI_MON_CONFIG_DIR': str(config_dir),
+                   'MULTI_MON_XRANDR': str(FAKE_XRANDR),
+                   'MULTI_MON_FAKE_XRANDR_STATE': str(Path(temp_dir) / 'fake_xrandr_state.json')}
+            for target in args.targets:
+                result_file = Path(temp_dir) / f'{target}.json'
+                subprocess.run((sys.executable, __file__, '--child', str(result_file), target,
+                                '--cycles', str(args.cycles), '--switch-every', str(args.switch_every),
+                                '--idle-seconds', str(args.idle_seconds)), env=env, stdout=subprocess.DEVNULL)
+                try:
+                    result = json.loads(result_file.read_text())
+                except (OSError, ValueError):
+                    print(f'{target}: failed to run')
+                    all_passed = False
+                    continue
+                failure_list = get_failures(result, args.max_rss_growth, args.max_idle_wakeups)
+                baseline, final = result['samples'][0], result['samples'][-1]
+                print(f'{target}: {"FAIL" if failure_list else "ok"} ({result["cycle_seconds"] * 1000:.1f} ms per '
+                      f'cycle, {result["switches"] - result["failed_switches"]} switches, RSS {baseline["rss_kb"]} -> '
+                      f'{final["rss_kb"]} KiB, QObjects {baseline["qobjects"]} -> {final["qobjects"]}, '
+                      f'pixmaps {baseline["pixmaps"]} -> {final["pixmaps"]}, '
+                      f'{result["idle_wakeups_per_minute"]:.1f} idle wakeups per minute)')
+                for failure in failure_list:
+                    print(f'    {failure}')
+                all_passed = all_passed and not failure_list
+    finally:
+        xvfb_proc.terminate()
+        xvfb_proc.wait()
+    return all_passed
+
+
+def parse_arguments(argument_list=None):
+    """Returns the parsed arguments of the given argument list (default: the command line). Benchmarks all targets, if
+    none is given.
+    """
+    parser = argparse.ArgumentParser(
+        description='Measure the idle footprint of long running MultiMon processes under Xvfb with the fake screens '
+                    'of fake_xrandr.py.'
+                                     )
+    parser.add_argument('targets', nargs='*', metavar='target',
+                        help=f'processes to benchmark (default: all of {", ".join(TARGET_TUPLE)})')
+    parser.add_argument('--cycles', type=int, default=2000, help='show/hide cycles (default: 2000)')
+    parser.add_argument('--switch-every', type=int, default=10,
+                        help='cycles between two mode switches, 0 for none (default: 10)')
+    parser.add_argument('--idle-seconds', type=float, default=60.0,
+                        help='seconds measuring the idle wakeups (default: 60)')
+    parser.add_argument('--max-rss-growth', type=int, default=1024,
+                        help='RSS growth in KiB after the warm-up, which fails the benchmark (default: 1024)')
+    parser.add_argument('--max-idle-wakeups', type=float, default=0.0,
+                        help='idle wakeups per minute, which fail the benchmark (default: 0)')
+    parser.add_argument('--child', metavar='RESULT_FILE', help=argparse.SUPPRESS)
+    args = parser.parse_args(argument_list)
+    # argparse checks a default list and an empty list against the choices as a whole, so the targets are checked and
+    # filled in after parsing:
+    #
+    unknown_target_list = [target for target in args.targets if target not in TARGET_TUPLE]
+    if unknown_target_list:
+        parser.error(f'invalid targets: {", ".join(unknown_target_list)} (choose from {", ".join(TARGET_TUPLE)})')
+    args.targets = args.targets or list(TARGET_TUPLE)
+    return args
+
+
+def main():
+    args = parse_arguments()
+    if args.child:
+        result = run_target(args.targets[0], args.cycles, args.switch_every, args.idle_seconds)
+        Path(args.child).write_text(json.dumps(result))
+        return
+    sys.exit(0 if run_benchmark(args) else 1)
+
+
+if __name__ == '__main__':
+    main()
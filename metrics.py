@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import json
+import time
+import fcntl
+import atexit
+import tempfile
+import threading
+import collections
+from pathlib import Path
+from config_store import read_config
+
+# Conf file section with the options 'textfile' (path of the .prom file read by the textfile collector of
+# node_exporter) and 'interval' (seconds between two writes):
+METRICS_SECTION = 'Metrics'
+DEFAULT_INTERVAL = 60.0
+# Upper bounds of the latency histogram buckets in seconds:
+BUCKET_TUPLE = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Totals in the state file, see 'MetricsSink.load_state', and the version of its format:
+STATE_NAME_TUPLE = ('switches', 'switch_durations', 'phase_durations')
+STATE_VERSION = 2
+
+
+def get_desktop_environment():
+    """Returns the name of the running desktop environment with additional commands around a mode change:
+    'kde', 'cinnamon' or 'other'.
+    """
+    if os.environ.get('KDE_FULL_SESSION') == 'true':
+        return 'kde'
+    if os.environ.get('DESKTOP_SESSION') == 'cinnamon':
+        return 'cinnamon'
+    return 'other'
+
+
+def escape_label_value(value):
+    """Returns the given label value escaped for the Prometheus text format.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(label_dict):
+    """Returns the given labels {name: value} in the Prometheus text format, e.g. '{mode="tv_only"}'.
+    """
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in label_dict.items()) + '}'
+
+
+def add_to_histogram(histogram, seconds):
+    """Adds the given observation in seconds to the given histogram {'buckets': counts, 'sum': seconds, 'count': n}.
+    """
+    for index, upper_bound in enumerate(BUCKET_TUPLE):
+        if seconds <= upper_bound:
+            histogram['buckets'][index] += 1
+    histogram['sum'] += seconds
+    histogram['count'] += 1
+
+
+def get_histogram_lines(name, label_dict, histogram):
+    """Returns the lines of the given histogram in the Prometheus text format with cumulative buckets.
+    """
+    line_list = [
+        f'{name}_bucket{format_labels({**label_dict, "le": upper_bound})} {count}'
+        for upper_bound, count in zip(BUCKET_TUPLE, histogram['buckets'])
+                 ]
+    line_list.append(f'{name}_bucket{format_labels({**label_dict, "le": "+Inf"})} {histogram["count"]}')
+    line_list.append(f'{name}_sum{format_labels(label_dict)} {histogram["sum"]}')
+    line_list.append(f'{name}_count{format_labels(label_dict)} {histogram["count"]}')
+    return line_list
+
+
+class MetricsSink(object):
+    """Counts the mode changes per mode, desktop environment and result and keeps latency histograms of the mode
+    changes and the desktop environment phases. The observing methods only append to a deque, without lock or file
+    I/O. A writer thread drains the deque every interval and at exit, adds the new observations to the totals of all
+    MultiMon processes and writes them atomically in the Prometheus textfile collector format. The writer thread is
+    started by the first observation of every process, so forked processes get their own. Processes, which exit
+    without running the atexit handlers (e.g. the workers of a multiprocessing pool), have to call 'flush'.
+    Does nothing, if no textfile is given.
+    """
+    def __init__(self, textfile=None, interval=DEFAULT_INTERVAL):
+        self.textfile = Path(textfile) if textfile else None
+        self.interval = interval
+        self.observation_queue = collections.deque()
+        self.flush_lock = threading.Lock()
+        self.writer_pid = None
+        if self.textfile is not None:
+            self.state_file = self.textfile.with_name(f'{self.textfile.name}.state.json')
+            atexit.register(self.flush)
+            os.register_at_fork(after_in_child=self.reset_after_fork)
+
+    @classmethod
+    def from_config(cls):
+        """Returns a MetricsSink with the options of the Metrics section of the conf file.
+        """
+        config = read_config()
+        return cls(config.get(METRICS_SECTION, 'textfile', fallback=None),
+                   config.getfloat(METRICS_SECTION, 'interval', fallback=DEFAULT_INTERVAL))
+
+    def start_writer(self):
+        """Starts the writer thread of this process, if it isn't running yet.
+        """
+        if self.writer_pid != os.getpid():
+            self.writer_pid = os.getpid()
+            threading.Thread(target=self.write_periodically, daemon=True).start()
+
+    def reset_after_fork(self):
+        """Drops the observations and the lock state inherited by a forked child process, which are the parent's.
+        The writer thread of the child is started by its first observation. Runs in the child after a fork.
+        """
+        self.observation_queue.clear()
+        self.flush_lock = threading.Lock()
+
+    def observe_switch(self, mode, success, seconds):
+        """Records a mode change into the mode with the given label, its result and its duration.
+        """
+        if self.textfile is not None:
+            self.start_writer()
+            self.observation_queue.append(('switch', mode, get_desktop_environment(), bool(success), seconds))
+
+    def observe_phase(self, desktop_environment, phase, seconds):
+        """Records the duration of a phase of a mode change in the given desktop environment: 'mode_change' or the name
+        of a hook run around it, e.g. 'suspend_compositor' of KDE.
+        """
+        if self.textfile is not None:
+            self.start_writer()
+            self.observation_queue.append(('phase', desktop_environment, phase, seconds))
+
+    def write_periodically(self):
+        """Writes the metrics every interval. Runs in the writer thread.
+        """
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def load_state(self):
+        """Returns the totals of all MultiMon processes: {'switches': {(mode, desktop environment, result): count},
+        'switch_durations': {(mode, desktop environment): histogram}, 'phase_durations': {(desktop environment, phase):
+        histogram}}. The state file holds every total as a list of its labels followed by its value, so the labels can
+        contain any character. Returns empty totals, if the state file can't be read or has another format.
+        """
+        try:
+            with self.state_file.open('r') as state_file:
+                saved_state = json.load(state_file)
+            if saved_state['version'] == STATE_VERSION:
+                return {name: {tuple(entry[:-1]): entry[-1] for entry in saved_state[name]}
+                        for name in STATE_NAME_TUPLE}
+        except (OSError, ValueError, TypeError, KeyError, IndexError):
+            pass
+        return {name: {} for name in STATE_NAME_TUPLE}
+
+    @staticmethod
+    def dump_state(state):
+        """Returns the given totals (see 'load_state') as content of the state file.
+        """
+        saved_state = {name: [[*labels, value] for labels, value in state[name].items()] for name in STATE_NAME_TUPLE}
+        return json.dumps({'version': STATE_VERSION, **saved_state})
+
+    def add_observations(self, state):
+        """Drains the observation deque into the given totals. Returns the number of observations.
+        """
+        observation_count = 0
+        while self.observation_queue:
+            observation = self.observation_queue.popleft()
+            observation_count += 1
+            if observation[0] == 'switch':
+                _, mode, desktop_environment, success, seconds = observation
+                key = (mode, desktop_environment, 'success' if success else 'failure')
+                state['switches'][key] = state['switches'].get(key, 0) + 1
+                histogram_dict, key = state['switch_durations'], (mode, desktop_environment)
+            else:
+                _, desktop_environment, phase, seconds = observation
+                histogram_dict, key = state['phase_durations'], (desktop_environment, phase)
+            histogram = histogram_dict.setdefault(key, {'buckets': [0] * len(BUCKET_TUPLE), 'sum': 0.0, 'count': 0})
+            add_to_histogram(histogram, seconds)
+        return observation_count
+
+    @staticmethod
+    def get_textfile_content(state):
+        """Returns the given totals in the Prometheus text format.
+        """
+        line_list = ['# HELP multi_mon_switches_total Mode changes by mode, desktop environment and result.',
+                     '# TYPE multi_mon_switches_total counter']
+        for (mode, desktop_environment, result), count in sorted(state['switches'].items()):
+            line_list.append(
+                f'multi_mon_switches_total'
+                f'{format_labels({"mode": mode, "desktop_environment": desktop_environment, "result": result})} {count}'
+                             )
+        line_list += ['# HELP multi_mon_switch_duration_seconds Duration of the mode changes.',
+                      '# TYPE multi_mon_switch_duration_seconds histogram']
+        for (mode, desktop_environment), histogram in sorted(state['switch_durations'].items()):
+            line_list += get_histogram_lines('multi_mon_switch_duration_seconds',
+                                             {'mode': mode, 'desktop_environment': desktop_environment}, histogram)
+        line_list += ['# HELP multi_mon_desktop_environment_phase_duration_seconds Duration of the mode changes and '
+                      'of the hooks run around them.',
+                      '# TYPE multi_mon_desktop_environment_phase_duration_seconds histogram']
+        for (desktop_environment, phase), histogram in sorted(state['phase_durations'].items()):
+            line_list += get_histogram_lines('multi_mon_desktop_environment_phase_duration_seconds',
+                                             {'desktop_environment': desktop_environment, 'phase': phase}, histogram)
+        return '\n'.join(line_list) + '\n'
+
+    def write_atomically(self, target_file, content):
+        """Writes the given content to a hidden temp file next to the given file and renames it over the file.
+        """
+        file_descriptor, temp_file = tempfile.mkstemp(dir=target_file.parent, prefix=f'.{target_file.name}.')
+        with os.fdopen(file_descriptor, 'w') as output_file:
+            output_file.write(content)
+        os.chmod(temp_file, 0o644)
+        os.replace(temp_file, target_file)
+
+    def flush(self):
+        """Adds the pending observations to the totals of all MultiMon processes and writes the textfile.
+        """
+        if self.textfile is None or not self.observation_queue:
+            return
+        with self.flush_lock:
+            try:
+                with open(self.textfile.with_name(f'.{self.textfile.name}.lock'), 'w') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    state = self.load_state()
+                    if not self.add_observations(state):
+                        return
+                    # the textfile is rendered before the state is saved, so a total it can't render isn't kept:
+                    #
+                    textfile_content = self.get_textfile_content(state)
+                    self.write_atomically(self.state_file, self.dump_state(state))
+                    self.write_atomically(self.textfile, textfile_content)
+            except OSError as error:
+                print(f'Could not write the metrics: {error}')
+
+
+METRICS = MetricsSink.from_config()
@@ -2,15 +2,30 @@
 # -*- coding: utf-8 -*
 
 import sys
-import os
+import json
+import time
+import functools
 import subprocess
 import configparser
 from pathlib import Path
-from PyQt5.QtGui import QIcon, QCursor
+from PyQt5.QtGui import QCursor
 from PyQt5 import QtWidgets
-from PyQt5.QtCore import Qt, QSize
-
-CONF_FILE = Path(__file__).parent / 'multi_mon_conf.conf'
+from PyQt5.QtCore import Qt, QSize, QTimer, QFileSystemWatcher
+from asset_bundle import ASSETS
+import randr
+from randr import XRANDR
+import auto_profiles
+from switch_queue import SwitchQueue, FileLock
+from transition_planner import TransitionPlanner, TransitionError, get_unreached_outputs, get_partial_command
+from transition_planner import parse_output_arguments, get_argument_value, set_argument_value, get_provider_commands, \
+    get_unused_provider_commands
+from snapshot import make_snapshot, save_snapshot, get_restore_command, undo_last_switch
+from presets import load_presets, save_current_layout, apply_preset
+from window_placement import open_window_placements
+from config_store import CONF_FILE, read_config, get_generation
+from metrics import METRICS, get_desktop_environment
+from hooks import HookPipeline
+from power_policy import load_rate_policies, apply_rate_policies, get_power_source
 
 # Xrandr flags:
 PRIMARY = '--primary'
@@ -19,21 +34,78 @@ LEFT_OF = '--left-of'
 RIGHT_OF = '--right-of'
 SAME_AS = '--same-as'
 
+SCREEN_TYPE_TUPLE = ('main', 'secondary', 'secondary_2', 'tv', 'tv_2')
+# Seconds to wait before each retry of outputs, which didn't reach their target mode:
+RETRY_DELAY_TUPLE = (0.5, 1, 2)
+MODE_TUPLE = ('main_only', 'secondary_extended', 'tv_extended', 'tv_only', 'all_extended',
+              'tv_mirror', 'secondary_mirror', 'secondary_only', 'secondary_2_only', 'secondary_2_extended',
+              'secondary_2_mirror', 'tv_2_only', 'tv_2_extended', 'tv_2_mirror'
+              )
+MODE_TOOL_TIP_TUPLE = ('Main monitor only', 'Extended on secondary monitor', 'Extended on TV', 'TV only',
+                       'Extended on all screens', 'Mirror on TV', 'Mirror on secondary monitor',
+                       'Secondary monitor only', 'Secondary 2 monitor only', 'Extended on secondary 2 monitor',
+                       'Mirror on secondary 2 monitor', 'TV 2 only', 'Extended on TV 2', 'Mirror on TV 2'
+                       )
+# Mode labels of the metrics for direct calls of 'ScreenSetup.change_to_given_mode' and for undoing a switch:
+CUSTOM_MODE_LABEL = 'custom'
+UNDO_MODE_LABEL = 'undo'
+# Number of transition plans a ScreenSetup keeps, see 'ScreenSetup.get_plan':
+PLAN_CACHE_SIZE = 64
+
 
-def desktop_environment_decorator(func):
-    """Decorator to run additional commands for specific desktop environments. (KDE plasma and cinnamon supported yet)
+def load_screen_config(config, section='Screens'):
+    """Loads all the screen values of the given section (default: Screens) from the given config parser to a tuple of
+    tuples (port, resolution, rate, screen_type) for each screen ordered from left to right and returns it.
     """
-    def desktop_environment_wrapper(*args_mode, **kwargs_mode_screen_type):
-        if os.environ.get('KDE_FULL_SESSION') == 'true':
-            subprocess.run("qdbus org.kde.KWin /Compositor suspend", shell=True)
-            func(*args_mode, **kwargs_mode_screen_type)
-            subprocess.run("qdbus org.kde.KWin /Compositor resume", shell=True)
-        if os.environ.get('DESKTOP_SESSION') == 'cinnamon':
-            func(*args_mode, **kwargs_mode_screen_type)
-            subprocess.run("killall cinnamon", shell=True)
-        else:
-            func(*args_mode, **kwargs_mode_screen_type)
-    return desktop_environment_wrapper
+    screens = config[section]
+    screen_count = int(screens['screen_count'])
+    screen_tuple = ()
+    for screen_nr in range(screen_count if screen_count > 2 else 3):
+        if screens.get(f'port_screen_{screen_nr}'):
+            screen_tuple += ((
+                                 screens[f'port_screen_{screen_nr}'],
+                                 screens[f'resolution_screen_{screen_nr}'],
+                                 screens[f'rate_screen_{screen_nr}'],
+                                 screens[f'type_screen_{screen_nr}']
+                             ),)
+    return screen_tuple
+
+
+def hook_pipeline_decorator(mode_label=None):
+    """Returns a decorator of a mode changing method of ScreenSetup, which runs the pre and post hooks (see
+    'hooks.HookPipeline') of the mode with the given label around it, by default of the mode in
+    'ScreenSetup.mode_label'. Only the blocking pre hooks delay the method, the other hooks run in the background.
+    The post hooks run even if the method raises an exception, so e.g. the compositor is always resumed.
+    Adds the results of the hooks to the returned SwitchResult as they finish and records the duration of the method
+    in the metrics.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def hook_pipeline_wrapper(screen_setup, *args_mode, **kwargs_mode_screen_type):
+            mode = mode_label or screen_setup.mode_label
+            hook_pipeline = HookPipeline.from_config(screen_setup.config, screen_setup.display_name)
+            hook_result_list = hook_pipeline.run_blocking(mode)
+            hook_pipeline.start_background('pre', mode, hook_result_list)
+            start_time = time.monotonic()
+            try:
+                switch_result = func(screen_setup, *args_mode, **kwargs_mode_screen_type)
+            finally:
+                METRICS.observe_phase(get_desktop_environment(), 'mode_change', time.monotonic() - start_time)
+                hook_pipeline.start_background('post', mode, hook_result_list)
+            switch_result.hook_results = hook_result_list
+            return switch_result
+        return hook_pipeline_wrapper
+    return decorator
+
+
+def ask_to_keep_mode(config):
+    """Asks to keep the new mode, if a revert timeout is set in the given config parser. Returns False, if the user
+    chose to revert or didn't answer within the timeout.
+    """
+    revert_timeout = config.getint('Mode', 'revert_timeout', fallback=0)
+    if revert_timeout <= 0:
+        return True
+    return ConfirmModeDialog(revert_timeout).exec_() == QtWidgets.QMessageBox.Yes
 
 
 class MultiMon(QtWidgets.QDialog):
@@ -42,43 +114,47 @@ class MultiMon(QtWidgets.QDialog):
     def __init__(self, parent=None):
 
         super().__init__(parent)
-        self.config = configparser.ConfigParser()
-        self.config.read(CONF_FILE)
-        self.screen_count = int(self.config['Screens']['screen_count'])
-        self.tv_count = int(self.config['Screens']['tv_count'])
-        self.setWindowIcon(QIcon(str(Path(__file__).parent / 'icons' / 'tray_icon.svg')))
-        with open(Path(__file__).parent / 'stylesheets' / 'multi_mon.stylesheet', 'r') as style_sheet_file:
-            self.setStyleSheet(style_sheet_file.read())
-        self.all_screens_tuple = self.load_screen_config()
-        self.type_list = [screen_tuple[3] for screen_tuple in self.all_screens_tuple]
-        self.screen_setup = ScreenSetup(*self.all_screens_tuple)
+        self.config_generation = get_generation()
+        self.config = read_config()
+        self.setWindowIcon(ASSETS.icon(Path('icons') / 'tray_icon.svg'))
+        self.setStyleSheet(ASSETS.style_sheet('multi_mon.stylesheet'))
+        self.load_screen_values()
         self.setAttribute(Qt.WA_TranslucentBackground, True)
         self.push_button_transparent = QtWidgets.QPushButton()
-        self.button_dict = self.make_buttons()
+        self.horizontal_layout, self.vertical_frame, self.vertical_layout = self.make_layout()
+        self.button_dict = {}
+        self.preset_button_dict = {}
+        self.button_style = None
+        self.update_buttons()
+        self.dock_column()
         current_mode = self.screen_setup.check_current_mode()
         if current_mode in self.button_dict:
             self.button_dict[current_mode].setDefault(True)
         self.connect_buttons()
+        self.conf_watcher = QFileSystemWatcher(self)
+        self.watch_conf_file()
+        self.conf_watcher.fileChanged.connect(self.reload_config)
+        self.conf_watcher.directoryChanged.connect(self.reload_config_if_new_generation)
+
+    def load_screen_values(self):
+        """Loads the screen count, the tv count, the screen tuples, the screen types and the ScreenSetup from the
+        config parser.
+        """
+        self.screen_count = int(self.config['Screens']['screen_count'])
+        self.tv_count = int(self.config['Screens']['tv_count'])
+        self.all_screens_tuple = self.load_screen_config()
+        self.type_list = [screen_tuple[3] for screen_tuple in self.all_screens_tuple]
+        self.screen_setup = ScreenSetup(*self.all_screens_tuple, config=self.config)
 
     def load_screen_config(self):
         """Loads all the screen values from config parser to a tuple of tuples (port, resolution, rate, screen_type)
         for each screen ordered from left to right and returns it.
         """
-        screen_tuple = ()
-        for screen_nr in range(self.screen_count if self.screen_count > 2 else 3):
-            if self.config['Screens'][f'port_screen_{screen_nr}']:
-                screen_tuple += ((
-                                     self.config['Screens'][f'port_screen_{screen_nr}'],
-                                     self.config['Screens'][f'resolution_screen_{screen_nr}'],
-                                     self.config['Screens'][f'rate_screen_{screen_nr}'],
-                                     self.config['Screens'][f'type_screen_{screen_nr}']
-                                 ),)
-        return screen_tuple
-
-    def make_buttons(self):
-        """Creates and places the screen mode selection buttons and the transparent button.
-        Returns dictionary {label: selection button} of all created buttons depending on
-        the button settings made in 'CustomizeWindow' in settings_main.
+        return load_screen_config(self.config)
+
+    def make_layout(self):
+        """Creates the layout of the transparent button and the column of the selection buttons.
+        Returns a tuple (horizontal layout, frame of the column, layout of the column).
         """
         horizontal_layout = QtWidgets.QHBoxLayout(self)
         horizontal_layout.setContentsMargins(0, 0, 0, 0)
@@ -93,44 +169,131 @@ class MultiMon(QtWidgets.QDialog):
         vertical_frame = QtWidgets.QFrame()
         vertical_layout = QtWidgets.QVBoxLayout(vertical_frame)
         vertical_layout.setSpacing(8)
+        return horizontal_layout, vertical_frame, vertical_layout
+
+    def make_button(self, label):
+        """Creates the selection button of the mode with the given label and connects it.
+        """
+        push_button = QtWidgets.QPushButton(self.vertical_frame)
+        push_button.setSizePolicy(QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum,
+                                                        QtWidgets.QSizePolicy.Expanding))
+        push_button.setCursor(QCursor(Qt.PointingHandCursor))
+        push_button.setToolTip(MODE_TOOL_TIP_TUPLE[MODE_TUPLE.index(label)])
+        push_button.clicked.connect(getattr(self, f'switch_to_{label}'))
+        return push_button
 
-        button_tuple = ('main_only', 'secondary_extended', 'tv_extended', 'tv_only', 'all_extended',
-                        'tv_mirror', 'secondary_mirror', 'secondary_only', 'secondary_2_only', 'secondary_2_extended',
-                        'secondary_2_mirror', 'tv_2_only', 'tv_2_extended', 'tv_2_mirror'
-                        )
-        tool_tips_tuple = ('Main monitor only', 'Extended on secondary monitor', 'Extended on TV', 'TV only',
-                           'Extended on all screens', 'Mirror on TV', 'Mirror on secondary monitor',
-                           'Secondary monitor only', 'Secondary 2 monitor only', 'Extended on secondary 2 monitor',
-                           'Mirror on secondary 2 monitor', 'TV 2 only', 'Extended on TV 2', 'Mirror on TV 2'
-                           )
+    def update_buttons(self):
+        """Creates, removes and re-icons the screen mode selection buttons depending on the button settings made in
+        'CustomizeWindow' in settings_main and the screen setup. Only touches the buttons, which changed, and keeps
+        them in the order of MODE_TUPLE.
+        """
         icon_dir = self.get_icon_dir_name(self.screen_count, self.type_list)
-        size_policy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         button_count = int(self.config['Customize']['button_count'])
         size_factor = -0.1*button_count + 1.6
         icon_width, icon_height = self.define_icon_size(self.screen_count, self.tv_count, self.type_list)
-        button_dict = {}
-        for index, label in enumerate(button_tuple):
-            if self.config.getboolean('Customize', label):
-                push_button = QtWidgets.QPushButton(vertical_frame)
-                push_button.setSizePolicy(size_policy)
-                push_button.setMinimumWidth(int(300*size_factor))
+        icon_size = QSize(int(icon_width*size_factor), int(icon_height*size_factor))
+        button_style = (icon_dir, int(300*size_factor), icon_size)
+        restyle_all = button_style != self.button_style
+        self.button_style = button_style
+
+        enabled_label_list = [label for label in MODE_TUPLE if self.config.getboolean('Customize', label)]
+        for label in tuple(self.button_dict):
+            if label not in enabled_label_list:
+                push_button = self.button_dict.pop(label)
+                self.vertical_layout.removeWidget(push_button)
+                push_button.deleteLater()
+        for index, label in enumerate(enabled_label_list):
+            push_button = self.button_dict.get(label)
+            if push_button is None:
+                push_button = self.make_button(label)
+                self.vertical_layout.insertWidget(index, push_button)
+                self.button_dict[label] = push_button
+            elif not restyle_all:
+                continue
+            push_button.setMinimumWidth(button_style[1])
+            push_button.setIconSize(button_style[2])
+            push_button.setIcon(ASSETS.icon(icon_dir / f"{label}.svg"))
+        self.update_preset_buttons()
+
+    def update_preset_buttons(self):
+        """Creates a text button below the mode buttons for every preset saved with '--save-current' and removes the
+        buttons of presets, which don't exist any more.
+        """
+        name_list = sorted(load_presets())
+        for name in tuple(self.preset_button_dict):
+            if name not in name_list:
+                push_button = self.preset_button_dict.pop(name)
+                self.vertical_layout.removeWidget(push_button)
+                push_button.deleteLater()
+        for name in name_list:
+            push_button = self.preset_button_dict.get(name)
+            if push_button is None:
+                push_button = QtWidgets.QPushButton(name, self.vertical_frame)
+                push_button.setSizePolicy(QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum,
+                                                                QtWidgets.QSizePolicy.Minimum))
                 push_button.setCursor(QCursor(Qt.PointingHandCursor))
-                push_button.setIconSize(QSize(int(icon_width*size_factor), int(icon_height*size_factor)))
-                vertical_layout.addWidget(push_button)
-                push_button.setIcon(QIcon(str(icon_dir / f"{label}.svg")))
-                push_button.setToolTip(tool_tips_tuple[index])
-                button_dict[label] = push_button
+                push_button.setToolTip(f'Preset {name}')
+                push_button.clicked.connect(functools.partial(self.switch_to_preset, name))
+                self.vertical_layout.addWidget(push_button)
+                self.preset_button_dict[name] = push_button
+            push_button.setMinimumWidth(self.button_style[1])
 
+    def dock_column(self):
+        """Places the column of the selection buttons at the edge of the screen set in the conf file.
+        """
+        self.horizontal_layout.removeWidget(self.push_button_transparent)
+        self.horizontal_layout.removeWidget(self.vertical_frame)
         if self.config['Mode']['edge'] == 'right':
-            vertical_layout.setContentsMargins(12, 0, 0, 0)
-            horizontal_layout.addWidget(self.push_button_transparent)
-            horizontal_layout.addWidget(vertical_frame)
+            self.vertical_layout.setContentsMargins(12, 0, 0, 0)
+            self.horizontal_layout.addWidget(self.push_button_transparent)
+            self.horizontal_layout.addWidget(self.vertical_frame)
         else:
-            vertical_layout.setContentsMargins(0, 0, 12, 0)
-            horizontal_layout.addWidget(vertical_frame)
-            horizontal_layout.addWidget(self.push_button_transparent)
+            self.vertical_layout.setContentsMargins(0, 0, 12, 0)
+            self.horizontal_layout.addWidget(self.vertical_frame)
+            self.horizontal_layout.addWidget(self.push_button_transparent)
 
-        return button_dict
+    def watch_conf_file(self):
+        """Watches the conf file and its directory, which notices a conf file replaced by a new one.
+        """
+        for path in (CONF_FILE, CONF_FILE.parent):
+            if path.exists() and str(path) not in self.conf_watcher.files() + self.conf_watcher.directories():
+                self.conf_watcher.addPath(str(path))
+
+    def reload_config_if_new_generation(self):
+        """Reloads the conf file after a change of its directory, if the conf file was replaced by a new generation.
+        """
+        if get_generation() != self.config_generation:
+            self.reload_config()
+
+    def reload_config(self):
+        """Rereads the conf file after it changed and applies the changed sections without rebuilding the dialog:
+        updates the changed buttons and re-docks the column, if the edge changed. Keeps the old config, if the conf
+        file is incomplete.
+        """
+        self.watch_conf_file()
+        generation = get_generation()
+        try:
+            config = read_config()
+            load_screen_config(config)
+            config.getint('Customize', 'button_count')
+            edge = config['Mode']['edge']
+        except (KeyError, ValueError, configparser.Error):
+            return
+        changed_section_set = {
+            section for section in ('Screens', 'Mode', 'Customize')
+            if dict(config[section]) != dict(self.config[section])
+                               }
+        self.config_generation = generation
+        if not changed_section_set:
+            return
+        old_edge = self.config['Mode']['edge']
+        self.config = config
+        if changed_section_set & {'Screens', 'Mode'}:
+            self.load_screen_values()
+        if changed_section_set & {'Screens', 'Customize'}:
+            self.update_buttons()
+        if edge != old_edge:
+            self.dock_column()
 
     @staticmethod
     def define_icon_size(screen_count, tv_count, type_list):
@@ -176,155 +339,284 @@ class MultiMon(QtWidgets.QDialog):
         return icon_dir
 
     def connect_buttons(self):
-        """Connects the buttons depending on the current monitor setup.
+        """Connects the transparent button. The selection buttons are connected when they are created.
         """
         self.push_button_transparent.clicked.connect(self.close)
-        for label in self.button_dict:
-            self.button_dict[label].clicked.connect(getattr(self, f'switch_to_{label}'))
+
+    def switch_to_mode(self, mode):
+        """Changes current mode to the mode with the given label, remembers it as auto profile for the connected
+        screens and closes MultiMon. The switch is queued behind a switch in progress of another MultiMon process.
+        """
+        self.hide()
+        switch_result = SwitchQueue().submit(mode, self.all_screens_tuple)
+        if switch_result and not self.confirm_mode():
+            print(undo_last_switch())
+        elif switch_result:
+            auto_profiles.remember_mode(mode, self.all_screens_tuple)
+        elif switch_result is not None:
+            print(switch_result)
+        self.close()
+
+    def switch_to_preset(self, name):
+        """Changes into the preset with the given name and closes MultiMon. Waits for a switch in progress of another
+        MultiMon process.
+        """
+        self.hide()
+        switch_result = apply_preset(name)
+        if switch_result and not self.confirm_mode():
+            print(undo_last_switch())
+        elif switch_result is not None and not switch_result:
+            print(switch_result)
+        self.close()
+
+    def confirm_mode(self):
+        """Asks to keep the new mode, if a revert timeout is set in the conf file. Returns False, if the user chose
+        to revert or didn't answer within the timeout.
+        """
+        return ask_to_keep_mode(self.config)
 
     def switch_to_main_only(self):
         """Changes current mode to main screen only.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=OFF
-                                               )
-        self.close()
+        self.switch_to_mode('main_only')
 
     def switch_to_tv_only(self):
         """Changes current mode to tv only.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=OFF, tv_pos=PRIMARY, tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=OFF
-                                               )
-        self.close()
+        self.switch_to_mode('tv_only')
 
     def switch_to_tv_2_only(self):
         """Changes current mode to tv_2 only.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=OFF, tv_pos=OFF, tv_2_pos=PRIMARY, secondary_pos=OFF, secondary_2_pos=OFF
-                                               )
-        self.close()
+        self.switch_to_mode('tv_2_only')
 
     def switch_to_secondary_only(self):
         """Changes current mode to secondary only.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=OFF, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=PRIMARY, secondary_2_pos=OFF
-                                               )
-        self.close()
+        self.switch_to_mode('secondary_only')
 
     def switch_to_secondary_2_only(self):
         """Changes current mode to secondary_2 only.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=OFF, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=PRIMARY
-                                               )
-        self.close()
+        self.switch_to_mode('secondary_2_only')
 
     def switch_to_secondary_extended(self):
         """Changes current mode to main screen extended to secondary screen.
         """
-        if self.type_list.index('main') < self.type_list.index('secondary'):
-            self.screen_setup.change_to_given_mode(
-                    main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=(RIGHT_OF, 'main'), secondary_2_pos=OFF
-                                                   )
-        else:
-            self.screen_setup.change_to_given_mode(
-                    main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=(LEFT_OF, 'main'), secondary_2_pos=OFF
-                                                   )
-        self.close()
+        self.switch_to_mode('secondary_extended')
 
     def switch_to_tv_extended(self):
         """Changes current mode to main screen extended to tv.
         """
-        if self.type_list.index('main') < self.type_list.index('tv'):
-            self.screen_setup.change_to_given_mode(
-                    main_pos=PRIMARY, tv_pos=(RIGHT_OF, 'main'), tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=OFF
-                                                   )
-        else:
-            self.screen_setup.change_to_given_mode(
-                    main_pos=PRIMARY, tv_pos=(LEFT_OF, 'main'), tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=OFF
-                                                   )
-        self.close()
+        self.switch_to_mode('tv_extended')
 
     def switch_to_secondary_2_extended(self):
         """Changes current mode to main screen extended to secondary_2 screen.
         """
-        if self.type_list.index('main') < self.type_list.index('secondary_2'):
-            self.screen_setup.change_to_given_mode(
-                    main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=(RIGHT_OF, 'main')
-                                                   )
-        else:
-            self.screen_setup.change_to_given_mode(
-                    main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=(LEFT_OF, 'main')
-                                                   )
-        self.close()
+        self.switch_to_mode('secondary_2_extended')
 
     def switch_to_tv_2_extended(self):
         """Changes current mode to main screen extended to tv_2.
         """
-        if self.type_list.index('main') < self.type_list.index('tv_2'):
-            self.screen_setup.change_to_given_mode(
-                    main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=(RIGHT_OF, 'main'), secondary_pos=OFF, secondary_2_pos=OFF
-                                                   )
-        else:
-            self.screen_setup.change_to_given_mode(
-                    main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=(LEFT_OF, 'main'), secondary_pos=OFF, secondary_2_pos=OFF
-                                                   )
-        self.close()
+        self.switch_to_mode('tv_2_extended')
 
     def switch_to_tv_mirror(self):
         """Changes current mode to main screen mirrored to tv.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=PRIMARY, tv_pos=(SAME_AS, 'main'), tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=OFF
-                                               )
-        self.close()
+        self.switch_to_mode('tv_mirror')
 
     def switch_to_secondary_mirror(self):
         """Changes current mode to main screen mirrored to the secondary screen.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=(SAME_AS, 'main'), secondary_2_pos=OFF
-                                               )
-        self.close()
+        self.switch_to_mode('secondary_mirror')
 
     def switch_to_tv_2_mirror(self):
         """Changes current mode to main screen mirrored to tv_2.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=(SAME_AS, 'main'), secondary_pos=OFF, secondary_2_pos=OFF
-                                               )
-        self.close()
+        self.switch_to_mode('tv_2_mirror')
 
     def switch_to_secondary_2_mirror(self):
         """Changes current mode to main screen mirrored to the secondary_2 screen.
         """
-        self.screen_setup.change_to_given_mode(
-            main_pos=PRIMARY, tv_pos=OFF, tv_2_pos=OFF, secondary_pos=OFF, secondary_2_pos=(SAME_AS, 'main'),
-                                               )
-        self.close()
+        self.switch_to_mode('secondary_2_mirror')
 
     def switch_to_all_extended(self):
         """Changes current mode to main screen extended to all screens.
         """
-        if self.screen_count >= 3:
-            if self.type_list[0] == 'main':
-                self.screen_setup.change_to_given_mode(PRIMARY, (RIGHT_OF, 0), (RIGHT_OF, 1))
-            if self.type_list[1] == 'main':
-                self.screen_setup.change_to_given_mode((LEFT_OF, 1), PRIMARY, (RIGHT_OF, 1))
-            if self.type_list[2] == 'main':
-                self.screen_setup.change_to_given_mode((LEFT_OF, 1), (LEFT_OF, 2), PRIMARY)
-        self.close()
+        self.switch_to_mode('all_extended')
+
+
+class ConfirmModeDialog(QtWidgets.QMessageBox):
+    """Asks to keep the new mode and counts down the given seconds. Answers 'No' when the time is up.
+    """
+    def __init__(self, revert_timeout, parent=None):
+        super().__init__(parent)
+        self.remaining_seconds = revert_timeout
+        self.setWindowTitle('MultiMon')
+        self.setIcon(QtWidgets.QMessageBox.Question)
+        self.setStandardButtons(QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+        self.button(QtWidgets.QMessageBox.Yes).setText('Keep')
+        self.button(QtWidgets.QMessageBox.No).setText('Revert')
+        self.setDefaultButton(QtWidgets.QMessageBox.No)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.count_down)
+        self.timer.start(1000)
+        self.update_text()
+
+    def update_text(self):
+        """Shows the remaining seconds until the mode is reverted.
+        """
+        self.setText(f'Keep this display mode?\nReverting in {self.remaining_seconds} s.')
+
+    def count_down(self):
+        """Counts down one second and answers 'No', if the time is up.
+        """
+        self.remaining_seconds -= 1
+        if self.remaining_seconds > 0:
+            self.update_text()
+        else:
+            self.timer.stop()
+            self.done(QtWidgets.QMessageBox.No)
+
+
+class SwitchResult(object):
+    """Result of a mode change with 'ScreenSetup.change_to_given_mode'. True if all outputs reached their target.
+    """
+    def __init__(self, command):
+        self.command = command
+        self.success = False
+        self.error = ''
+        self.xrandr_log = []
+        self.retried_outputs = ()
+        self.unreached_outputs = ()
+        self.reclaimed_outputs = ()
+        self.hook_results = []
+        self.duration = 0.0
+
+    def __bool__(self):
+        return self.success
+
+    def __str__(self):
+        if self.success:
+            if self.reclaimed_outputs:
+                return (f'Mode changed in {self.duration:.2f} s. '
+                        f'Turned off outputs outside the screen setup: {", ".join(self.reclaimed_outputs)}')
+            return f'Mode changed in {self.duration:.2f} s.'
+        return '\n'.join((self.error, *self.xrandr_log))
 
 
 class ScreenSetup(object):
     """The multi screen setup, with port, resolution, rate and type of each screen. Takes the tuples
     (port, resolution, rate, screen type) for every screen of the setup ordered from left to right.
+    If reclaim_outputs is True, every mode change turns off the active outputs outside the screen setup. Defaults to
+    the option reclaim_outputs of the Mode section of the given config parser (default: the conf file), which also
+    holds the rate policies and the hooks.
+    Changes the given X display (default: $DISPLAY): Xrandr and the hooks run with it as $DISPLAY.
     """
-    def __init__(self, *tuples_all_screens):
+    def __init__(self, *tuples_all_screens, reclaim_outputs=None, config=None, display_name=None):
         self.tuples_all_screens = tuples_all_screens
+        self.display_name = display_name
+        if config is None:
+            config = read_config()
+        if reclaim_outputs is None:
+            reclaim_outputs = config.getboolean('Mode', 'reclaim_outputs', fallback=False)
+        self.config = config
+        self.reclaim_outputs = reclaim_outputs
+        self.rate_policies = load_rate_policies(config)
+        self.mode_label = CUSTOM_MODE_LABEL
+        self.plan_dict = {}
+
+    def get_type_list(self):
+        """Returns a list of the screen types of all screens ordered from left to right.
+        """
+        return [tuple_screen[3] for tuple_screen in self.tuples_all_screens]
+
+    def get_mode_arguments(self, mode):
+        """Returns a tuple (args_mode, kwargs_mode_screen_type) of the arguments for 'change_to_given_mode' to change
+        into the mode with the given label, for example 'tv_extended'. Returns None, if the mode isn't possible
+        with the screen setup.
+        """
+        type_list = self.get_type_list()
+        if mode == 'all_extended':
+            if len(type_list) < 3:
+                return None
+            if type_list[0] == 'main':
+                return (PRIMARY, (RIGHT_OF, 0), (RIGHT_OF, 1)), {}
+            if type_list[1] == 'main':
+                return ((LEFT_OF, 1), PRIMARY, (RIGHT_OF, 1)), {}
+            return ((LEFT_OF, 1), (LEFT_OF, 2), PRIMARY), {}
+
+        screen_type, layout = mode.rsplit('_', 1)
+        if screen_type not in type_list or 'main' not in type_list:
+            return None
+        kwargs_mode_screen_type = {f'{type_name}_pos': OFF for type_name in SCREEN_TYPE_TUPLE}
+        if layout == 'only':
+            kwargs_mode_screen_type[f'{screen_type}_pos'] = PRIMARY
+        elif layout == 'extended':
+            kwargs_mode_screen_type['main_pos'] = PRIMARY
+            if type_list.index('main') < type_list.index(screen_type):
+                kwargs_mode_screen_type[f'{screen_type}_pos'] = (RIGHT_OF, 'main')
+            else:
+                kwargs_mode_screen_type[f'{screen_type}_pos'] = (LEFT_OF, 'main')
+        elif layout == 'mirror':
+            kwargs_mode_screen_type['main_pos'] = PRIMARY
+            kwargs_mode_screen_type[f'{screen_type}_pos'] = (SAME_AS, 'main')
+        else:
+            return None
+        return (), kwargs_mode_screen_type
+
+    def switch_to_mode(self, mode):
+        """Changes the current monitor setup to the mode with the given label, for example 'tv_extended'.
+        Returns a SwitchResult, which is true if successful.
+        """
+        mode_arguments = self.get_mode_arguments(mode)
+        if mode_arguments is None:
+            switch_result = SwitchResult(())
+            switch_result.error = f'The mode {mode} isn\'t possible with the screen setup.'
+            return switch_result
+        self.mode_label = mode
+        try:
+            return self.change_to_given_mode(*mode_arguments[0], **mode_arguments[1])
+        finally:
+            self.mode_label = CUSTOM_MODE_LABEL
+
+    def get_possible_modes(self):
+        """Returns a tuple of the labels of all modes possible with the screen setup.
+        """
+        return tuple(mode for mode in MODE_TUPLE if self.get_mode_arguments(mode) is not None)
+
+    def get_command_for_mode(self, mode):
+        """Returns the full Xrandr command to change into the mode with the given label. Returns None, if the mode isn't
+        possible with the screen setup.
+        """
+        mode_arguments = self.get_mode_arguments(mode)
+        if mode_arguments is None:
+            return None
+        args_mode, kwargs_mode_screen_type = mode_arguments
+        if args_mode:
+            args_mode = self.allow_call_by_type_or_nr_args(*args_mode)
+        if kwargs_mode_screen_type:
+            kwargs_mode_screen_type = self.allow_call_by_type_kwargs(**kwargs_mode_screen_type)
+        return self.get_full_command_for_given_mode(*args_mode, **kwargs_mode_screen_type)
+
+    def get_mode_from_randr_state(self, randr_state):
+        """Returns the label of the mode, whose layout matches the given RandR state (see 'randr.get_randr_state').
+        Works without Qt, unlike 'check_current_mode'. Returns None, if no mode of the screen setup matches.
+        """
+        outputs_dict = randr_state['outputs']
+        port_tuple = tuple(tuple_screen[0] for tuple_screen in self.tuples_all_screens)
+        current_layout = tuple(outputs_dict[port]['geometry'] if port in outputs_dict else None for port in port_tuple)
+        planner = TransitionPlanner(randr_state)
+        for mode in self.get_possible_modes():
+            try:
+                layout_dict = planner.get_target_layout(
+                    self.get_mirror_command(self.get_command_for_mode(mode), randr_state)
+                                                        )
+            except TransitionError:
+                continue
+            if tuple(layout_dict.get(port) for port in port_tuple) == current_layout:
+                return mode
+        return None
 
     def check_current_mode(self):
         """Returns a string containing the current monitor mode.
@@ -377,7 +669,7 @@ class ScreenSetup(object):
                         ('--same-as', relative_screen)
         The relative screen is given by a string containing the port.
         """
-        command = ('xrandr',)
+        command = (XRANDR,)
         # if called with the related screen types as keyword arguments:
         #
         if kwargs_mode_screen_type:
@@ -395,12 +687,11 @@ class ScreenSetup(object):
                 command += self.get_part_of_command_for_given_monitor(mode, *tuple_screen[:3])
         return command
 
-    @desktop_environment_decorator
     def change_to_given_mode(self, *args_mode, **kwargs_mode_screen_type):
-        """Changes the current monitor setup to the new monitor setup with xrandr. Takes the wished mode
-        of each screen either as positional arguments ordered from the left screen to the right screen or as keyword
-        arguments for the related screen type.
-        Returns True if successful. Returns False and prints Xrandr output, if errors appeared.
+        """Changes the current monitor setup to the new monitor setup with xrandr (see 'change_to_command'). Takes the
+        wished mode of each screen either as positional arguments ordered from the left screen to the right screen or as
+        keyword arguments for the related screen type.
+        Returns a SwitchResult, which is true if successful.
         kwargs: main_pos, secondary_pos, secondary_2_pos, tv_pos, tv_2_pos.
         Possible values: '--off',
                         '--primary',
@@ -413,16 +704,224 @@ class ScreenSetup(object):
             args_mode = self.allow_call_by_type_or_nr_args(*args_mode)
         if kwargs_mode_screen_type:
             kwargs_mode_screen_type = self.allow_call_by_type_kwargs(**kwargs_mode_screen_type)
+        return self.change_to_command(self.get_full_command_for_given_mode(*args_mode, **kwargs_mode_screen_type))
 
-        command = self.get_full_command_for_given_mode(*args_mode, **kwargs_mode_screen_type)
-        
-        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
-            log_xrandr = proc.stdout.readlines()
+    def change_to_prepared_mode(self, mode, command):
+        """Changes into the mode with the given label with its full Xrandr command prepared beforehand by
+        'get_command_for_mode', e.g. at the start of a long running process.
+        Returns a SwitchResult, which is true if successful.
+        """
+        self.mode_label = mode
+        try:
+            return self.change_to_command(command)
+        finally:
+            self.mode_label = CUSTOM_MODE_LABEL
 
-        if log_xrandr:
-            print(log_xrandr)
-            return False
-        return True
+    def get_plan(self, command, randr_state):
+        """Returns a tuple (final Xrandr command, tuple of the Xrandr commands of the transition, tuple of the reclaimed
+        ports) for a change from the given RandR state to the target of the given full Xrandr command of a mode: with
+        the rates of the rate policies, the mirror modes and the stray outputs turned off (see 'change_to_command').
+        The plans are kept for the RandR state, the power source and the command, so a mode change from a RandR state
+        planned before, e.g. by a tray menu when it is shown, runs its Xrandr commands without planning them again.
+        Raises TransitionError, if the target is impossible.
+        """
+        power_source = get_power_source() if self.rate_policies else None
+        plan_key = (command, json.dumps(randr_state, sort_keys=True), power_source)
+        plan = self.plan_dict.get(plan_key)
+        if plan is not None:
+            return plan
+        if self.rate_policies:
+            command = apply_rate_policies(command, randr_state, self.rate_policies, power_source)
+        command = self.get_mirror_command(command, randr_state)
+        reclaimed_port_tuple = self.get_stray_outputs(randr_state) if self.reclaim_outputs else ()
+        for port in reclaimed_port_tuple:
+            command += ('--output', port, OFF)
+        plan = (command, TransitionPlanner(randr_state).plan(command), reclaimed_port_tuple)
+        if len(self.plan_dict) >= PLAN_CACHE_SIZE:
+            self.plan_dict.clear()
+        self.plan_dict[plan_key] = plan
+        return plan
+
+    @hook_pipeline_decorator()
+    def change_to_command(self, command):
+        """Changes the current monitor setup to the target of the given full Xrandr command of a mode.
+        Sets up the providers of outputs on a secondary GPU first, if needed.
+        The transition is planned by the TransitionPlanner and may take more than one Xrandr command. Afterwards the
+        RandR state is verified and outputs, which didn't reach their target, are retried with increasing delays.
+        Windows are moved back to the outputs they were on, when these are enabled again. Active outputs outside the
+        screen setup are turned off in the same transition, if reclaim_outputs is set. The rates of outputs with a rate
+        policy are chosen by the policy for the current power source. The plan is reused, if the RandR state didn't
+        change since it was made (see 'get_plan').
+        Returns a SwitchResult, which is true if successful.
+        """
+        switch_result = SwitchResult(command)
+        start_time = time.monotonic()
+        # snapshot of the state before the switch for 'undo_last_switch':
+        #
+        randr_state = randr.get_randr_state(self.display_name)
+        save_snapshot(make_snapshot(randr_state), self.display_name)
+        # outputs of a secondary GPU only work after its provider was set up as output sink:
+        #
+        provider_command_tuple = get_provider_commands(command, randr_state, self.display_name)
+        for provider_command in provider_command_tuple:
+            switch_result.xrandr_log += self.run_xrandr_command(provider_command)
+        if provider_command_tuple:
+            randr_state = randr.get_randr_state(self.display_name)
+            # providers set up without driving a target output are detached again:
+            #
+            unused_provider_command_tuple = get_unused_provider_commands(command, randr_state, provider_command_tuple,
+                                                                         self.display_name)
+            for provider_command in unused_provider_command_tuple:
+                switch_result.xrandr_log += self.run_xrandr_command(provider_command)
+            if unused_provider_command_tuple:
+                randr_state = randr.get_randr_state(self.display_name)
+        try:
+            switch_result.command, command_tuple, switch_result.reclaimed_outputs = self.get_plan(command, randr_state)
+        except TransitionError as error:
+            switch_result.error = f'Impossible mode: {error}'
+            switch_result.duration = time.monotonic() - start_time
+            METRICS.observe_switch(self.mode_label, switch_result, switch_result.duration)
+            return switch_result
+
+        window_placements = open_window_placements(self.display_name)
+        try:
+            if window_placements is not None:
+                window_placements.record(randr_state)
+            for step_command in command_tuple:
+                switch_result.xrandr_log += self.run_xrandr_command(step_command)
+            randr_state = self.verify_switch(switch_result, switch_result.command)
+            if window_placements is not None:
+                window_placements.restore(randr_state)
+        finally:
+            if window_placements is not None:
+                window_placements.close()
+        switch_result.duration = time.monotonic() - start_time
+        METRICS.observe_switch(self.mode_label, switch_result, switch_result.duration)
+        return switch_result
+
+    def restore_snapshot(self, snapshot, mode=UNDO_MODE_LABEL):
+        """Restores the RandR state of the given snapshot (see 'snapshot.make_snapshot') as the mode with the given
+        label (default: undo) with one Xrandr command (see 'change_to_snapshot').
+        Returns a SwitchResult, which is true if successful.
+        """
+        self.mode_label = mode
+        try:
+            return self.change_to_snapshot(snapshot)
+        finally:
+            self.mode_label = CUSTOM_MODE_LABEL
+
+    @hook_pipeline_decorator()
+    def change_to_snapshot(self, snapshot):
+        """Restores the RandR state of the given snapshot (see 'snapshot.make_snapshot') with one Xrandr command and
+        saves a snapshot of the current state before. Moves the windows back to their outputs like a mode change.
+        Returns a SwitchResult, which is true if successful.
+        """
+        command = get_restore_command(snapshot)
+        switch_result = SwitchResult(command)
+        start_time = time.monotonic()
+        randr_state = randr.get_randr_state(self.display_name)
+        save_snapshot(make_snapshot(randr_state), self.display_name)
+        window_placements = open_window_placements(self.display_name)
+        try:
+            if window_placements is not None:
+                window_placements.record(randr_state)
+            switch_result.xrandr_log += self.run_xrandr_command(command)
+            randr_state = self.verify_switch(switch_result, command)
+            if window_placements is not None:
+                window_placements.restore(randr_state)
+        finally:
+            if window_placements is not None:
+                window_placements.close()
+        switch_result.duration = time.monotonic() - start_time
+        METRICS.observe_switch(self.mode_label, switch_result, switch_result.duration)
+        return switch_result
+
+    def verify_switch(self, switch_result, command):
+        """Compares the RandR state with the target of the given Xrandr command, retries the outputs which didn't
+        reach their target with increasing delays and stores the outcome in the given SwitchResult.
+        Returns the RandR state after the switch.
+        """
+        # Some drivers accept the command, but drop an output afterwards (e.g. TVs slow to handshake).
+        # Retry only the outputs which didn't reach their target:
+        #
+        randr_state = randr.get_randr_state(self.display_name)
+        unreached_port_tuple = get_unreached_outputs(randr_state, command)
+        for retry_delay in RETRY_DELAY_TUPLE:
+            if not unreached_port_tuple:
+                break
+            time.sleep(retry_delay)
+            switch_result.retried_outputs += unreached_port_tuple
+            switch_result.xrandr_log += self.run_xrandr_command(get_partial_command(command, unreached_port_tuple))
+            randr_state = randr.get_randr_state(self.display_name)
+            unreached_port_tuple = get_unreached_outputs(randr_state, command)
+
+        switch_result.unreached_outputs = unreached_port_tuple
+        switch_result.success = not unreached_port_tuple
+        if unreached_port_tuple:
+            switch_result.error = f'Outputs not reaching their target mode: {", ".join(unreached_port_tuple)}'
+        return randr_state
+
+    def get_stray_outputs(self, randr_state):
+        """Returns a tuple of the ports of all outputs, which are active in the given RandR state but not part of the
+        screen setup, e.g. a previously docked monitor or a dummy plug. They keep a CRTC and enlarge the framebuffer.
+        """
+        port_tuple = tuple(tuple_screen[0] for tuple_screen in self.tuples_all_screens)
+        return tuple(
+            port for port, output in randr_state['outputs'].items()
+            if output['geometry'] is not None and port not in port_tuple
+                     )
+
+    @staticmethod
+    def get_mirror_mode(arguments, relative_arguments, common_mode_tuple):
+        """Returns a tuple (resolution, rate) for an output with the given arguments mirroring the output with the given
+        relative arguments, chosen from the given modes supported by both outputs (best first).
+        The configured resolution and rate of the mirrored screen win, if both outputs support them, then the ones of
+        the mirroring screen. A configured resolution without a rate gets the best rate of both outputs.
+        Returns None, if the outputs have no mode in common.
+        """
+        for mode_arguments in (relative_arguments, arguments):
+            resolution = get_argument_value(mode_arguments, '--mode')
+            rate = get_argument_value(mode_arguments, '--rate')
+            for common_mode in common_mode_tuple:
+                if common_mode[0] == resolution and rate in (None, common_mode[1]):
+                    return common_mode
+        return common_mode_tuple[0] if common_mode_tuple else None
+
+    def get_mirror_command(self, command, randr_state):
+        """Returns the given Xrandr command with the best mode supported by both outputs set for every output mirroring
+        another output ('--same-as') and for the mirrored output. Avoids panning, cropping and falling back to a low
+        rate, if the configured resolutions or rates of the screens differ.
+        """
+        outputs_dict = randr_state['outputs']
+        output_arguments_dict = parse_output_arguments(command)
+        for port, arguments in output_arguments_dict.items():
+            relative_port = get_argument_value(arguments, SAME_AS)
+            if relative_port not in output_arguments_dict or OFF in arguments:
+                continue
+            if port not in outputs_dict or relative_port not in outputs_dict:
+                continue
+            relative_arguments = output_arguments_dict[relative_port]
+            common_mode_tuple = randr.get_common_modes(randr.freeze_mode_table(outputs_dict[relative_port]['modes']),
+                                                       randr.freeze_mode_table(outputs_dict[port]['modes']))
+            mirror_mode = self.get_mirror_mode(arguments, relative_arguments, common_mode_tuple)
+            if mirror_mode is None:
+                continue
+            for mirror_arguments in (arguments, relative_arguments):
+                set_argument_value(mirror_arguments, '--mode', mirror_mode[0])
+                set_argument_value(mirror_arguments, '--rate', mirror_mode[1])
+
+        mirror_command = (command[0],)
+        for port, arguments in output_arguments_dict.items():
+            mirror_command += ('--output', port, *arguments)
+        return mirror_command
+
+    def run_xrandr_command(self, command):
+        """Runs the given Xrandr command on the X display of the screen setup. Returns a list of the lines Xrandr
+        printed.
+        """
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              env=randr.get_display_environment(self.display_name)) as proc:
+            return [line.decode('utf-8', 'replace').rstrip('\n') for line in proc.stdout.readlines()]
 
     def allow_call_by_type_or_nr_args(self, *args_mode):
         """Adds the possibility to define the relative screen of the modes (left_of, right_of, same_as) by the related
@@ -488,8 +987,54 @@ def open_settings(app):
 
 
 def main():
+    # e.g. bound to a keyboard shortcut to recover blindly from a switch without a usable screen:
+    #
+    if '--undo' in sys.argv[1:]:
+        switch_result = undo_last_switch()
+        print(switch_result if switch_result is not None else 'No switch to undo.')
+        sys.exit(0 if switch_result else 1)
+    # layouts the modes can't express, e.g. a rotated secondary monitor, captured and replayed as named presets:
+    #
+    for option in ('--save-current', '--apply'):
+        if option not in sys.argv[1:]:
+            continue
+        name_list = sys.argv[sys.argv.index(option) + 1:sys.argv.index(option) + 2]
+        if not name_list or name_list[0].startswith('--'):
+            print(f'{option} needs the name of a preset.')
+            sys.exit(2)
+        if option == '--save-current':
+            try:
+                save_current_layout(name_list[0])
+            except OSError as error:
+                print(f'Could not save the preset {name_list[0]}: {error}')
+                sys.exit(1)
+            print(f'Saved the current layout as preset {name_list[0]}.')
+            sys.exit(0)
+        switch_result = apply_preset(name_list[0])
+        if switch_result is None:
+            print(f'No preset {name_list[0]}. Saved presets: {", ".join(sorted(load_presets())) or "none"}')
+        else:
+            print(switch_result)
+        sys.exit(0 if switch_result else 1)
     app = QtWidgets.QApplication(sys.argv)
+    if CONF_FILE.is_file() and '--tray' in sys.argv[1:]:
+        from tray import MultiMonTray
+        if not QtWidgets.QSystemTrayIcon.isSystemTrayAvailable():
+            print('No system tray found.')
+            sys.exit(1)
+        instance_lock = FileLock('tray.lock')
+        if not instance_lock.acquire():
+            sys.exit(0)
+        app.setQuitOnLastWindowClosed(False)
+        tray = MultiMonTray()
+        tray.show()
+        sys.exit(app.exec_())
     if CONF_FILE.is_file():
+        # only one MultiMon dialog per display, e.g. if the shortcut was pressed twice:
+        #
+        instance_lock = FileLock('instance.lock')
+        if not instance_lock.acquire():
+            sys.exit(0)
         tool = MultiMon()
         tool.showFullScreen()
         sys.exit(app.exec_())
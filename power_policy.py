@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import sys
+import time
+import functools
+from pathlib import Path
+import randr
+from randr import XRANDR
+from switch_queue import SwitchQueue
+from config_store import ConfigCache
+from transition_planner import parse_output_arguments, get_argument_value, set_argument_value
+
+# Power supplies of the kernel, can be replaced by a stand-in with the environment variable MULTI_MON_POWER_SUPPLY:
+POWER_SUPPLY_DIR = Path(os.environ.get('MULTI_MON_POWER_SUPPLY', '/sys/class/power_supply'))
+# Conf file section with the rate policy of each output, e.g. 'HDMI-0 = ac:max battery:60':
+RATE_POLICY_SECTION = 'Rate policy'
+POWER_SOURCE_TUPLE = ('ac', 'battery')
+# Power supply types of the kernel, which power the machine from outside:
+EXTERNAL_SUPPLY_TYPE_TUPLE = ('Mains', 'USB', 'USB_C', 'USB_PD', 'USB_PD_DRP', 'Wireless')
+# Seconds between two power source checks:
+POLL_SECONDS = 5.0
+# Label of the rate changes of the PowerSourceWatcher in the metrics and in the 'modes' option of hooks:
+RATE_POLICY_MODE_LABEL = 'rate_policy'
+
+
+def read_supply_attribute(supply_dir, attribute):
+    """Returns the stripped content of the given attribute file of a power supply. Returns an empty string, if it
+    can't be read.
+    """
+    try:
+        return (supply_dir / attribute).read_text().strip()
+    except OSError:
+        return ''
+
+
+def get_power_source(power_supply_dir=POWER_SUPPLY_DIR):
+    """Returns 'battery', if the machine has a battery and no external power supply is online. Returns 'ac' otherwise,
+    also for machines without battery.
+    """
+    has_battery = False
+    try:
+        supply_dir_list = list(Path(power_supply_dir).iterdir())
+    except OSError:
+        return 'ac'
+    for supply_dir in supply_dir_list:
+        supply_type = read_supply_attribute(supply_dir, 'type')
+        if supply_type == 'Battery':
+            if read_supply_attribute(supply_dir, 'scope') != 'Device':
+                has_battery = True
+        elif supply_type in EXTERNAL_SUPPLY_TYPE_TUPLE and read_supply_attribute(supply_dir, 'online') == '1':
+            return 'ac'
+    return 'battery' if has_battery else 'ac'
+
+
+def parse_rate_policy(policy):
+    """Parses a rate policy like 'ac:max battery:60'. Returns a dict {power source: 'max', 'min' or rate}.
+    Raises ValueError, if the policy is invalid.
+    """
+    policy_dict = {}
+    for rule in policy.split():
+        power_source, _, rate = rule.partition(':')
+        if power_source not in POWER_SOURCE_TUPLE:
+            raise ValueError(f'Unknown power source {power_source} in the rate policy {policy}, possible power '
+                             f'sources: {", ".join(POWER_SOURCE_TUPLE)}.')
+        if rate not in ('max', 'min'):
+            float(rate)
+        policy_dict[power_source] = rate
+    return policy_dict
+
+
+def load_rate_policies(config):
+    """Returns a dict {port in lower case (like all conf file keys): rate policy (see 'parse_rate_policy')} of the
+    Rate policy section of the given config parser. Leaves out invalid policies.
+    """
+    if not config.has_section(RATE_POLICY_SECTION):
+        return {}
+    policies_dict = {}
+    for port, policy in config[RATE_POLICY_SECTION].items():
+        try:
+            policies_dict[port] = parse_rate_policy(policy)
+        except ValueError as error:
+            print(f'Invalid rate policy of {port}: {error}')
+    return policies_dict
+
+
+def select_rate(policy_rate, rate_list):
+    """Returns the rate of the given rate list (sorted from high to low) matching the given policy rate: the highest
+    rate for 'max', the lowest rate for 'min', else the highest rate not above the given rate or the lowest rate.
+    """
+    if policy_rate == 'max':
+        return rate_list[0]
+    if policy_rate == 'min':
+        return rate_list[-1]
+    return next((rate for rate in rate_list if float(rate) < float(policy_rate) + 0.5), rate_list[-1])
+
+
+def apply_rate_policies(command, randr_state, policies_dict, power_source):
+    """Returns the given Xrandr command with the rate of every output with a rate policy set by the policy for the
+    given power source. The rates are chosen from the rates of the target mode in the given RandR state.
+    """
+    outputs_dict = randr_state['outputs']
+    output_arguments_dict = parse_output_arguments(command)
+    for port, arguments in output_arguments_dict.items():
+        policy_rate = policies_dict.get(port.lower(), {}).get(power_source)
+        resolution = get_argument_value(arguments, '--mode')
+        if policy_rate is None or resolution is None or '--off' in arguments:
+            continue
+        rate_list = outputs_dict.get(port, {}).get('modes', {}).get(resolution)
+        if rate_list:
+            set_argument_value(arguments, '--rate', select_rate(policy_rate, rate_list))
+
+    policy_command = (command[0],)
+    for port, arguments in output_arguments_dict.items():
+        policy_command += ('--output', port, *arguments)
+    return policy_command
+
+
+def get_rate_change_command(randr_state, policies_dict, power_source):
+    """Returns an Xrandr command changing the rate of the enabled outputs with a rate policy, whose current rate
+    doesn't match the policy for the given power source. Returns None, if all rates match.
+    """
+    command = (XRANDR,)
+    for port, output in randr_state['outputs'].items():
+        policy_rate = policies_dict.get(port.lower(), {}).get(power_source)
+        rate_list = output['modes'].get(output['mode'] or '')
+        if policy_rate is None or output['geometry'] is None or not rate_list:
+            continue
+        rate = select_rate(policy_rate, rate_list)
+        if rate != output['rate']:
+            command += ('--output', port, '--mode', output['mode'], '--rate', rate)
+    return command if len(command) > 1 else None
+
+
+class PowerSourceWatcher(object):
+    """Changes the rates of the outputs with a rate policy, when the machine is plugged in or unplugged. Only the rates
+    of outputs, whose rate doesn't match the policy for the new power source, are changed. The rate change is a mode
+    change like the others (see 'multi_mon.ScreenSetup.change_to_command'), which can be undone.
+    """
+    def __init__(self, display_name=None, power_supply_dir=POWER_SUPPLY_DIR, poll_seconds=POLL_SECONDS):
+        self.power_supply_dir = power_supply_dir
+        self.poll_seconds = poll_seconds
+        self.config_cache = ConfigCache()
+        self.switch_queue = SwitchQueue(display_name)
+        self.power_source = None
+
+    def change_rates(self, config):
+        """Changes the rates of the outputs with a rate policy in the given config parser, which don't match their
+        policy for the current power source. Returns the SwitchResult or None, if all rates match.
+        """
+        from multi_mon import ScreenSetup
+        command = get_rate_change_command(randr.get_randr_state(), load_rate_policies(config), self.power_source)
+        if command is None:
+            return None
+        # the outputs outside the command are kept as they are:
+        #
+        screen_setup = ScreenSetup(reclaim_outputs=False, config=config)
+        return screen_setup.change_to_prepared_mode(RATE_POLICY_MODE_LABEL, command)
+
+    def apply_rate_policies(self):
+        """Changes the rates of the outputs to their rate policy for the current power source.
+        Returns the SwitchResult or None, if all rates match.
+        """
+        config = self.config_cache.get_config()
+        if not load_rate_policies(config):
+            return None
+        # a switch in progress applies the rate policies itself, but may have read the power source before:
+        #
+        switch_result = self.switch_queue.run_exclusively(functools.partial(self.change_rates, config))
+        if switch_result is not None and not switch_result:
+            print(switch_result)
+        return switch_result
+
+    def run(self):
+        """Watches the power source until interrupted.
+        """
+        while True:
+            power_source = get_power_source(self.power_supply_dir)
+            if power_source != self.power_source:
+                self.power_source = power_source
+                self.apply_rate_policies()
+            time.sleep(self.poll_seconds)
+
+
+def main():
+    try:
+        PowerSourceWatcher().run()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
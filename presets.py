@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import json
+import functools
+import randr
+from switch_queue import SwitchQueue
+from snapshot import make_snapshot
+from config_store import CONFIG_DIR
+
+PRESETS_FILE = CONFIG_DIR / 'presets.json'
+# Prefix of the mode label of a preset in the metrics and in the 'modes' option of hooks, e.g. 'preset:desk':
+PRESET_MODE_LABEL_PREFIX = 'preset:'
+
+
+def make_preset(randr_state):
+    """Returns a compact preset of the given RandR state (see 'randr.get_randr_state'): a snapshot (see
+    'snapshot.make_snapshot') with the output fingerprint {port: edid_hash} of the connected outputs added as
+    'fingerprint'.
+    """
+    preset = make_snapshot(randr_state)
+    preset['fingerprint'] = randr.get_output_fingerprint(randr_state['outputs'])
+    return preset
+
+
+def load_presets(presets_file=PRESETS_FILE):
+    """Returns the content of the presets file: {name: preset (see 'make_preset')}.
+    Returns an empty dict, if there is no readable presets file.
+    """
+    try:
+        with presets_file.open('r') as presets_file_object:
+            preset_dict = json.load(presets_file_object)
+    except (OSError, ValueError):
+        return {}
+    return preset_dict if isinstance(preset_dict, dict) else {}
+
+
+def save_current_layout(name, presets_file=PRESETS_FILE):
+    """Saves the current RandR state as preset with the given name, replacing a preset with the same name.
+    Returns the saved preset. Raises OSError, if the presets file can't be written.
+    """
+    preset = make_preset(randr.get_randr_state())
+    preset_dict = load_presets(presets_file)
+    preset_dict[name] = preset
+    temp_file = presets_file.with_suffix('.tmp')
+    with temp_file.open('w') as presets_file_object:
+        json.dump(preset_dict, presets_file_object, indent=1)
+    temp_file.replace(presets_file)
+    return preset
+
+
+def get_output_size(output):
+    """Returns a tuple (width, height) of the area the given output of a snapshot covers with its mode and rotation.
+    Raises ValueError, if the name of the mode doesn't start with a size.
+    """
+    size = randr.get_resolution_size(output['mode'])
+    if size is None:
+        raise ValueError(f'The size of the mode {output["mode"]} is unknown.')
+    width, height = size
+    if output['rotation'] in ('left', 'right'):
+        return height, width
+    return width, height
+
+
+def adapt_preset(preset, screens_dict):
+    """Returns a snapshot of the given preset for the connected screens of the given dict {port: {resolution: rates}}
+    (see 'randr.get_connected_screen_infos'), captured with other outputs connected. Outputs of the preset, which
+    aren't connected any more, are left out, and the connected outputs missing in the preset are turned off.
+    The CRTCs are chosen by Xrandr, the rate too if the output doesn't support the rate of the preset.
+    Raises ValueError, if an output doesn't support its resolution or no output of the preset is connected.
+    """
+    outputs_dict = {port: None for port in screens_dict}
+    for port, output in preset['outputs'].items():
+        if port not in screens_dict or output is None:
+            continue
+        rate_list = screens_dict[port].get(output['mode'])
+        if rate_list is None:
+            raise ValueError(f'{port} doesn\'t support the resolution {output["mode"]} of the preset.')
+        outputs_dict[port] = dict(output, crtc=None, rate=output['rate'] if output['rate'] in rate_list else None)
+    enabled_output_list = [output for output in outputs_dict.values() if output is not None]
+    if not enabled_output_list:
+        raise ValueError('No output of the preset is connected.')
+    size_list = [get_output_size(output) for output in enabled_output_list]
+    return {'fb': [max(output['pos'][0] + size[0] for output, size in zip(enabled_output_list, size_list)),
+                   max(output['pos'][1] + size[1] for output, size in zip(enabled_output_list, size_list))],
+            'outputs': outputs_dict}
+
+
+def change_to_preset(name, preset):
+    """Changes into the given preset with the given name in a single modeset. The preset is replayed as it was
+    captured, if the same outputs with the same EDIDs are connected, without probing the outputs. Otherwise it is
+    adapted to the connected outputs (see 'adapt_preset').
+    Returns the SwitchResult, which is false without a mode change, if the preset isn't possible.
+    """
+    from multi_mon import ScreenSetup, SwitchResult
+    if randr.get_output_fingerprint() == preset['fingerprint']:
+        snapshot = preset
+    else:
+        try:
+            snapshot = adapt_preset(preset, randr.get_connected_screen_infos())
+        except ValueError as error:
+            switch_result = SwitchResult(())
+            switch_result.error = f'The preset {name} isn\'t possible with the connected screens: {error}'
+            return switch_result
+    return ScreenSetup().restore_snapshot(snapshot, PRESET_MODE_LABEL_PREFIX + name)
+
+
+def apply_preset(name, display_name=None):
+    """Changes into the preset with the given name on the given X display (default: $DISPLAY) (see
+    'change_to_preset') after the switch in progress. Applies the targets submitted meanwhile afterwards.
+    Returns the SwitchResult or None, if there is no preset with the given name.
+    """
+    preset = load_presets().get(name)
+    if preset is None:
+        return None
+    return SwitchQueue(display_name).run_exclusively(functools.partial(change_to_preset, name, preset))
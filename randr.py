@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import re
+import json
+import hashlib
+import functools
+import subprocess
+try:
+    from Xlib import X, display as xlib_display
+except ImportError:
+    xlib_display = None
+from config_store import CONFIG_DIR
+
+# Xrandr executable, can be replaced by a stand-in with the environment variable MULTI_MON_XRANDR:
+XRANDR = os.environ.get('MULTI_MON_XRANDR', 'xrandr')
+PROBE_CACHE_FILE = CONFIG_DIR / 'probe_cache.json'
+GEOMETRY_PATTERN = re.compile(r'(\d+)x(\d+)\+(-?\d+)\+(-?\d+)')
+# Leading size of a mode name, e.g. of '1920x1080', '1920x1080i' or the custom mode '1920x1080_60.00':
+MODE_SIZE_PATTERN = re.compile(r'(\d+)x(\d+)')
+PROVIDER_PATTERN = re.compile(
+    r'Provider (\d+): id: (\S+) cap: (0x[0-9a-fA-F]+).*? crtcs: (\d+) outputs: (\d+) associated providers: (\d+) '
+    r'name:\s*(.*)'
+                              )
+# Capability bits of a provider:
+PROVIDER_CAPABILITY_DICT = {0x1: 'Source Output', 0x2: 'Sink Output', 0x4: 'Source Offload', 0x8: 'Sink Offload'}
+
+
+def get_display_environment(display_name=None):
+    """Returns the environment of a child process, which addresses the given X display. Returns None (the environment
+    of this process with $DISPLAY), if no display is given.
+    """
+    if not display_name:
+        return None
+    return {**os.environ, 'DISPLAY': display_name}
+
+
+def run_xrandr(*args, display_name=None):
+    """Runs Xrandr with the given arguments on the given X display (default: $DISPLAY). Returns the lines of the output
+    as list of bytes.
+    """
+    with subprocess.Popen((XRANDR, *args), stdout=subprocess.PIPE, env=get_display_environment(display_name)) as proc:
+        return proc.stdout.readlines()
+
+
+def parse_xrandr_output(lines):
+    """Parses the output of 'xrandr -q' (optionally with '--prop'). Returns a dict with all ports as keys and
+    dictionaries as values: {port: {'connected': bool, 'edid': hex string, 'modes': {resolution: [rates]}}}
+    The rates are sorted from high to low.
+    """
+    output_dict = {}
+    output = None
+    property_name = ''
+    for line in lines[1:]:
+        if not line.startswith((b' ', b'\t')):
+            fields = line.split(sep=b' ')
+            output = {'connected': fields[1] == b'connected', 'edid': '', 'modes': {}}
+            output_dict[fields[0].decode('utf-8')] = output
+            property_name = ''
+        elif output is None:
+            continue
+        elif line.startswith(b'\t\t'):
+            if property_name == 'EDID':
+                output['edid'] += line.strip().decode('utf-8')
+        elif line.startswith(b'\t'):
+            property_name = line.strip().split(sep=b':')[0].decode('utf-8')
+        else:
+            fields = line.replace(b'*', b'').replace(b'+', b'').strip().split(sep=b' ')
+            rate_list = [field.decode('utf-8') for field in fields[1:] if field]
+            rate_list.sort(key=float, reverse=True)
+            output['modes'][fields[0].decode('utf-8')] = rate_list
+    return output_dict
+
+
+def get_mode_table(output_dict):
+    """Returns a dict with all connected ports of the given parsed Xrandr output as keys and dictionaries as values,
+    where the resolutions of the connected screens are the keys and all possible refresh rates the values:
+    {port: {resolution: rates}}
+    """
+    return {port: output['modes'] for port, output in output_dict.items() if output['connected'] and output['modes']}
+
+
+def freeze_mode_table(modes_dict):
+    """Returns the given mode table {resolution: rates} as hashable tuple ((resolution, rates tuple), ...).
+    """
+    return tuple((resolution, tuple(rate_list)) for resolution, rate_list in modes_dict.items())
+
+
+def get_resolution_size(resolution):
+    """Returns a tuple (width, height) of the leading size of the given mode name (e.g. '1920x1080', '1920x1080i' or
+    '1920x1080_60.00') or None, if the mode name doesn't start with a size.
+    """
+    size_match = MODE_SIZE_PATTERN.match(resolution)
+    if size_match is None:
+        return None
+    return int(size_match.group(1)), int(size_match.group(2))
+
+
+def get_mode_rank(resolution, rate):
+    """Returns a sort key ranking the given resolution, which has to start with a size (see 'get_resolution_size'),
+    and rate: more pixels first, then progressive before interlaced, then higher rates.
+    """
+    width, height = get_resolution_size(resolution)
+    return -width*height, resolution.endswith('i'), -float(rate)
+
+
+@functools.lru_cache(maxsize=32)
+def get_common_modes(frozen_mode_table, other_frozen_mode_table):
+    """Returns a tuple of all (resolution, rate) pairs supported by both given frozen mode tables (see
+    'freeze_mode_table'), the best first: the highest common resolution, then the highest common rate.
+    Resolutions without a size in their name are left out. The result is cached for every pair of mode tables.
+    """
+    rate_index_dict = {resolution: set(rate_tuple) for resolution, rate_tuple in other_frozen_mode_table}
+    common_mode_list = [
+        (resolution, rate) for resolution, rate_tuple in frozen_mode_table
+        if resolution in rate_index_dict and get_resolution_size(resolution) is not None
+        for rate in rate_tuple if rate in rate_index_dict[resolution]
+                        ]
+    common_mode_list.sort(key=lambda common_mode: get_mode_rank(*common_mode))
+    return tuple(common_mode_list)
+
+
+def get_edid_hash(edid):
+    """Returns the hash of the given EDID hex string. Returns an empty string, if there is no EDID.
+    """
+    return hashlib.sha1(edid.encode('utf-8')).hexdigest() if edid else ''
+
+
+def get_output_fingerprint(output_dict=None, display_name=None):
+    """Returns a dict with the connector names of all connected outputs as keys and the hashes of their EDIDs as
+    values. Uses 'xrandr --current --prop' on the given X display (default: $DISPLAY), which reads the RandR state of
+    the X server without probing the outputs, if no parsed Xrandr output is given.
+    """
+    if output_dict is None:
+        output_dict = parse_xrandr_output(run_xrandr('--current', '--prop', display_name=display_name))
+    return {port: get_edid_hash(output['edid']) for port, output in output_dict.items() if output['connected']}
+
+
+def load_probe_cache():
+    """Returns the content of the probe cache file: {'outputs': {port: edid_hash}, 'screens': {port: {resolution:
+    rates}}}. Returns an empty dict, if there is no readable probe cache file.
+    """
+    try:
+        with PROBE_CACHE_FILE.open('r') as probe_cache_file:
+            probe_cache = json.load(probe_cache_file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(probe_cache, dict) or set(probe_cache) != {'outputs', 'screens'}:
+        return {}
+    return probe_cache
+
+
+def save_probe_cache(fingerprint, screens_dict):
+    """Saves the given output fingerprint and the mode table of the connected screens in the probe cache file.
+    """
+    temp_file = PROBE_CACHE_FILE.with_suffix('.tmp')
+    try:
+        with temp_file.open('w') as probe_cache_file:
+            json.dump({'outputs': fingerprint, 'screens': screens_dict}, probe_cache_file)
+        temp_file.replace(PROBE_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def parse_xrandr_providers(lines):
+    """Parses the output of 'xrandr --listproviders'. Returns a list of dicts {'index': provider nr, 'id': xid string,
+    'name': name, 'capabilities': tuple of capability names, 'crtc_count': number of CRTCs, 'output_count': number of
+    outputs, 'associated_count': number of associated providers} ordered by the provider nr.
+    """
+    provider_list = []
+    for line in lines:
+        match = PROVIDER_PATTERN.match(line.decode('utf-8').strip())
+        if match is None:
+            continue
+        index, provider_id, capability_bits, crtc_count, output_count, associated_count, name = match.groups()
+        capability_bits = int(capability_bits, 16)
+        provider_list.append({
+            'index': int(index), 'id': provider_id, 'name': name.strip(),
+            'capabilities': tuple(capability for bit, capability in PROVIDER_CAPABILITY_DICT.items()
+                                  if capability_bits & bit),
+            'crtc_count': int(crtc_count), 'output_count': int(output_count), 'associated_count': int(associated_count)
+                              })
+    return provider_list
+
+
+def get_providers(display_name=None):
+    """Returns the providers (GPUs) of the X screen of the given X display (default: $DISPLAY), see
+    'parse_xrandr_providers'.
+    """
+    return parse_xrandr_providers(run_xrandr('--listproviders', display_name=display_name))
+
+
+def get_provider_ports(provider_list, port_tuple):
+    """Returns a dict {port: provider nr} for the given ports in the order Xrandr lists them (see 'get_randr_state'),
+    mapped with the output counts of the given providers (see 'get_providers'): the X server lists the outputs of the
+    first provider, then the ones of every provider set up as output sink, in the order of the providers.
+    Returns an empty dict, if the output counts don't add up to the number of ports.
+    """
+    listed_provider_list = [
+        provider for provider in provider_list
+        if provider is provider_list[0] or ('Sink Output' in provider['capabilities'] and provider['associated_count'])
+                            ]
+    if sum(provider['output_count'] for provider in listed_provider_list) != len(port_tuple):
+        return {}
+    port_iterator = iter(port_tuple)
+    return {next(port_iterator): provider['index']
+            for provider in listed_provider_list for _ in range(provider['output_count'])}
+
+
+def get_provider_sink_commands(provider_list):
+    """Returns a tuple of Xrandr argument tuples, which set up all given providers as output sinks of the first
+    provider able to be an output source, if they aren't associated yet.
+    The outputs of a secondary GPU only work and show up after this (PRIME).
+    """
+    source_provider = next(
+        (provider for provider in provider_list if 'Source Output' in provider['capabilities']), None
+                           )
+    if source_provider is None:
+        return ()
+    return tuple(
+        ('--setprovideroutputsource', provider['id'], source_provider['id']) for provider in provider_list
+        if provider is not source_provider and 'Sink Output' in provider['capabilities']
+        and not provider['associated_count']
+                 )
+
+
+def get_connected_screen_infos(force_full_probe=False):
+    """Returns a dict with all connected ports as keys and dictionaries as values,
+    where the resolutions of the connected screens are the keys and all possible refresh rates the values:
+    {port: {resolution: rates}}
+    Reuses the cached result of the last full probe while the connected outputs and their EDIDs are unchanged.
+    Probes all outputs with 'xrandr -q' and updates the cache otherwise, or if forced. The outputs of a secondary GPU
+    are only listed, once a switch enabling one of them has set it up as output sink.
+    """
+    probe_cache = load_probe_cache()
+    if not force_full_probe and probe_cache:
+        if get_output_fingerprint() == probe_cache['outputs']:
+            return probe_cache['screens']
+    output_dict = parse_xrandr_output(run_xrandr('-q', '--prop'))
+    screens_dict = get_mode_table(output_dict)
+    save_probe_cache(get_output_fingerprint(output_dict), screens_dict)
+    return screens_dict
+
+
+def open_x_display(display_name=None):
+    """Opens a connection to the X server with python-xlib. Returns None, if python-xlib isn't installed.
+    """
+    if xlib_display is None:
+        return None
+    return xlib_display.Display(display_name)
+
+
+def get_output_fingerprint_xlib(display):
+    """Returns the same dict as 'get_output_fingerprint' {port: edid_hash} for all connected outputs, but reads the
+    RandR state directly over the given python-xlib display connection without starting Xrandr or probing the outputs.
+    """
+    root = display.screen().root
+    edid_atom = display.intern_atom('EDID')
+    resources = root.xrandr_get_screen_resources_current()
+    fingerprint = {}
+    for output in resources.outputs:
+        output_info = display.xrandr_get_output_info(output, resources.config_timestamp)
+        if output_info.connection != 0:
+            continue
+        name = output_info.name if isinstance(output_info.name, str) else output_info.name.decode('utf-8')
+        edid = display.xrandr_get_output_property(output, edid_atom, X.AnyPropertyType, 0, 128).value
+        fingerprint[name] = get_edid_hash(bytes(edid).hex())
+    return fingerprint
+
+
+def parse_geometry(geometry):
+    """Parses an Xrandr geometry string 'WxH+X+Y'. Returns a tuple (width, height, x, y) or None, if the string is
+    no geometry.
+    """
+    match = GEOMETRY_PATTERN.fullmatch(geometry)
+    if match is None:
+        return None
+    return tuple(int(value) for value in match.groups())
+
+
+def parse_xrandr_verbose(lines):
+    """Parses the output of 'xrandr --verbose'. Returns a dict describing the RandR state:
+    {'screen': {'current': (width, height), 'maximum': (width, height)},
+     'crtc_count': number of CRTCs,
+     'outputs': {port: {'connected': bool, 'primary': bool, 'edid': hex string, 'crtc': crtc nr or None,
+                        'crtcs': tuple of usable crtc nrs, 'geometry': (width, height, x, y) or None,
+                        'rotation': rotation, 'mode': current resolution or None, 'rate': current rate or None,
+                        'modes': {resolution: [rates]}}}}
+    """
+    screen_fields = lines[0].decode('utf-8').replace(',', '').split()
+    state = {
+        'screen': {
+            'current': (int(screen_fields[screen_fields.index('current') + 1]),
+                        int(screen_fields[screen_fields.index('current') + 3])),
+            'maximum': (int(screen_fields[screen_fields.index('maximum') + 1]),
+                        int(screen_fields[screen_fields.index('maximum') + 3]))
+                   },
+        'crtc_count': 0,
+        'outputs': {}
+             }
+    output = None
+    property_name = ''
+    mode_name = None
+    mode_current = False
+    for line in lines[1:]:
+        line = line.decode('utf-8').rstrip('\n')
+        if not line.startswith((' ', '\t')):
+            fields = line.split()
+            output = {'connected': fields[1] == 'connected', 'primary': 'primary' in fields, 'edid': '',
+                      'crtc': None, 'crtcs': (), 'geometry': None, 'rotation': 'normal', 'mode': None,
+                      'rate': None, 'modes': {}}
+            state['outputs'][fields[0]] = output
+            for index, field in enumerate(fields):
+                if parse_geometry(field):
+                    output['geometry'] = parse_geometry(field)
+                    for rotation_field in fields[index + 1:index + 3]:
+                        if rotation_field in ('normal', 'left', 'inverted', 'right'):
+                            output['rotation'] = rotation_field
+                            break
+            property_name = ''
+        elif output is None:
+            continue
+        elif line.startswith('\t\t'):
+            if property_name == 'EDID':
+                output['edid'] += line.strip()
+        elif line.startswith('\t'):
+            property_name, _, value = line.strip().partition(':')
+            if property_name == 'CRTC':
+                output['crtc'] = int(value)
+            elif property_name == 'CRTCs':
+                output['crtcs'] = tuple(int(crtc) for crtc in value.split())
+                state['crtc_count'] = max((state['crtc_count'], *(crtc + 1 for crtc in output['crtcs'])))
+        elif line.startswith('  ') and not line.startswith('   '):
+            mode_fields = line.split()
+            mode_name = mode_fields[0]
+            mode_current = '*current' in mode_fields
+        elif line.strip().startswith('v:') and mode_name is not None:
+            rate = line.split()[-1].replace('Hz', '')
+            rate_list = output['modes'].setdefault(mode_name, [])
+            if rate not in rate_list:
+                rate_list.append(rate)
+                rate_list.sort(key=float, reverse=True)
+            if mode_current:
+                output['mode'] = mode_name
+                output['rate'] = rate
+            mode_name = None
+    return state
+
+
+def get_randr_state(display_name=None):
+    """Returns the current RandR state (see 'parse_xrandr_verbose') of the given X display (default: $DISPLAY) read with
+    'xrandr --current --verbose', which doesn't probe the outputs.
+    """
+    return parse_xrandr_verbose(run_xrandr('--current', '--verbose', display_name=display_name))
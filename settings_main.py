@@ -2,28 +2,129 @@
 # -*- coding: utf-8 -*
 
 import sys
-import subprocess
-import configparser
+import functools
 from pathlib import Path
 from PyQt5 import QtWidgets
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtCore import Qt, QSize, QThread, pyqtSignal
 from PyQt5.QtGui import QIcon, QCursor, QFont
+from asset_bundle import ASSETS
+import randr
+import edid
+import config_store
+from config_store import CONF_FILE
 
-CONF_FILE = Path(__file__).parent / 'multi_mon_conf.conf'
 ICONS_DIR = Path(__file__).parent / 'icons'
-STYLE_SHEET_DIR = Path(__file__).parent / 'stylesheets'
 FONT = QFont('Noto Sans', 18)
 TYPE_DICT = {
-    'main': (QIcon(str(ICONS_DIR / 'screen_main.svg')), 'Main monitor'),
-    'tv': (QIcon(str(ICONS_DIR / 'tv.svg')), 'TV or projector'),
-    'secondary': (QIcon(str(ICONS_DIR / 'screen_secondary.svg')), 'Secondary monitor')
+    'main': ('screen_main.svg', 'Main monitor'),
+    'tv': ('tv.svg', 'TV or projector'),
+    'secondary': ('screen_secondary.svg', 'Secondary monitor')
              }
+# Worker threads of closed settings windows, kept until they finished on their own:
+DETACHED_THREAD_SET = set()
 BUTTON_LABEL_TUPLE = ('main_only', 'secondary_extended', 'tv_extended', 'tv_only', 'all_extended',
                       'tv_mirror', 'secondary_mirror', 'secondary_only', 'secondary_2_only',
                       'secondary_2_extended', 'secondary_2_mirror', 'tv_2_only', 'tv_2_extended', 'tv_2_mirror'
                       )
 
 
+def wait_for_detached_threads():
+    """Waits for the worker threads of closed settings windows, so none is destroyed while running at exit.
+    """
+    for thread in tuple(DETACHED_THREAD_SET):
+        thread.wait()
+
+
+def detach_thread(thread):
+    """Detaches the given running worker thread, whose signals are already disconnected, from its window and lets it
+    finish on its own. It is deleted after it finished. The application waits for it only when it quits.
+    """
+    if not DETACHED_THREAD_SET:
+        QtWidgets.QApplication.instance().aboutToQuit.connect(wait_for_detached_threads)
+    thread.setParent(None)
+    DETACHED_THREAD_SET.add(thread)
+    thread.finished.connect(functools.partial(DETACHED_THREAD_SET.discard, thread))
+    thread.finished.connect(thread.deleteLater)
+
+
+@functools.lru_cache(maxsize=None)
+def get_type_icon(screen_type):
+    """Returns the icon of the given screen type. The icon is created on first use.
+    """
+    return ASSETS.icon(ICONS_DIR / TYPE_DICT[screen_type][0])
+
+
+class LazyComboBox(QtWidgets.QComboBox):
+    """Combo box which holds only its current entry until the popup is opened or the selection is changed by
+    keyboard or mouse wheel for the first time.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries_tuple = ()
+        self.entries_loaded = True
+
+    def set_entries(self, entries_tuple, current_text=''):
+        """Sets the given entries. Selects the entry with the given text, or the first entry if there is no such entry.
+        Only the selected entry is added to the combo box until the entries are needed.
+        """
+        self.clear()
+        self.entries_tuple = tuple(entries_tuple)
+        if current_text not in self.entries_tuple:
+            current_text = self.entries_tuple[0] if self.entries_tuple else ''
+        if self.entries_tuple:
+            self.addItem(current_text)
+        self.entries_loaded = len(self.entries_tuple) < 2
+
+    def load_entries(self):
+        """Adds all entries to the combo box, if not done yet. Keeps the current selection.
+        """
+        if self.entries_loaded:
+            return
+        current_text = self.currentText()
+        self.blockSignals(True)
+        self.clear()
+        self.addItems(self.entries_tuple)
+        self.setCurrentIndex(self.entries_tuple.index(current_text))
+        self.blockSignals(False)
+        self.entries_loaded = True
+
+    def showPopup(self):
+        self.load_entries()
+        super().showPopup()
+
+    def keyPressEvent(self, event):
+        self.load_entries()
+        super().keyPressEvent(event)
+
+    def wheelEvent(self, event):
+        self.load_entries()
+        super().wheelEvent(event)
+
+
+class ScreenProbeThread(QThread):
+    """Worker thread probing the connected screens with Xrandr. Emits the signal 'probe_finished' with the result of
+    'SettingsMainWindow.get_connected_screen_infos'.
+    """
+    probe_finished = pyqtSignal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.force_full_probe = False
+
+    def run(self):
+        self.probe_finished.emit(SettingsMainWindow.get_connected_screen_infos(self.force_full_probe))
+
+
+class EdidDecodeThread(QThread):
+    """Worker thread reading and decoding the EDIDs of all connected outputs. Emits the signal 'edids_decoded' with
+    the result of 'edid.get_connected_edid_infos'.
+    """
+    edids_decoded = pyqtSignal(dict)
+
+    def run(self):
+        self.edids_decoded.emit(edid.get_connected_edid_infos())
+
+
 class ProxyStyleBiggerMenuIcons(QtWidgets.QProxyStyle):
     """Changes the icon size for the screen type menu entries in the tool button menu.
     """
@@ -42,10 +143,12 @@ class SettingsMainWindow(QtWidgets.QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle('MultiMon Settings')
-        self.setWindowIcon(QIcon(str(ICONS_DIR / 'icon_settings.svg')))
+        self.setWindowIcon(ASSETS.icon(ICONS_DIR / 'icon_settings.svg'))
         self.config = self.read_config()
-        self.connected_ports_dict = self.get_connected_screen_infos()
+        self.connected_ports_dict = self.load_last_probe_result()
+        self.edid_info_dict = edid.get_cached_edid_infos(randr.load_probe_cache().get('outputs', {}))
         self.screen_count = len(self.connected_ports_dict)
+        self.probe_result_stale = True
         try:
             self.tv_count = int(self.config['Screens']['tv_count'] or 0)
         except KeyError:
@@ -53,58 +156,121 @@ class SettingsMainWindow(QtWidgets.QDialog):
         self.vertical_layout_main = QtWidgets.QVBoxLayout(self)
         self.vertical_layout_main.setContentsMargins(10, 10, 10, 10)
         self.vertical_layout_main.setSpacing(10)
+        self.label_reload = QtWidgets.QLabel(self)
         self.make_reload_layout()
+        self.horizontal_layout_screen_settings = QtWidgets.QHBoxLayout()
         self.widget_dict_tuple = self.make_screen_settings_layout()
         self.mode_radio_button_tuple = self.make_mode_selection_layout()
-        self.make_button_box()
+        self.push_button_save_tuple = self.make_button_box()
+        self.screen_type_list = ['', '', '']
         self.action_tuple = self.make_screen_type_menu()
         self.load_values_from_config_to_gui()
-        self.disable_middle_screen_if_two_screens()
-        with open(STYLE_SHEET_DIR / 'main_settings.stylesheet', 'r') as style_sheet:
-            self.setStyleSheet(style_sheet.read().replace(
-                    'unchecked_icon_file', str(ICONS_DIR / 'radio_unchecked.svg')
-                                                          ).replace(
-                'checked_icon_file', str(ICONS_DIR / 'radio_checked.svg')
-                                                                    )
-                               )
+        self.setStyleSheet(ASSETS.style_sheet('main_settings.stylesheet'))
+        self.make_worker_threads()
+        self.start_probe()
+
+    def make_worker_threads(self):
+        """Creates and connects the threads probing the connected screens and decoding their EDIDs in the background.
+        """
+        self.probe_thread = ScreenProbeThread(self)
+        self.probe_thread.probe_finished.connect(self.apply_probe_result)
+        self.edid_thread = EdidDecodeThread(self)
+        self.edid_thread.edids_decoded.connect(self.apply_edid_infos)
 
     @staticmethod
     def read_config():
         """Initializes the config parser and reads the conf file into it, if the conf file exists.
         Adds all sections to the config parser, if not.
         """
-        config = configparser.ConfigParser()
-        if not config.read(CONF_FILE):
+        config = config_store.read_config()
+        if not config.sections():
             for section in ('Screens', 'Mode', 'Customize'):
                 config.add_section(section)
         return config
 
     @staticmethod
-    def get_connected_screen_infos():
+    def get_connected_screen_infos(force_full_probe=False):
         """Returns a dict with all connected ports as keys and dictionaries as values,
         where the resolutions of the connected screens are the keys and all possible refresh rates the values:
         {port: {resolution: rate}}
-        Uses the tool Xrandr to get the information.
-        """
-        with subprocess.Popen(('xrandr', '-q'), stdout=subprocess.PIPE) as proc:
-            all_port_list = proc.stdout.readlines()
-        port_dict = {}
-        resolution_dict = {}
-        port = ''
-        for line in all_port_list[1:]:
-            if b'disconnected' in line:
-                pass
-            elif b'connected' in line:
-                resolution_dict = {}
-                port = line.split(sep=b' ')[0].decode('utf-8')
-            else:
-                line = line.replace(b'*', b'').replace(b'+', b'').strip().split(sep=b' ')
-                resolution = line[0].decode('utf-8')
-                rate_list = [line[index].decode('utf-8') for index in range(1, len(line)) if line[index]]
-                rate_list.sort(key=float, reverse=True)
-                resolution_dict[resolution] = rate_list
-                port_dict[port] = resolution_dict
-        return port_dict
+        Uses the tool Xrandr to get the information. Reuses the result of the last probe while the connected screens
+        are unchanged, if not forced to probe.
+        """
+        return randr.get_connected_screen_infos(force_full_probe)
+
+    @staticmethod
+    def load_last_probe_result():
+        """Returns the result of the last screen probe saved in the probe cache file.
+        Returns an empty dict, if there is no readable probe cache file.
+        """
+        return randr.load_probe_cache().get('screens', {})
+
+    def start_probe(self, force_full_probe=False):
+        """Marks the shown port, resolution and rate entries as possibly outdated, disables the related widgets and
+        starts probing the connected screens in the background.
+        """
+        if self.probe_thread.isRunning():
+            return
+        self.probe_result_stale = True
+        self.set_probe_widgets_enabled(False)
+        self.update_reload_label()
+        self.probe_thread.force_full_probe = force_full_probe
+        self.probe_thread.start()
+        if not self.edid_thread.isRunning():
+            self.edid_thread.start()
+
+    def apply_probe_result(self, port_dict):
+        """Loads the result of the finished screen probe to the GUI and enables the related widgets.
+        """
+        self.probe_result_stale = False
+        if port_dict != self.connected_ports_dict:
+            self.connected_ports_dict = port_dict
+            self.screen_count = len(port_dict)
+            self.update_middle_screen_frame()
+            self.load_port_values_from_config_to_gui()
+        self.set_probe_widgets_enabled(True)
+        self.update_reload_label()
+
+    def apply_edid_infos(self, edid_info_dict):
+        """Relabels the ports with the given decoded EDIDs {port: decoded EDID or None} of the finished EDID decoding.
+        Keeps the selected ports.
+        """
+        if edid_info_dict == self.edid_info_dict:
+            return
+        self.edid_info_dict = edid_info_dict
+        tuple_ports = tuple(self.connected_ports_dict)
+        tuple_port_labels = self.get_more_detailed_port_tuple(tuple_ports)
+        for screen_nr, widget_dict in enumerate(self.widget_dict_tuple):
+            if widget_dict is None:
+                continue
+            try:
+                port_label = tuple_port_labels[tuple_ports.index(widget_dict['port'].currentText().split(sep=':')[0])]
+            except ValueError:
+                port_label = ''
+            self.load_port_entries(screen_nr, tuple_port_labels, port_label)
+
+    def set_probe_widgets_enabled(self, enabled):
+        """Enables or disables all widgets depending on the probe result: the screen type buttons, the port, resolution
+        and rate combo boxes and the buttons saving the settings.
+        """
+        for widget_dict in self.widget_dict_tuple:
+            if widget_dict is not None:
+                for key in ('type_button', 'port', 'resolution', 'rate'):
+                    widget_dict[key].setEnabled(enabled)
+        for push_button in self.push_button_save_tuple:
+            push_button.setEnabled(enabled)
+
+    def closeEvent(self, event):
+        # a slow Xrandr call mustn't freeze the closing window, the running threads finish on their own:
+        #
+        if self.probe_thread.isRunning() or self.edid_thread.isRunning():
+            self.probe_thread.probe_finished.disconnect()
+            self.edid_thread.edids_decoded.disconnect()
+            for thread in (self.probe_thread, self.edid_thread):
+                if thread.isRunning():
+                    detach_thread(thread)
+            self.make_worker_threads()
+        super().closeEvent(event)
 
     def make_reload_layout(self):
         """Creates and places the 'Reload Window' button and the label next to it.
@@ -113,8 +279,7 @@ class SettingsMainWindow(QtWidgets.QDialog):
         horizontal_layout_reload = QtWidgets.QHBoxLayout()
         horizontal_layout_reload.setContentsMargins(10, 10, 10, 10)
 
-        label_reload = QtWidgets.QLabel(self)
-        label_reload.setFont(FONT)
+        self.label_reload.setFont(FONT)
         spacer_item = QtWidgets.QSpacerItem(20, 0, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         push_button_reload = QtWidgets.QPushButton(self)
         push_button_reload.setMinimumSize(QSize(0, 60))
@@ -122,23 +287,83 @@ class SettingsMainWindow(QtWidgets.QDialog):
         push_button_reload.setCursor(QCursor(Qt.PointingHandCursor))
         push_button_reload.clicked.connect(self.reload_window)
 
-        horizontal_layout_reload.addWidget(label_reload)
+        horizontal_layout_reload.addWidget(self.label_reload)
         horizontal_layout_reload.addItem(spacer_item)
         horizontal_layout_reload.addWidget(push_button_reload)
 
-        plural_string = ['are', 's'] if self.screen_count > 1 else ['is', '']
-        label_reload.setText(
-            f'There {plural_string[0]} {self.screen_count} connected screen{plural_string[1]} detected. Not correct?\n'
-            f'Check your connection and click reload connections:'
-                             )
         push_button_reload.setToolTip('Reload the window with a new connection check.')
         push_button_reload.setText('   Reload window   ')
         self.vertical_layout_main.addLayout(horizontal_layout_reload)
         return push_button_reload
 
+    def update_reload_label(self):
+        """Updates the text of the label next to the reload button. Marks the shown screens as possibly outdated while
+        probing the connected screens.
+        """
+        if self.probe_result_stale:
+            if self.connected_ports_dict:
+                self.label_reload.setText(
+                    f'Showing the {self.screen_count} screen(s) detected last time (possibly outdated).\n'
+                    f'Checking the connected screens...'
+                                          )
+            else:
+                self.label_reload.setText('Checking the connected screens...\n')
+            return
+        plural_string = ['are', 's'] if self.screen_count > 1 else ['is', '']
+        self.label_reload.setText(
+            f'There {plural_string[0]} {self.screen_count} connected screen{plural_string[1]} detected. Not correct?\n'
+            f'Check your connection and click reload connections:'
+                                  )
+
     def make_screen_settings_layout(self):
-        """Creates and places the screen settings widgets.
-        Return a tuple of dictionaries with the frame and the widgets related to the port, resolution, rate and
+        """Creates and places the screen settings frames. The middle frame is only a disconnected placeholder without
+        any settings widgets, if there are less then three screens.
+        Returns a tuple of dictionaries (see 'make_screen_frame') for each screen. The entry of the middle screen is
+        None, if there are less then three screens.
+        """
+        self.horizontal_layout_screen_settings.setContentsMargins(0, 0, 0, 0)
+        self.horizontal_layout_screen_settings.setSpacing(0)
+
+        widget_dict_tuple = ()
+        for position in ('left', 'middle', 'right'):
+            if position == 'middle' and self.screen_count < 3:
+                self.horizontal_layout_screen_settings.addWidget(self.make_disconnected_screen_frame())
+                widget_dict_tuple += (None,)
+            else:
+                widget_dict = self.make_screen_frame(position)
+                self.horizontal_layout_screen_settings.addWidget(widget_dict['frame'])
+                widget_dict_tuple += (widget_dict,)
+        self.vertical_layout_main.addLayout(self.horizontal_layout_screen_settings)
+        return widget_dict_tuple
+
+    def update_middle_screen_frame(self):
+        """Replaces the middle screen frame by the settings frame or by the disconnected placeholder, if the screen
+        count changed between two and three screens.
+        """
+        if (self.widget_dict_tuple[1] is None) == (self.screen_count < 3):
+            return
+        old_frame = self.horizontal_layout_screen_settings.itemAt(1).widget()
+        if self.screen_count < 3:
+            new_frame = self.make_disconnected_screen_frame()
+            self.widget_dict_tuple = (self.widget_dict_tuple[0], None, self.widget_dict_tuple[2])
+            self.screen_type_list[1] = ''
+        else:
+            widget_dict = self.make_screen_frame('middle')
+            new_frame = widget_dict['frame']
+            self.connect_screen_type_menu(widget_dict)
+            self.widget_dict_tuple = (self.widget_dict_tuple[0], widget_dict, self.widget_dict_tuple[2])
+        self.action_tuple[1].clear()
+        self.horizontal_layout_screen_settings.replaceWidget(old_frame, new_frame)
+        old_frame.deleteLater()
+        if self.widget_dict_tuple[1] is not None:
+            try:
+                self.set_screen_type(1, self.config['Screens']['type_screen_1'].strip('_2'))
+            except KeyError:
+                pass
+
+    def make_screen_frame(self, position):
+        """Creates the frame with the settings widgets of the screen at the given position.
+        Returns a dictionary with the frame and the widgets related to the port, resolution, rate and
         screen type as values and their names as keys:
             'port': combo_box_port,
             'resolution': combo_box_resolution,
@@ -148,96 +373,107 @@ class SettingsMainWindow(QtWidgets.QDialog):
             'type_menu': QtWidgets.QMenu(),
             'frame': frame
         """
-        horizontal_layout_screen_settings = QtWidgets.QHBoxLayout()
-        horizontal_layout_screen_settings.setContentsMargins(0, 0, 0, 0)
-        horizontal_layout_screen_settings.setSpacing(0)
-
-        widget_dict_tuple = ()
-        for position in ('left', 'middle', 'right'):
-            frame = QtWidgets.QFrame(self)
-            font_big = QFont('Noto Sans', 22)
-            font_small = QFont('Noto Sans', 11)
-            vertical_layout = QtWidgets.QVBoxLayout(frame)
-            vertical_layout.setContentsMargins(10, 10, 10, 10)
-            vertical_layout.setSpacing(2)
-
-            label_type = (QtWidgets.QLabel(frame))
-            label_type.setContentsMargins(0, 0, 0, 10)
-            label_type.setFont(font_big)
-            label_type.setAlignment(Qt.AlignHCenter | Qt.AlignTop)
-            label_type.setText(f'{position.capitalize()} screen')
-            tool_button_type = QtWidgets.QToolButton(frame)
-            tool_button_type.setMinimumSize(QSize(380, 300))
-            tool_button_type.setCursor(QCursor(Qt.PointingHandCursor))
-            tool_button_type.setIcon(QIcon(str(ICONS_DIR / 'screen.svg')))
-            tool_button_type.setIconSize(QSize(270, 200))
-            tool_button_type.setPopupMode(QtWidgets.QToolButton.InstantPopup)
-            tool_button_type.setToolButtonStyle(Qt.ToolButtonIconOnly)
-
-            label_port = QtWidgets.QLabel(frame)
-            label_port.setContentsMargins(0, 10, 0, 0)
-            label_port.setFont(font_small)
-            combo_box_port = QtWidgets.QComboBox(frame)
-            combo_box_port.setCursor(QCursor(Qt.PointingHandCursor))
-            combo_box_port.activated.connect(self.change_resolution_and_rate_entries)
-            combo_box_port.setFont(font_small)
-
-            label_resolution = QtWidgets.QLabel(frame)
-            label_resolution.setFont(font_small)
-            combo_box_resolution = QtWidgets.QComboBox(frame)
-            combo_box_resolution.setMinimumSize(QSize(110, 0))
-            combo_box_resolution.setCursor(QCursor(Qt.PointingHandCursor))
-            combo_box_resolution.activated.connect(self.change_resolution_and_rate_entries)
-            combo_box_resolution.setFont(font_small)
-            spacer_item = QtWidgets.QSpacerItem(0, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
-
-            label_rate = QtWidgets.QLabel(frame)
-            label_rate.setFont(font_small)
-            combo_box_rate = QtWidgets.QComboBox(frame)
-            combo_box_rate.setCursor(QCursor(Qt.PointingHandCursor))
-            combo_box_rate.setFont(font_small)
-            label_hz = QtWidgets.QLabel(frame)
-
-            label_port.setText('Port:')
-            label_rate.setText('Refresh rate:')
-            label_resolution.setText('Resolution:')
-            label_hz.setText('Hz')
-            combo_box_port.setToolTip(f'Select the port of the {position} screen.')
-            combo_box_resolution.setToolTip(f'Select the resolution of the {position} screen.')
-            combo_box_rate.setToolTip(f'Select the refresh rate of the {position} screen.')
-            tool_button_type.setToolTip(f'Select the type of the {position} screen.')
-
-            grid_layout_combo = QtWidgets.QGridLayout()
-            grid_layout_combo.setContentsMargins(0, 10, 0, 0)
-            grid_layout_combo.setHorizontalSpacing(4)
-            grid_layout_combo.setVerticalSpacing(2)
-
-            grid_layout_combo.addWidget(label_resolution, 0, 0, 1, 1)
-            grid_layout_combo.addWidget(label_rate, 0, 2, 1, 1)
-            grid_layout_combo.addWidget(combo_box_resolution, 1, 0, 1, 1)
-            grid_layout_combo.addItem(spacer_item, 1, 1, 1, 1)
-            grid_layout_combo.addWidget(combo_box_rate, 1, 2, 1, 1)
-            grid_layout_combo.addWidget(label_hz, 1, 3, 1, 1)
-
-            vertical_layout.addWidget(label_type)
-            vertical_layout.addWidget(tool_button_type)
-            vertical_layout.addWidget(label_port)
-            vertical_layout.addWidget(combo_box_port)
-            vertical_layout.addLayout(grid_layout_combo)
-
-            horizontal_layout_screen_settings.addWidget(frame)
-            widget_dict = {
-                'port': combo_box_port,
-                'resolution': combo_box_resolution,
-                'rate': combo_box_rate,
-                'type_label': label_type,
-                'type_button': tool_button_type,
-                'type_menu': QtWidgets.QMenu(),
-                'frame': frame
-                           }
-            widget_dict_tuple += (widget_dict,)
-        self.vertical_layout_main.addLayout(horizontal_layout_screen_settings)
-        return widget_dict_tuple
+        frame = QtWidgets.QFrame(self)
+        font_big = QFont('Noto Sans', 22)
+        font_small = QFont('Noto Sans', 11)
+        vertical_layout = QtWidgets.QVBoxLayout(frame)
+        vertical_layout.setContentsMargins(10, 10, 10, 10)
+        vertical_layout.setSpacing(2)
+
+        label_type = (QtWidgets.QLabel(frame))
+        label_type.setContentsMargins(0, 0, 0, 10)
+        label_type.setFont(font_big)
+        label_type.setAlignment(Qt.AlignHCenter | Qt.AlignTop)
+        label_type.setText(f'{position.capitalize()} screen')
+        tool_button_type = QtWidgets.QToolButton(frame)
+        tool_button_type.setMinimumSize(QSize(380, 300))
+        tool_button_type.setCursor(QCursor(Qt.PointingHandCursor))
+        tool_button_type.setIcon(ASSETS.icon(ICONS_DIR / 'screen.svg'))
+        tool_button_type.setIconSize(QSize(270, 200))
+        tool_button_type.setPopupMode(QtWidgets.QToolButton.InstantPopup)
+        tool_button_type.setToolButtonStyle(Qt.ToolButtonIconOnly)
+
+        label_port = QtWidgets.QLabel(frame)
+        label_port.setContentsMargins(0, 10, 0, 0)
+        label_port.setFont(font_small)
+        combo_box_port = LazyComboBox(frame)
+        combo_box_port.setCursor(QCursor(Qt.PointingHandCursor))
+        combo_box_port.activated.connect(self.change_resolution_and_rate_entries)
+        combo_box_port.setFont(font_small)
+
+        label_resolution = QtWidgets.QLabel(frame)
+        label_resolution.setFont(font_small)
+        combo_box_resolution = LazyComboBox(frame)
+        combo_box_resolution.setMinimumSize(QSize(110, 0))
+        combo_box_resolution.setCursor(QCursor(Qt.PointingHandCursor))
+        combo_box_resolution.activated.connect(self.change_resolution_and_rate_entries)
+        combo_box_resolution.setFont(font_small)
+        spacer_item = QtWidgets.QSpacerItem(0, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+
+        label_rate = QtWidgets.QLabel(frame)
+        label_rate.setFont(font_small)
+        combo_box_rate = LazyComboBox(frame)
+        combo_box_rate.setCursor(QCursor(Qt.PointingHandCursor))
+        combo_box_rate.setFont(font_small)
+        label_hz = QtWidgets.QLabel(frame)
+
+        label_port.setText('Port:')
+        label_rate.setText('Refresh rate:')
+        label_resolution.setText('Resolution:')
+        label_hz.setText('Hz')
+        combo_box_port.setToolTip(f'Select the port of the {position} screen.')
+        combo_box_resolution.setToolTip(f'Select the resolution of the {position} screen.')
+        combo_box_rate.setToolTip(f'Select the refresh rate of the {position} screen.')
+        tool_button_type.setToolTip(f'Select the type of the {position} screen.')
+
+        grid_layout_combo = QtWidgets.QGridLayout()
+        grid_layout_combo.setContentsMargins(0, 10, 0, 0)
+        grid_layout_combo.setHorizontalSpacing(4)
+        grid_layout_combo.setVerticalSpacing(2)
+
+        grid_layout_combo.addWidget(label_resolution, 0, 0, 1, 1)
+        grid_layout_combo.addWidget(label_rate, 0, 2, 1, 1)
+        grid_layout_combo.addWidget(combo_box_resolution, 1, 0, 1, 1)
+        grid_layout_combo.addItem(spacer_item, 1, 1, 1, 1)
+        grid_layout_combo.addWidget(combo_box_rate, 1, 2, 1, 1)
+        grid_layout_combo.addWidget(label_hz, 1, 3, 1, 1)
+
+        vertical_layout.addWidget(label_type)
+        vertical_layout.addWidget(tool_button_type)
+        vertical_layout.addWidget(label_port)
+        vertical_layout.addWidget(combo_box_port)
+        vertical_layout.addLayout(grid_layout_combo)
+
+        return {
+            'port': combo_box_port,
+            'resolution': combo_box_resolution,
+            'rate': combo_box_rate,
+            'type_label': label_type,
+            'type_button': tool_button_type,
+            'type_menu': QtWidgets.QMenu(),
+            'frame': frame
+                }
+
+    def make_disconnected_screen_frame(self):
+        """Creates the disabled placeholder frame for the middle screen, if there are less then three screens.
+        Returns the frame.
+        """
+        frame = QtWidgets.QFrame(self)
+        vertical_layout = QtWidgets.QVBoxLayout(frame)
+        vertical_layout.setContentsMargins(10, 10, 10, 10)
+        label_type = QtWidgets.QLabel(frame)
+        label_type.setFont(QFont('Noto Sans', 22))
+        label_type.setAlignment(Qt.AlignHCenter | Qt.AlignTop)
+        label_type.setText('disconnected')
+        label_icon = QtWidgets.QLabel(frame)
+        label_icon.setMinimumSize(QSize(380, 300))
+        label_icon.setAlignment(Qt.AlignCenter)
+        label_icon.setPixmap(ASSETS.icon(ICONS_DIR / 'screen_disabled.svg').pixmap(QSize(270, 200)))
+        vertical_layout.addWidget(label_type)
+        vertical_layout.addWidget(label_icon)
+        vertical_layout.addStretch()
+        frame.setDisabled(True)
+        return frame
 
     def make_mode_selection_layout(self):
         """Creates and places the radio buttons for the mode selection and the label next to it.
@@ -275,7 +511,7 @@ class SettingsMainWindow(QtWidgets.QDialog):
 
     def make_button_box(self):
         """Creates and places the buttons 'Start MultiMon', 'Customize MultiMon', 'Exit' and 'Apply' and connects them
-        to their related methods.
+        to their related methods. Returns a tuple of the buttons saving the settings (start, customize and apply).
         """
         horizontal_layout_button_box = QtWidgets.QHBoxLayout()
         horizontal_layout_button_box.setSpacing(20)
@@ -293,12 +529,12 @@ class SettingsMainWindow(QtWidgets.QDialog):
         push_button_exit = QtWidgets.QPushButton(self)
         push_button_exit.setMinimumSize(QSize(60, 60))
         push_button_exit.setCursor(QCursor(Qt.PointingHandCursor))
-        push_button_exit.setIcon(QIcon(str(ICONS_DIR / 'exit.svg')))
+        push_button_exit.setIcon(ASSETS.icon(ICONS_DIR / 'exit.svg'))
         push_button_exit.setIconSize(QSize(40, 40))
         push_button_apply = QtWidgets.QPushButton(self)
         push_button_apply.setMinimumSize(QSize(66, 60))
         push_button_apply.setCursor(QCursor(Qt.PointingHandCursor))
-        push_button_apply.setIcon(QIcon(str(ICONS_DIR / 'finish.svg')))
+        push_button_apply.setIcon(ASSETS.icon(ICONS_DIR / 'finish.svg'))
         push_button_apply.setIconSize(QSize(46, 43))
 
         horizontal_layout_button_box.addWidget(push_button_start)
@@ -314,49 +550,55 @@ class SettingsMainWindow(QtWidgets.QDialog):
         push_button_exit.setToolTip('Exit')
         push_button_apply.setToolTip('Save and exit')
         push_button_exit.clicked.connect(self.close)
-        if self.screen_count > 1:
-            push_button_start.clicked.connect(self.start_multi_mon)
-            push_button_customize.clicked.connect(self.open_customize_window)
-            push_button_apply.clicked.connect(self.apply_changes_and_exit)
-        else:
-            for button in (push_button_start, push_button_customize, push_button_apply):
-                button.clicked.connect(self.one_screen_warning)
+        push_button_start.clicked.connect(self.start_multi_mon)
+        push_button_customize.clicked.connect(self.open_customize_window)
+        push_button_apply.clicked.connect(self.apply_changes_and_exit)
+        return push_button_start, push_button_customize, push_button_apply
 
     def make_screen_type_menu(self):
-        """Returns a tuple of dictionaries {screen_type: action} for each screen, where the actions
-        are associated to the screen type entries of the tool button menus.
+        """Connects the tool button menus to 'load_screen_type_menu', so the menu entries are only created when a
+        menu is opened for the first time. Returns a tuple of (still empty) dictionaries {screen_type: action} for
+        each screen, where the actions are associated to the screen type entries of the tool button menus.
         """
         menu_entries_tuple = ()
-        with open(STYLE_SHEET_DIR / 'tool_button_menu.stylesheet', 'r') as style_sheet_file:
-            menu_style_sheet = style_sheet_file.read()
         for widget_dict in self.widget_dict_tuple:
-            action_type_dict = {}
+            menu_entries_tuple += ({},)
+            if widget_dict is not None:
+                self.connect_screen_type_menu(widget_dict)
+        return menu_entries_tuple
+
+    def connect_screen_type_menu(self, widget_dict):
+        """Sets the menu of the screen type tool button of the given widget dict and connects it to
+        'load_screen_type_menu'.
+        """
+        widget_dict['type_button'].setMenu(widget_dict['type_menu'])
+        widget_dict['type_menu'].aboutToShow.connect(self.load_screen_type_menu)
+
+    def load_screen_type_menu(self):
+        """Creates the screen type entries of the tool button menu calling this method, if not done yet.
+        """
+        for screen_nr, widget_dict in enumerate(self.widget_dict_tuple):
+            if widget_dict is None or widget_dict['type_menu'] is not self.sender() or self.action_tuple[screen_nr]:
+                continue
+            widget_dict['type_menu'].setStyleSheet(ASSETS.style_sheet('tool_button_menu.stylesheet'))
             for screen_type, icon_label_tuple in TYPE_DICT.items():
-                menu_entries = QtWidgets.QAction(*icon_label_tuple)
+                menu_entries = QtWidgets.QAction(
+                    get_type_icon(screen_type), icon_label_tuple[1], widget_dict['type_menu']
+                                                 )
                 menu_entries.triggered.connect(self.change_screen_type_by_action)
                 widget_dict['type_menu'].addAction(menu_entries)
-                widget_dict['type_button'].setMenu(widget_dict['type_menu'])
-                widget_dict['type_menu'].setStyleSheet(menu_style_sheet)
-                action_type_dict[screen_type] = menu_entries
-            menu_entries_tuple += (action_type_dict,)
-        return menu_entries_tuple
+                self.action_tuple[screen_nr][screen_type] = menu_entries
+            screen_type = self.screen_type_list[screen_nr]
+            if screen_type:
+                widget_dict['type_menu'].setDefaultAction(self.action_tuple[screen_nr][screen_type])
 
     def load_values_from_config_to_gui(self):
         """Loads all the values from the config parser to the related default values of the GUI.
         """
-        tuple_ports = tuple(self.connected_ports_dict)
-        tuple_port_labels = self.get_more_detailed_port_tuple(tuple(self.connected_ports_dict))
+        self.load_port_values_from_config_to_gui()
         for screen_nr, widget_dict in enumerate(self.widget_dict_tuple):
-            self.load_port_entries(screen_nr, tuple_port_labels)
-            try:
-                widget_dict['port'].setCurrentIndex(
-                    tuple_ports.index(self.config['Screens'][f'port_screen_{screen_nr}'])
-                                                    )
-            except ValueError:
-                pass
-            except KeyError:
-                pass
-            self.load_resolution_and_rate_entries(screen_nr)
+            if widget_dict is None:
+                continue
             try:
                 self.set_screen_type(screen_nr, self.config['Screens'][f'type_screen_{screen_nr}'].strip('_2'))
             except KeyError:
@@ -370,39 +612,33 @@ class SettingsMainWindow(QtWidgets.QDialog):
         else:
             self.mode_radio_button_tuple[1].setChecked(True)
 
-    @staticmethod
-    def get_more_detailed_port_tuple(port_tuple):
-        """Adds the model and the manufacturer to the tuple of ports for the active screens using QT5 methods.
-        Returns more detailed tuple for given port tuple.
+    def load_port_values_from_config_to_gui(self):
+        """Loads the port, resolution and rate values from the config parser to the related default values of the GUI.
         """
-        list_active_screens = QtWidgets.QApplication.screens()
-        tuple_port_label = ()
-        for port in port_tuple:
-            for screen in list_active_screens:
-                if port == screen.name():
-                    port = f'{screen.name()}: {screen.model().strip("-")} by {screen.manufacturer()}'
-
-            tuple_port_label += (port,)
-        return tuple_port_label
+        tuple_ports = tuple(self.connected_ports_dict)
+        tuple_port_labels = self.get_more_detailed_port_tuple(tuple(self.connected_ports_dict))
+        for screen_nr, widget_dict in enumerate(self.widget_dict_tuple):
+            if widget_dict is None:
+                continue
+            try:
+                port_label = tuple_port_labels[tuple_ports.index(self.config['Screens'][f'port_screen_{screen_nr}'])]
+            except (ValueError, KeyError):
+                port_label = ''
+            self.load_port_entries(screen_nr, tuple_port_labels, port_label)
+            self.load_resolution_and_rate_entries(screen_nr)
 
-    def disable_middle_screen_if_two_screens(self):
-        """Disables middle screen GUI elements if there are less then three screens.
+    def get_more_detailed_port_tuple(self, port_tuple):
+        """Adds the model, the manufacturer and the native mode decoded from the EDIDs to the tuple of ports for all
+        connected screens, whether active or not.
+        Returns more detailed tuple for given port tuple.
         """
-        if self.screen_count < 3:
-            self.widget_dict_tuple[1]['frame'].setDisabled(True)
-            self.widget_dict_tuple[1]['type_label'].setText('disconnected')
-            self.widget_dict_tuple[1]['type_button'].setIcon(QIcon(str(ICONS_DIR / 'screen_disabled.svg')))
-            self.widget_dict_tuple[1]['type_menu'].setDefaultAction(QtWidgets.QAction())
-            self.widget_dict_tuple[1]['port'].clear()
-            self.widget_dict_tuple[1]['resolution'].clear()
-            self.widget_dict_tuple[1]['rate'].clear()
-
-    def load_port_entries(self, screen_nr, tuple_port_labels):
+        return edid.get_port_labels(port_tuple, self.edid_info_dict)
+
+    def load_port_entries(self, screen_nr, tuple_port_labels, current_port_label=''):
         """Loads the given tuple of labels of all connected ports to the port combo box of the screen with the given
-        screen nr.
+        screen nr. Selects the given port label.
         """
-        for mon in tuple_port_labels:
-            self.widget_dict_tuple[screen_nr]['port'].addItem(mon)
+        self.widget_dict_tuple[screen_nr]['port'].set_entries(tuple_port_labels, current_port_label)
 
     def load_resolution_and_rate_entries(self, screen_nr):
         """Loads all possible resolutions and refresh rates for the selected port to the associated combo boxes.
@@ -410,13 +646,14 @@ class SettingsMainWindow(QtWidgets.QDialog):
         """
         port_combo_box = self.widget_dict_tuple[screen_nr]['port']
         resolution_combo_box = self.widget_dict_tuple[screen_nr]['resolution']
-        resolution_combo_box.clear()
-        for resolution in self.connected_ports_dict[port_combo_box.currentText().split(sep=' ')[0].strip(':')]:
-            resolution_combo_box.addItem(resolution)
         try:
-            resolution_combo_box.setCurrentText(self.config['Screens'][f'resolution_screen_{screen_nr}'])
+            current_resolution = self.config['Screens'][f'resolution_screen_{screen_nr}']
         except KeyError:
-            pass
+            current_resolution = ''
+        resolution_combo_box.set_entries(
+            self.connected_ports_dict.get(port_combo_box.currentText().split(sep=' ')[0].strip(':'), {}),
+            current_resolution
+                                         )
         self.load_rate_entries(screen_nr)
 
     def load_rate_entries(self, screen_nr):
@@ -425,29 +662,31 @@ class SettingsMainWindow(QtWidgets.QDialog):
         port_combo_box = self.widget_dict_tuple[screen_nr]['port']
         resolution_combo_box = self.widget_dict_tuple[screen_nr]['resolution']
         rate_combo_box = self.widget_dict_tuple[screen_nr]['rate']
-        rate_combo_box.clear()
-        resolution_dict = self.connected_ports_dict[port_combo_box.currentText().split(sep=' ')[0].strip(':')]
-        for rate in resolution_dict[resolution_combo_box.currentText()]:
-            rate_combo_box.addItem(rate)
+        resolution_dict = self.connected_ports_dict.get(port_combo_box.currentText().split(sep=' ')[0].strip(':'), {})
         try:
-            rate_combo_box.setCurrentText(self.config['Screens'][f'rate_screen_{screen_nr}'])
+            current_rate = self.config['Screens'][f'rate_screen_{screen_nr}']
         except KeyError:
-            pass
+            current_rate = ''
+        rate_combo_box.set_entries(resolution_dict.get(resolution_combo_box.currentText(), ()), current_rate)
 
     def set_screen_type(self, screen_nr, screen_type):
         """Changes label, icon and menu default value for the given screen_nr to the given screen type.
         """
         try:
-            self.widget_dict_tuple[screen_nr]['type_menu'].setDefaultAction(self.action_tuple[screen_nr][screen_type])
-            self.widget_dict_tuple[screen_nr]['type_button'].setIcon(TYPE_DICT[screen_type][0])
+            self.widget_dict_tuple[screen_nr]['type_button'].setIcon(get_type_icon(screen_type))
             self.widget_dict_tuple[screen_nr]['type_label'].setText(TYPE_DICT[screen_type][1])
         except KeyError:
-            pass
+            return
+        self.screen_type_list[screen_nr] = screen_type
+        if self.action_tuple[screen_nr]:
+            self.widget_dict_tuple[screen_nr]['type_menu'].setDefaultAction(self.action_tuple[screen_nr][screen_type])
 
     def change_resolution_and_rate_entries(self):
         """Updates the shown resolution and refresh rates if the port or the resolution combo boxes were activated.
         """
         for screen_nr, widget_dict in enumerate(self.widget_dict_tuple):
+            if widget_dict is None:
+                continue
             if widget_dict['port'] is self.sender():
                 self.load_resolution_and_rate_entries(screen_nr)
             elif widget_dict['resolution'] is self.sender():
@@ -462,11 +701,9 @@ class SettingsMainWindow(QtWidgets.QDialog):
                     self.set_screen_type(screen_nr, screen_type)
 
     def reload_window(self):
-        """Reloads the window with a new scan of all connected ports.
+        """Reloads the port, resolution and rate entries with a new scan of all connected ports in the background.
         """
-        self.close()
-        settings_main_new = SettingsMainWindow(self)
-        settings_main_new.show()
+        self.start_probe(force_full_probe=True)
 
     def start_multi_mon(self):
         """Saves the settings and opens MultiMon.
@@ -481,6 +718,9 @@ class SettingsMainWindow(QtWidgets.QDialog):
         """Saves the settings and opens the Customize Window.
         Returns False, if settings the settings are incorrect.
         """
+        if self.screen_count < 2:
+            self.one_screen_warning()
+            return False
         if not self.save_all_values_in_config():
             return False
         customize_window = CustomizeWindow(self, self.config)
@@ -520,15 +760,15 @@ class SettingsMainWindow(QtWidgets.QDialog):
         """
         selected_values_dict = {'port': (), 'resolution': (), 'rate': (), 'type': ()}
 
-        for screen_nr, type_dict in enumerate(self.action_tuple):
-            selected_values_dict['port'] += (self.widget_dict_tuple[screen_nr]['port'].currentText().split(sep=':')[0],)
-            selected_values_dict['resolution'] += (self.widget_dict_tuple[screen_nr]['resolution'].currentText(),)
-            selected_values_dict['rate'] += (self.widget_dict_tuple[screen_nr]['rate'].currentText(),)
-            screen_type_to_add = ''
-            for screen_type, action in type_dict.items():
-                if self.widget_dict_tuple[screen_nr]['type_menu'].defaultAction() is action:
-                    screen_type_to_add = screen_type
-            selected_values_dict['type'] += (screen_type_to_add,)
+        for screen_nr, widget_dict in enumerate(self.widget_dict_tuple):
+            if widget_dict is None:
+                for key in selected_values_dict:
+                    selected_values_dict[key] += ('',)
+                continue
+            selected_values_dict['port'] += (widget_dict['port'].currentText().split(sep=':')[0],)
+            selected_values_dict['resolution'] += (widget_dict['resolution'].currentText(),)
+            selected_values_dict['rate'] += (widget_dict['rate'].currentText(),)
+            selected_values_dict['type'] += (self.screen_type_list[screen_nr],)
         return selected_values_dict
 
     def check_if_all_settings_correct(self, selected_screen_type_tuple, selected_port_tuple):
@@ -586,10 +826,12 @@ class SettingsMainWindow(QtWidgets.QDialog):
         """Saves all the settings in the config parser, writes the config parser to the conf file and closes the main 
         window. Returns True if successful, False if not.
         """
+        if self.screen_count < 2:
+            self.one_screen_warning()
+            return False
         if not self.save_all_values_in_config():
             return False
-        with CONF_FILE.open('w') as conf_file:
-            self.config.write(conf_file)
+        config_store.write_config(self.config)
         self.close()
         return True
 
@@ -626,8 +868,7 @@ class CustomizeWindow(QtWidgets.QDialog):
     def __init__(self, parent=None, config=None):
         super().__init__(parent)
         self.setWindowTitle('Customize MultiMon')
-        with open(STYLE_SHEET_DIR / 'customize.stylesheet', 'r') as style_sheet:
-            self.setStyleSheet(style_sheet.read())
+        self.setStyleSheet(ASSETS.style_sheet('customize.stylesheet'))
         self.config = config
         self.label_title = QtWidgets.QLabel()
         self.label_title.setText('Select the buttons to show up in MultiMon')
@@ -663,7 +904,7 @@ class CustomizeWindow(QtWidgets.QDialog):
             button.setIconSize(QSize(icon_width, icon_height))
             button.setCheckable(True)
             grid_layout_selection.addWidget(button, row, column,  1, 1)
-            button.setIcon(QIcon(str(icon_dir / f'{name}.svg')))
+            button.setIcon(ASSETS.icon(icon_dir / f'{name}.svg'))
             button.setToolTip(tooltip)
             button.setChecked(self.config.getboolean('Customize', name))
             button_dict[name] = button
@@ -708,7 +949,7 @@ class CustomizeWindow(QtWidgets.QDialog):
         push_button_cancel = QtWidgets.QPushButton()
         push_button_cancel.setMinimumSize(QSize(60, 60))
         push_button_cancel.setCursor(QCursor(Qt.PointingHandCursor))
-        push_button_cancel.setIcon(QIcon(str(ICONS_DIR / 'exit.svg')))
+        push_button_cancel.setIcon(ASSETS.icon(ICONS_DIR / 'exit.svg'))
         push_button_cancel.setToolTip('Cancel')
         push_button_cancel.setIconSize(QSize(40, 40))
         push_button_cancel.setProperty('bottom', True)
@@ -716,7 +957,7 @@ class CustomizeWindow(QtWidgets.QDialog):
         push_button_ok = QtWidgets.QPushButton(self)
         push_button_ok.setMinimumSize(QSize(66, 60))
         push_button_ok.setCursor(QCursor(Qt.PointingHandCursor))
-        push_button_ok.setIcon(QIcon(str(ICONS_DIR / 'finish.svg')))
+        push_button_ok.setIcon(ASSETS.icon(ICONS_DIR / 'finish.svg'))
         push_button_ok.setToolTip('Save and exit')
         push_button_ok.setIconSize(QSize(46, 43))
         push_button_ok.setProperty('bottom', True)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import sys
+import json
+import tempfile
+import randr
+from switch_queue import SwitchQueue, get_runtime_file
+
+SNAPSHOT_NAME = 'snapshot.json'
+
+
+def make_snapshot(randr_state):
+    """Returns a compact snapshot of the given RandR state (see 'randr.get_randr_state'), which holds everything needed
+    to restore it: {'fb': [width, height], 'outputs': {port: None if turned off or {'mode': resolution, 'rate': rate,
+    'pos': [x, y], 'rotation': rotation, 'primary': bool, 'crtc': crtc nr}}}
+    Disconnected outputs, which are turned off, are left out.
+    """
+    outputs_dict = {}
+    for port, output in randr_state['outputs'].items():
+        if output['geometry'] is None or output['mode'] is None:
+            if output['connected']:
+                outputs_dict[port] = None
+            continue
+        outputs_dict[port] = {'mode': output['mode'], 'rate': output['rate'], 'pos': list(output['geometry'][2:]),
+                              'rotation': output['rotation'], 'primary': output['primary'], 'crtc': output['crtc']}
+    return {'fb': list(randr_state['screen']['current']), 'outputs': outputs_dict}
+
+
+def get_restore_command(snapshot):
+    """Returns one Xrandr command, which restores the given snapshot in a single modeset.
+    """
+    command = (randr.XRANDR, '--fb', f'{snapshot["fb"][0]}x{snapshot["fb"][1]}')
+    for port, output in snapshot['outputs'].items():
+        command += ('--output', port)
+        if output is None:
+            command += ('--off',)
+            continue
+        command += ('--mode', output['mode'])
+        if output['rate'] is not None:
+            command += ('--rate', output['rate'])
+        command += ('--pos', f'{output["pos"][0]}x{output["pos"][1]}', '--rotate', output['rotation'])
+        if output['crtc'] is not None:
+            command += ('--crtc', str(output['crtc']))
+        if output['primary']:
+            command += ('--primary',)
+    return command
+
+
+def save_snapshot(snapshot, display_name=None):
+    """Saves the given snapshot as the state to return to with 'undo_last_switch' on the given X display
+    (default: $DISPLAY).
+    """
+    snapshot_file = get_runtime_file(SNAPSHOT_NAME, display_name)
+    try:
+        file_descriptor, temp_file = tempfile.mkstemp(dir=snapshot_file.parent, prefix=snapshot_file.name)
+        with os.fdopen(file_descriptor, 'w') as temp_snapshot_file:
+            json.dump(snapshot, temp_snapshot_file)
+        os.replace(temp_file, snapshot_file)
+    except OSError as error:
+        print(f'Could not save the snapshot: {error}')
+
+
+def load_snapshot(display_name=None):
+    """Returns the last saved snapshot of the given X display (default: $DISPLAY). Returns None, if there is none.
+    """
+    try:
+        with get_runtime_file(SNAPSHOT_NAME, display_name).open('r') as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def undo_last_switch(display_name=None):
+    """Restores the RandR state saved before the last mode switch of the given X display (default: $DISPLAY) on that
+    display. The undo is a switch itself, so undoing twice returns to the state before the first undo.
+    Returns the SwitchResult or None, if there is no snapshot.
+    """
+    from multi_mon import ScreenSetup
+    snapshot = load_snapshot(display_name)
+    if snapshot is None:
+        return None
+    screen_setup = ScreenSetup(display_name=display_name)
+    return SwitchQueue(display_name).run_exclusively(lambda: screen_setup.restore_snapshot(snapshot))
+
+
+def main():
+    switch_result = undo_last_switch()
+    if switch_result is None:
+        print('No switch to undo.')
+        sys.exit(1)
+    print(switch_result)
+    sys.exit(0 if switch_result else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import os
+import json
+import fcntl
+import tempfile
+from pathlib import Path
+
+
+def get_runtime_file(name, display_name=None):
+    """Returns the path of the runtime file with the given name for the current user and the given X display
+    (default: $DISPLAY), for example /run/user/1000/multi_mon-1000-0-switch.lock
+    """
+    display_name = display_name or os.environ.get('DISPLAY', '')
+    runtime_dir = Path(os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir())
+    return runtime_dir / f'multi_mon-{os.getuid()}-{display_name.lstrip(":").replace("/", "_")}-{name}'
+
+
+class FileLock(object):
+    """Exclusive lock on a runtime file, shared by all MultiMon processes of one user on one X display.
+    """
+    def __init__(self, name, display_name=None):
+        self.lock_file = get_runtime_file(name, display_name)
+        self.file_descriptor = None
+
+    def acquire(self, blocking=False):
+        """Acquires the lock. Returns True if successful, False if another process or thread holds the lock and
+        blocking is False.
+        """
+        if self.file_descriptor is not None:
+            return True
+        file_descriptor = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(file_descriptor, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(file_descriptor)
+            return False
+        self.file_descriptor = file_descriptor
+        return True
+
+    def release(self):
+        """Releases the lock, if held.
+        """
+        if self.file_descriptor is not None:
+            fcntl.flock(self.file_descriptor, fcntl.LOCK_UN)
+            os.close(self.file_descriptor)
+            self.file_descriptor = None
+
+
+class SwitchQueue(object):
+    """Serializes the mode switches of all MultiMon processes on one X display (default: $DISPLAY), to which the pending
+    targets are applied. A submitted target overwrites any pending target, so only the latest one is applied once the
+    switch in progress is complete.
+    Only the process holding the switch lock runs Xrandr and the desktop environment commands.
+    """
+    def __init__(self, display_name=None):
+        self.display_name = display_name
+        self.switch_lock = FileLock('switch.lock', display_name)
+        self.pending_file = get_runtime_file('pending.json', display_name)
+
+    def submit(self, mode, tuples_all_screens):
+        """Queues the mode with the given label and screen tuples (port, resolution, rate, screen type) and applies
+        all pending targets, if no other switch is in progress.
+        Returns the SwitchResult of the last applied target. Returns None, if the target was handed over to the
+        switch in progress.
+        """
+        self.write_pending_target(
+            {'mode': mode, 'screens': [list(tuple_screen) for tuple_screen in tuples_all_screens]}
+                                  )
+        return self.apply_pending_targets_if_free()
+
+    def run_or_submit(self, switch_function, mode, tuples_all_screens):
+        """Calls the given function, which changes into the mode with the given label and returns a SwitchResult,
+        right away, if no other switch is in progress. Submits the mode otherwise (see 'submit').
+        Returns the SwitchResult of the last applied target. Returns None, if the target was handed over to the
+        switch in progress.
+        """
+        if not self.switch_lock.acquire():
+            return self.submit(mode, tuples_all_screens)
+        try:
+            switch_result = switch_function()
+        finally:
+            self.switch_lock.release()
+        applied_switch_result = self.apply_pending_targets_if_free()
+        return applied_switch_result if applied_switch_result is not None else switch_result
+
+    def run_exclusively(self, switch_function):
+        """Calls the given function, which changes the RandR state and returns a SwitchResult, once the switch in
+        progress is complete. Applies the targets submitted in the meantime afterwards, so none of them is lost.
+        Returns the SwitchResult of the given function.
+        """
+        self.switch_lock.acquire(blocking=True)
+        try:
+            switch_result = switch_function()
+        finally:
+            self.switch_lock.release()
+        self.apply_pending_targets_if_free()
+        return switch_result
+
+    def apply_pending_targets_if_free(self):
+        """Applies the pending targets, if no other switch is in progress.
+        Returns the SwitchResult of the last applied target or None, if no target was applied.
+        """
+        switch_result = None
+        # a target submitted while the lock is released again has to be applied by this process:
+        #
+        while self.pending_file.exists() and self.switch_lock.acquire():
+            try:
+                applied_switch_result = self.apply_pending_targets()
+            finally:
+                self.switch_lock.release()
+            if applied_switch_result is not None:
+                switch_result = applied_switch_result
+        return switch_result
+
+    def apply_pending_targets(self):
+        """Applies the pending target until no new target is submitted in the meantime.
+        Returns the SwitchResult of the last applied target or None, if there was no pending target.
+        """
+        from auto_profiles import apply_profile
+        switch_result = None
+        target = self.pop_pending_target()
+        while target is not None:
+            switch_result = apply_profile(target, self.display_name)
+            target = self.pop_pending_target()
+        return switch_result
+
+    def write_pending_target(self, target):
+        """Replaces the pending target by the given target atomically.
+        """
+        file_descriptor, temp_file = tempfile.mkstemp(dir=self.pending_file.parent, prefix=self.pending_file.name)
+        with os.fdopen(file_descriptor, 'w') as pending_file:
+            json.dump(target, pending_file)
+        os.replace(temp_file, self.pending_file)
+
+    def pop_pending_target(self):
+        """Returns and removes the pending target. Returns None, if there is no pending target.
+        """
+        taken_file = self.pending_file.with_name(f'{self.pending_file.name}.taken')
+        try:
+            self.pending_file.replace(taken_file)
+        except OSError:
+            return None
+        try:
+            with taken_file.open('r') as pending_file:
+                return json.load(pending_file)
+        except (OSError, ValueError):
+            return None
+        finally:
+            try:
+                taken_file.unlink()
+            except OSError:
+                pass
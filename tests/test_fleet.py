@@ -0,0 +1,76 @@
+import os
+import sys
+import shutil
+import subprocess
+import configparser
+from pathlib import Path
+import pytest
+import randr
+from fleet import get_display_config
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_display_config_replaces_sections_of_the_display():
+    config = configparser.ConfigParser()
+    config.read_dict({'Screens': {'screen_count': '2'}, 'Screens :1': {'screen_count': '1'},
+                      'Mode': {'reclaim_outputs': 'false'}, 'Mode :2': {'reclaim_outputs': 'true'},
+                      'Rate policy :1': {'hdmi-0': 'ac:max'}})
+    display_config = get_display_config(config, ':1')
+    assert display_config['Screens']['screen_count'] == '1'
+    assert not display_config.getboolean('Mode', 'reclaim_outputs')
+    assert display_config['Rate policy']['hdmi-0'] == 'ac:max'
+    display_config = get_display_config(config, ':2')
+    assert display_config['Screens']['screen_count'] == '2'
+    assert display_config.getboolean('Mode', 'reclaim_outputs')
+    assert not display_config.has_section('Rate policy')
+
+
+@pytest.fixture
+def xvfb_displays():
+    """Starts two Xvfb servers with different screen sizes. Yields a list of their display names.
+    """
+    if not shutil.which('Xvfb') or not shutil.which('xrandr'):
+        pytest.skip('needs Xvfb and xrandr')
+    from idle_benchmark import start_xvfb
+    xvfb_list = [start_xvfb(screen_size) for screen_size in ('1280x1024x24', '1024x768x24')]
+    try:
+        yield [display_name for _, display_name in xvfb_list]
+    finally:
+        for xvfb_proc, _ in xvfb_list:
+            xvfb_proc.terminate()
+            xvfb_proc.wait()
+
+
+def get_randr_state(display_name):
+    lines = subprocess.run(('xrandr', '--current', '--verbose'), env=dict(os.environ, DISPLAY=display_name),
+                           stdout=subprocess.PIPE, check=True).stdout.splitlines(keepends=True)
+    return randr.parse_xrandr_verbose(lines)
+
+
+def test_fleet_switches_every_display_with_its_own_screens(xvfb_displays, tmp_path):
+    config = configparser.ConfigParser()
+    target_dict = {}
+    for display_name in xvfb_displays:
+        port, output = next((port, output) for port, output in get_randr_state(display_name)['outputs'].items()
+                            if output['connected'])
+        # another mode than the current one, if the output has one:
+        #
+        resolution = next((mode for mode in output['modes'] if mode != output['mode']), output['mode'])
+        target_dict[display_name] = (port, resolution, output['modes'][resolution][0])
+        config[f'Screens {display_name}'] = {'screen_count': '1', 'tv_count': '0', 'port_screen_0': port,
+                                             'resolution_screen_0': resolution,
+                                             'rate_screen_0': output['modes'][resolution][0],
+                                             'type_screen_0': 'main'}
+    (tmp_path / 'config').mkdir()
+    with (tmp_path / 'config' / 'multi_mon_conf.conf').open('w') as conf_file:
+        config.write(conf_file)
+    # no desktop environment, so no hooks run against the session of the user:
+    #
+    env = {'PATH': os.environ['PATH'], 'HOME': str(tmp_path), 'MULTI_MON_CONFIG_DIR': str(tmp_path / 'config'),
+           'XDG_RUNTIME_DIR': str(tmp_path), 'QT_QPA_PLATFORM': 'offscreen'}
+    proc = subprocess.run((sys.executable, str(ROOT_DIR / 'fleet.py'), 'main_only', *xvfb_displays), env=env,
+                          cwd=ROOT_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=120)
+    assert proc.returncode == 0, proc.stdout.decode()
+    for display_name, (port, resolution, _) in target_dict.items():
+        assert get_randr_state(display_name)['outputs'][port]['mode'] == resolution
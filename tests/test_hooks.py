@@ -0,0 +1,67 @@
+import time
+import configparser
+from pathlib import Path
+import pytest
+import multi_mon
+from hooks import Hook, HookPipeline, wait_for_background_hooks
+
+
+def test_blocking_hooks_stop_at_the_budget_and_the_others_run_in_the_background(tmp_path):
+    hook_pipeline = HookPipeline([Hook('suspend', 'sleep 5', 'pre', blocking=True),
+                                  Hook('after_suspend', 'sleep 5', 'pre', blocking=True, after=('suspend',)),
+                                  Hook('audio', f'sleep 0.5; touch {tmp_path / "audio"}', 'pre')],
+                                 blocking_budget=0.5)
+    start_time = time.monotonic()
+    result_list = hook_pipeline.run_blocking('tv_only')
+    hook_pipeline.start_background('pre', 'tv_only', result_list)
+    assert time.monotonic() - start_time < 2.0
+    assert [(result['hook'], result['returncode']) for result in result_list] == [('suspend', None)]
+    wait_for_background_hooks(timeout=10)
+    assert (tmp_path / 'audio').exists()
+    assert [result['hook'] for result in result_list] == ['suspend', 'audio']
+
+
+def test_post_hooks_run_when_the_mode_change_raises(tmp_path, monkeypatch):
+    hook_pipeline = HookPipeline([Hook('resume', f'touch {tmp_path / "resumed"}', 'post')])
+    monkeypatch.setattr(multi_mon.HookPipeline, 'from_config',
+                        classmethod(lambda cls, config, display_name: hook_pipeline))
+
+    class FailingSetup(object):
+        mode_label = 'tv_only'
+        config = None
+        display_name = None
+
+        @multi_mon.hook_pipeline_decorator()
+        def change(self):
+            raise OSError('xrandr not found')
+
+    with pytest.raises(OSError):
+        FailingSetup().change()
+    wait_for_background_hooks(timeout=10)
+    assert (tmp_path / 'resumed').exists()
+
+
+def test_policy_rate_changes_skip_the_desktop_environment_hooks(tmp_path, monkeypatch):
+    import randr
+    import power_policy
+    fake_xrandr = str(Path(__file__).resolve().parent.parent / 'fake_xrandr.py')
+    monkeypatch.setattr(randr, 'XRANDR', fake_xrandr)
+    monkeypatch.setattr(power_policy, 'XRANDR', fake_xrandr)
+    monkeypatch.setenv('MULTI_MON_FAKE_XRANDR_STATE', str(tmp_path / 'state.json'))
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    monkeypatch.setenv('KDE_FULL_SESSION', 'true')
+    monkeypatch.delenv('DISPLAY', raising=False)
+    monkeypatch.setattr(multi_mon, 'get_power_source', lambda: 'battery')
+    config = configparser.ConfigParser()
+    config.read_dict({'Rate policy': {'HDMI-1': 'ac:max battery:60'},
+                      'Hook suspend_compositor': {'command': f'touch {tmp_path / "suspended"}'},
+                      'Hook resume_compositor': {'command': f'touch {tmp_path / "resumed"}'},
+                      'Hook notify': {'command': f'touch {tmp_path / "notified"}'}})
+    power_source_watcher = power_policy.PowerSourceWatcher()
+    power_source_watcher.power_source = 'battery'
+    switch_result = power_source_watcher.change_rates(config)
+    wait_for_background_hooks(timeout=10)
+    assert switch_result, str(switch_result)
+    assert randr.get_randr_state()['outputs']['HDMI-1']['rate'] == '60.00'
+    assert (tmp_path / 'notified').exists()
+    assert not (tmp_path / 'suspended').exists() and not (tmp_path / 'resumed').exists()
@@ -0,0 +1,14 @@
+import pytest
+from idle_benchmark import TARGET_TUPLE, parse_arguments
+
+
+def test_no_targets_benchmarks_all_targets():
+    args = parse_arguments(['--cycles', '1', '--idle-seconds', '0.1'])
+    assert args.targets == list(TARGET_TUPLE)
+    assert args.cycles == 1
+
+
+def test_given_targets_are_kept_and_checked():
+    assert parse_arguments(['tray']).targets == ['tray']
+    with pytest.raises(SystemExit):
+        parse_arguments(['unknown'])
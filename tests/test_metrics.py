@@ -0,0 +1,35 @@
+import os
+from metrics import MetricsSink, get_desktop_environment
+
+
+def test_forked_process_writes_only_its_own_observations(tmp_path):
+    textfile = tmp_path / 'multi_mon.prom'
+    metrics_sink = MetricsSink(textfile, interval=3600)
+    metrics_sink.observe_switch('tv_only', True, 0.5)
+    pid = os.fork()
+    if pid == 0:
+        # like a worker of a multiprocessing pool, which exits without the atexit handlers:
+        #
+        metrics_sink.observe_switch('pc_only', False, 1.0)
+        metrics_sink.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    metrics_sink.flush()
+    line_set = set(textfile.read_text().splitlines())
+    desktop_environment = get_desktop_environment()
+    assert (f'multi_mon_switches_total{{mode="tv_only",desktop_environment="{desktop_environment}",result="success"}} 1'
+            in line_set)
+    assert (f'multi_mon_switches_total{{mode="pc_only",desktop_environment="{desktop_environment}",result="failure"}} 1'
+            in line_set)
+
+
+def test_labels_with_the_former_separator_are_kept(tmp_path):
+    textfile = tmp_path / 'multi_mon.prom'
+    metrics_sink = MetricsSink(textfile, interval=3600)
+    metrics_sink.observe_switch('preset:desk|tv', True, 0.5)
+    metrics_sink.flush()
+    metrics_sink.observe_switch('preset:desk|tv', True, 0.5)
+    metrics_sink.flush()
+    desktop_environment = get_desktop_environment()
+    assert (f'multi_mon_switches_total{{mode="preset:desk|tv",desktop_environment="{desktop_environment}",'
+            f'result="success"}} 2' in textfile.read_text().splitlines())
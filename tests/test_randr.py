@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+import fake_xrandr
+from randr import freeze_mode_table, get_common_modes, get_provider_ports, parse_xrandr_providers
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_common_modes_skip_mode_names_without_size():
+    modes_dict = {'1920x1080_60.00': ['59.96'], 'custom': ['60.00'], '1920x1080': ['60.00', '50.00'],
+                  '1920x1080i': ['60.00'], '1280x720': ['60.00']}
+    common_mode_tuple = get_common_modes(freeze_mode_table(modes_dict), freeze_mode_table(modes_dict))
+    assert common_mode_tuple == (('1920x1080', '60.00'), ('1920x1080_60.00', '59.96'), ('1920x1080', '50.00'),
+                                 ('1920x1080i', '60.00'), ('1280x720', '60.00'))
+
+
+def test_provider_ports_follow_the_output_counts_not_the_names():
+    lines = [b'Providers: number : 3\n',
+             b'Provider 0: id: 0x47 cap: 0xf crtcs: 3 outputs: 2 associated providers: 1 name:modesetting\n',
+             b'Provider 1: id: 0x2a6 cap: 0xa crtcs: 2 outputs: 1 associated providers: 0 name:NVIDIA-G0\n',
+             b'Provider 2: id: 0x3b1 cap: 0xa crtcs: 2 outputs: 2 associated providers: 1 name:DisplayLink\n']
+    provider_list = parse_xrandr_providers(lines)
+    # DP-1-1 and DP-1-2 are DP-MST ports of the first provider:
+    #
+    assert get_provider_ports(provider_list, ('DP-1-1', 'DP-1-2', 'DVI-I-1', 'DVI-I-2')) == {
+        'DP-1-1': 0, 'DP-1-2': 0, 'DVI-I-1': 2, 'DVI-I-2': 2
+    }
+    assert get_provider_ports(provider_list, ('DP-1-1', 'DP-1-2')) == {}
+
+
+def run_xrandr_switch(tmp_path, state, command_arguments):
+    """Changes to the given Xrandr arguments with MultiMon in the given fake Xrandr state. Returns the new state.
+    """
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps(state))
+    (tmp_path / 'config').mkdir()
+    env = {'PATH': os.environ['PATH'], 'HOME': str(tmp_path), 'MULTI_MON_CONFIG_DIR': str(tmp_path / 'config'),
+           'XDG_RUNTIME_DIR': str(tmp_path), 'QT_QPA_PLATFORM': 'offscreen',
+           'MULTI_MON_XRANDR': str(ROOT_DIR / 'fake_xrandr.py'), 'MULTI_MON_FAKE_XRANDR_STATE': str(state_file)}
+    script = ('import sys, multi_mon\n'
+              'switch_result = multi_mon.ScreenSetup().change_to_command((multi_mon.XRANDR, *sys.argv[1:]))\n'
+              'print(switch_result)\n'
+              'sys.exit(0 if switch_result else 1)\n')
+    proc = subprocess.run((sys.executable, '-c', script, *command_arguments), env=env, cwd=ROOT_DIR,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=60)
+    assert proc.returncode == 0, proc.stdout.decode()
+    return json.loads(state_file.read_text())
+
+
+def test_switch_sets_up_the_provider_of_an_unlisted_output_only(tmp_path):
+    state = fake_xrandr.make_default_state()
+    state['providers'].append({'id': '0x3b1', 'name': 'DisplayLink', 'capabilities': fake_xrandr.SINK_CAPABILITIES,
+                               'crtc_count': 1, 'associated': False})
+    state['outputs']['DVI-I-1'] = fake_xrandr.make_output(2, crtcs=(5,))
+    state = run_xrandr_switch(tmp_path, state, ('--output', 'HDMI-A-2', '--mode', '1920x1080', '--right-of', 'HDMI-1'))
+    assert [provider['associated'] for provider in state['providers']] == [False, True, False]
+    assert state['outputs']['HDMI-A-2']['mode'] == '1920x1080'
+    assert state['outputs']['HDMI-A-2']['pos'] == [3840, 0]
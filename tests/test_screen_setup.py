@@ -0,0 +1,83 @@
+import configparser
+from pathlib import Path
+import pytest
+import randr
+import multi_mon
+from snapshot import undo_last_switch
+
+FAKE_XRANDR = str(Path(__file__).resolve().parent.parent / 'fake_xrandr.py')
+
+
+@pytest.fixture
+def fake_screens(tmp_path, monkeypatch):
+    """Lets MultiMon change the screens of the fake Xrandr without a desktop environment and an X display.
+    """
+    monkeypatch.setattr(randr, 'XRANDR', FAKE_XRANDR)
+    monkeypatch.setenv('MULTI_MON_FAKE_XRANDR_STATE', str(tmp_path / 'state.json'))
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    for name in ('DISPLAY', 'KDE_FULL_SESSION', 'DESKTOP_SESSION'):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_switch_from_a_planned_state_runs_the_plan_without_planning_again(fake_screens, monkeypatch):
+    screen_setup = multi_mon.ScreenSetup(config=configparser.ConfigParser())
+    command = (FAKE_XRANDR, '--output', 'eDP-1', '--mode', '1280x720', '--output', 'HDMI-1', '--off')
+    screen_setup.get_plan(command, randr.get_randr_state())
+    monkeypatch.setattr(multi_mon.TransitionPlanner, 'plan', lambda planner, command: pytest.fail('planned again'))
+    switch_result = screen_setup.change_to_command(command)
+    assert switch_result, str(switch_result)
+    assert randr.get_randr_state()['outputs']['eDP-1']['mode'] == '1280x720'
+
+
+
+def test_switch_in_several_steps_verifies_the_whole_target(fake_screens, monkeypatch):
+    screen_setup = multi_mon.ScreenSetup(config=configparser.ConfigParser())
+    command = (FAKE_XRANDR, '--output', 'eDP-1', '--mode', '1280x720', '--output', 'HDMI-1', '--off')
+    verified_command_list = []
+    verify_switch = multi_mon.ScreenSetup.verify_switch
+
+    def plan_in_two_steps(planner, command):
+        return (multi_mon.get_partial_command(command, ('HDMI-1',)),
+                multi_mon.get_partial_command(command, ('eDP-1',)))
+
+    def record_verified_command(screen_setup, switch_result, command):
+        verified_command_list.append(command)
+        return verify_switch(screen_setup, switch_result, command)
+
+    monkeypatch.setattr(multi_mon.TransitionPlanner, 'plan', plan_in_two_steps)
+    monkeypatch.setattr(multi_mon.ScreenSetup, 'verify_switch', record_verified_command)
+    switch_result = screen_setup.change_to_command(command)
+    assert switch_result, str(switch_result)
+    assert verified_command_list == [command]
+
+
+@pytest.fixture
+def display_log(fake_screens, tmp_path, monkeypatch):
+    """Lets the fake Xrandr log the $DISPLAY it runs with to the returned file, while $DISPLAY of the tests is :0.
+    """
+    display_log = tmp_path / 'display.log'
+    xrandr = tmp_path / 'xrandr'
+    xrandr.write_text(f'#!/bin/sh\necho "$DISPLAY" >> {display_log}\nexec {FAKE_XRANDR} "$@"\n')
+    xrandr.chmod(0o755)
+    monkeypatch.setattr(randr, 'XRANDR', str(xrandr))
+    monkeypatch.setattr(multi_mon, 'XRANDR', str(xrandr))
+    monkeypatch.setenv('DISPLAY', ':0')
+    return display_log
+
+
+def test_switch_on_another_display_runs_xrandr_on_it(display_log):
+    screen_setup = multi_mon.ScreenSetup(('eDP-1', '1280x720', '60.00', 'main'), config=configparser.ConfigParser(),
+                                         display_name=':7')
+    switch_result = screen_setup.switch_to_mode('main_only')
+    assert switch_result, str(switch_result)
+    assert set(display_log.read_text().split()) == {':7'}
+
+
+def test_undo_restores_on_the_display_of_the_snapshot(display_log):
+    screen_setup = multi_mon.ScreenSetup(('eDP-1', '1280x720', '60.00', 'main'), config=configparser.ConfigParser(),
+                                         display_name=':7')
+    assert screen_setup.switch_to_mode('main_only')
+    switch_result = undo_last_switch(':7')
+    assert switch_result, str(switch_result)
+    assert randr.get_randr_state(':7')['outputs']['HDMI-1']['mode'] == '1920x1080'
+    assert set(display_log.read_text().split()) == {':7'}
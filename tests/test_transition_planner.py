@@ -0,0 +1,142 @@
+import pytest
+from transition_planner import TransitionPlanner, TransitionError, parse_output_arguments, get_unreached_outputs
+
+XRANDR = 'xrandr'
+MODES = {'1920x1080': ['60.00', '50.00'], '1280x720': ['60.00']}
+
+
+def make_output(geometry=None, crtc=None, crtcs=(0, 1), mode=None, rotation='normal', connected=True):
+    return {'connected': connected, 'primary': False, 'edid': '', 'crtc': crtc, 'crtcs': tuple(crtcs),
+            'geometry': geometry, 'rotation': rotation, 'mode': mode, 'rate': '60.00' if mode else None,
+            'modes': MODES}
+
+
+def make_state(outputs_dict, crtc_count=2, maximum=(8192, 8192)):
+    geometries = [output['geometry'] for output in outputs_dict.values() if output['geometry'] is not None]
+    current = (max((g[0] + g[2] for g in geometries), default=0), max((g[1] + g[3] for g in geometries), default=0))
+    return {'screen': {'current': current, 'maximum': maximum}, 'crtc_count': crtc_count, 'outputs': outputs_dict}
+
+
+def test_target_layout_resolves_relative_flags():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, mode='1920x1080'),
+                                            'B': make_output()}))
+    layout_dict = planner.get_target_layout((XRANDR, '--output', 'A', '--mode', '1920x1080', '--primary',
+                                             '--output', 'B', '--mode', '1280x720', '--right-of', 'A'))
+    assert layout_dict == {'A': (1920, 1080, 0, 0), 'B': (1280, 720, 1920, 0)}
+
+
+def test_target_layout_is_moved_to_the_origin():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, mode='1920x1080'),
+                                            'B': make_output()}))
+    layout_dict = planner.get_target_layout((XRANDR, '--output', 'A', '--mode', '1920x1080',
+                                             '--output', 'B', '--mode', '1280x720', '--left-of', 'A'))
+    assert layout_dict == {'A': (1920, 1080, 1280, 0), 'B': (1280, 720, 0, 0)}
+
+
+def test_target_layout_rotation_and_off():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, mode='1920x1080'),
+                                            'B': make_output((1280, 720, 1920, 0), 1, mode='1280x720')}))
+    layout_dict = planner.get_target_layout((XRANDR, '--output', 'A', '--mode', '1920x1080', '--rotate', 'left',
+                                             '--output', 'B', '--off'))
+    assert layout_dict == {'A': (1080, 1920, 0, 0), 'B': None}
+
+
+def test_target_layout_rejects_unsupported_mode_and_disabled_relative():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, mode='1920x1080'),
+                                            'B': make_output()}))
+    with pytest.raises(TransitionError):
+        planner.get_target_layout((XRANDR, '--output', 'B', '--mode', '3840x2160'))
+    with pytest.raises(TransitionError):
+        planner.get_target_layout((XRANDR, '--output', 'A', '--off',
+                                   '--output', 'B', '--mode', '1280x720', '--right-of', 'A'))
+
+
+def test_assign_crtcs_keeps_current_crtcs():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 1, mode='1920x1080'),
+                                            'B': make_output()}))
+    assert planner.assign_crtcs(('A', 'B')) == {'A': 1, 'B': 0}
+
+
+def test_assign_crtcs_moves_an_output_to_free_a_crtc():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, crtcs=(0, 1), mode='1920x1080'),
+                                            'B': make_output(crtcs=(0,))}))
+    assert planner.assign_crtcs(('A', 'B')) == {'A': 1, 'B': 0}
+
+
+def test_assign_crtcs_never_moves_fixed_outputs():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, crtcs=(0, 1), mode='1920x1080'),
+                                            'B': make_output(crtcs=(0,))}))
+    with pytest.raises(TransitionError):
+        planner.assign_crtcs(('A', 'B'), {'A': 0})
+
+
+def test_assign_crtcs_rejects_too_many_outputs():
+    planner = TransitionPlanner(make_state({port: make_output() for port in 'ABC'}))
+    with pytest.raises(TransitionError):
+        planner.assign_crtcs(('A', 'B', 'C'))
+
+
+def test_plan_pins_outputs_missing_in_the_command():
+    # C isn't mentioned and holds CRTC 1, the only other CRTC B could use:
+    #
+    planner = TransitionPlanner(make_state({
+        'A': make_output((1920, 1080, 0, 0), 0, crtcs=(0, 1), mode='1920x1080'),
+        'B': make_output(crtcs=(0, 1)),
+        'C': make_output((1280, 720, 1920, 0), 1, crtcs=(0, 1), mode='1280x720')
+                                            }))
+    with pytest.raises(TransitionError):
+        planner.plan((XRANDR, '--output', 'B', '--mode', '1280x720', '--right-of', 'C'))
+    command_tuple = planner.plan((XRANDR, '--output', 'A', '--off', '--output', 'B', '--mode', '1280x720'))
+    output_arguments_dict = parse_output_arguments(command_tuple[-1])
+    assert 'C' not in output_arguments_dict
+    assert output_arguments_dict['B'][2:4] == ['--crtc', '0']
+
+
+
+def test_plan_never_takes_the_crtc_of_an_output_missing_in_the_command():
+    # B can only use CRTC 0, which the untouched C holds:
+    #
+    planner = TransitionPlanner(make_state({'C': make_output((1280, 720, 0, 0), 0, crtcs=(0, 1), mode='1280x720'),
+                                            'B': make_output(crtcs=(0,))}))
+    with pytest.raises(TransitionError):
+        planner.plan((XRANDR, '--output', 'B', '--mode', '1280x720', '--right-of', 'C'))
+
+
+def test_plan_uses_one_command_if_safe():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, mode='1920x1080'),
+                                            'B': make_output(crtcs=(1,))}))
+    command_tuple = planner.plan((XRANDR, '--output', 'A', '--off', '--output', 'B', '--mode', '1920x1080'))
+    assert len(command_tuple) == 1
+    assert command_tuple[0][1:3] == ('--fb', '1920x1080')
+
+
+def test_plan_splits_if_a_disabled_output_blocks_a_crtc():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, crtcs=(0,), mode='1920x1080'),
+                                            'B': make_output(crtcs=(0,))}, crtc_count=1))
+    disable_command, final_command = planner.plan((XRANDR, '--output', 'A', '--off',
+                                                   '--output', 'B', '--mode', '1280x720'))
+    assert disable_command == (XRANDR, '--output', 'A', '--off')
+    assert parse_output_arguments(final_command)['B'][-4:] == ['--crtc', '0', '--pos', '0x0']
+
+
+def test_plan_rejects_a_too_big_framebuffer():
+    planner = TransitionPlanner(make_state({'A': make_output((1920, 1080, 0, 0), 0, mode='1920x1080'),
+                                            'B': make_output()}, maximum=(3000, 3000)))
+    with pytest.raises(TransitionError):
+        planner.plan((XRANDR, '--output', 'B', '--mode', '1920x1080', '--right-of', 'A'))
+
+
+def test_unreached_outputs():
+    randr_state = make_state({'A': make_output((1920, 1080, 0, 0), 0, mode='1920x1080'), 'B': make_output()})
+    assert get_unreached_outputs(randr_state, (XRANDR, '--output', 'A', '--mode', '1920x1080', '--rate', '60.00',
+                                               '--output', 'B', '--off')) == ()
+    assert get_unreached_outputs(randr_state, (XRANDR, '--output', 'A', '--mode', '1280x720',
+                                               '--output', 'B', '--mode', '1280x720')) == ('A', 'B')
+
+
+def test_target_layout_takes_the_size_of_a_custom_mode_from_its_name():
+    output = make_output()
+    output['modes'] = dict(MODES, **{'2560x1440_75.00': ['74.97']})
+    planner = TransitionPlanner(make_state({'A': output}))
+    layout_dict = planner.get_target_layout((XRANDR, '--output', 'A', '--mode', '2560x1440_75.00'))
+    assert layout_dict == {'A': (2560, 1440, 0, 0)}
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import randr
+
+# Xrandr flags placing an output relative to another output:
+RELATIVE_FLAGS = ('--left-of', '--right-of', '--same-as', '--above', '--below')
+
+
+class TransitionError(Exception):
+    """Raised, if the target layout can't be reached with the CRTCs or the maximum framebuffer size of the X screen.
+    """
+
+
+def parse_output_arguments(command):
+    """Splits the given Xrandr command tuple into the arguments of each output.
+    Returns a dict {port: list of arguments}, for example {'DP-0': ['--primary', '--mode', '1920x1080']}.
+    """
+    output_arguments_dict = {}
+    arguments = None
+    for index, argument in enumerate(command):
+        if index and command[index - 1] == '--output':
+            arguments = output_arguments_dict.setdefault(argument, [])
+        elif argument != '--output' and arguments is not None:
+            arguments.append(argument)
+    return output_arguments_dict
+
+
+def get_argument_value(arguments, flag):
+    """Returns the value following the given flag in the given argument list. Returns None, if the flag is missing.
+    """
+    if flag in arguments[:-1]:
+        return arguments[arguments.index(flag) + 1]
+    return None
+
+
+def set_argument_value(arguments, flag, value):
+    """Sets the value following the given flag in the given argument list. Appends flag and value, if the flag is
+    missing.
+    """
+    if flag in arguments[:-1]:
+        arguments[arguments.index(flag) + 1] = value
+    else:
+        arguments += [flag, value]
+
+
+def get_mode_size(resolution, rotation='normal'):
+    """Returns a tuple (width, height) of the given resolution string (e.g. '1920x1080', '1920x1080i' or
+    '1920x1080_60.00') as shown on screen with the given rotation.
+    Raises TransitionError, if the resolution string doesn't start with a size.
+    """
+    size = randr.get_resolution_size(resolution)
+    if size is None:
+        raise TransitionError(f'The size of the mode {resolution} is unknown.')
+    width, height = size
+    if rotation in ('left', 'right'):
+        return height, width
+    return width, height
+
+
+class TransitionPlanner(object):
+    """Plans the transition from the current RandR state to the layout of an Xrandr command. Knows the number of
+    CRTCs, the CRTCs each output can use and the maximum framebuffer size of the X screen. Rejects impossible target
+    layouts before any modeset and splits the transition into a safe sequence of Xrandr commands, if one command
+    might run out of CRTCs or exceed the maximum framebuffer size.
+    """
+    def __init__(self, randr_state=None):
+        self.randr_state = randr_state if randr_state is not None else randr.get_randr_state()
+
+    def get_target_layout(self, command):
+        """Returns a dict {port: geometry (width, height, x, y) or None if turned off} with the target layout of all
+        outputs after running the given Xrandr command. Outputs not mentioned in the command keep their current
+        geometry. Resolves the relative positions and moves the layout to the origin like Xrandr does.
+        """
+        outputs_dict = self.randr_state['outputs']
+        layout_dict = {port: output['geometry'] for port, output in outputs_dict.items()}
+        output_arguments_dict = parse_output_arguments(command)
+        relative_dict = {}
+        for port, arguments in output_arguments_dict.items():
+            if port not in outputs_dict:
+                raise TransitionError(f'Unknown output {port}.')
+            if '--off' in arguments:
+                layout_dict[port] = None
+                continue
+            current_geometry = outputs_dict[port]['geometry']
+            resolution = get_argument_value(arguments, '--mode') or outputs_dict[port]['mode']
+            if resolution is None:
+                raise TransitionError(f'No mode given for the output {port}.')
+            if resolution not in outputs_dict[port]['modes']:
+                raise TransitionError(f'The output {port} doesn\'t support the mode {resolution}.')
+            rotation = get_argument_value(arguments, '--rotate') or outputs_dict[port]['rotation']
+            width, height = get_mode_size(resolution, rotation)
+            position = get_argument_value(arguments, '--pos')
+            if position is not None:
+                x, y = (int(value) for value in position.split('x'))
+            elif current_geometry is not None:
+                x, y = current_geometry[2:]
+            else:
+                x, y = 0, 0
+            layout_dict[port] = (width, height, x, y)
+            for flag in RELATIVE_FLAGS:
+                if flag in arguments[:-1]:
+                    relative_dict[port] = (flag, get_argument_value(arguments, flag))
+
+        for _ in range(len(relative_dict)):
+            for port, (flag, relative_port) in relative_dict.items():
+                if layout_dict.get(relative_port) is None:
+                    raise TransitionError(f'The output {port} is placed relative to the disabled {relative_port}.')
+                width, height = layout_dict[port][:2]
+                relative_width, relative_height, relative_x, relative_y = layout_dict[relative_port]
+                position_dict = {
+                    '--left-of': (relative_x - width, relative_y),
+                    '--right-of': (relative_x + relative_width, relative_y),
+                    '--same-as': (relative_x, relative_y),
+                    '--above': (relative_x, relative_y - height),
+                    '--below': (relative_x, relative_y + relative_height)
+                                 }
+                layout_dict[port] = (width, height, *position_dict[flag])
+
+        enabled_layout = [geometry for geometry in layout_dict.values() if geometry is not None]
+        if enabled_layout:
+            min_x = min(geometry[2] for geometry in enabled_layout)
+            min_y = min(geometry[3] for geometry in enabled_layout)
+            for port, geometry in layout_dict.items():
+                if geometry is not None:
+                    layout_dict[port] = (*geometry[:2], geometry[2] - min_x, geometry[3] - min_y)
+        return layout_dict
+
+    @staticmethod
+    def get_framebuffer_size(geometries):
+        """Returns a tuple (width, height) of the framebuffer needed for the given output geometries.
+        """
+        geometries = [geometry for geometry in geometries if geometry is not None]
+        return (max((geometry[0] + geometry[2] for geometry in geometries), default=0),
+                max((geometry[1] + geometry[3] for geometry in geometries), default=0))
+
+    def assign_crtcs(self, port_tuple, fixed_crtc_dict=None):
+        """Assigns a CRTC to each of the given enabled outputs. Keeps the current CRTC of an output if possible.
+        The CRTCs of the given dict {port: crtc nr} (e.g. outputs the command doesn't touch) are fixed and neither
+        moved nor given to another output.
+        Returns a dict {port: crtc nr} including the fixed CRTCs. Raises TransitionError, if there is no valid
+        assignment.
+        """
+        outputs_dict = self.randr_state['outputs']
+        fixed_crtc_dict = fixed_crtc_dict or {}
+        crtc_owner_dict = {}
+
+        def try_assign(port, visited_crtcs):
+            current_crtc = outputs_dict[port]['crtc']
+            crtc_tuple = sorted(outputs_dict[port]['crtcs'], key=lambda crtc: crtc != current_crtc)
+            for crtc in crtc_tuple:
+                if crtc in visited_crtcs or crtc in fixed_crtc_dict.values():
+                    continue
+                visited_crtcs.add(crtc)
+                if crtc not in crtc_owner_dict or try_assign(crtc_owner_dict[crtc], visited_crtcs):
+                    crtc_owner_dict[crtc] = port
+                    return True
+            return False
+
+        crtc_need_count = len(set(port_tuple) | set(fixed_crtc_dict))
+        if crtc_need_count > self.randr_state['crtc_count']:
+            raise TransitionError(
+                f'{crtc_need_count} outputs need a CRTC, but there are only {self.randr_state["crtc_count"]} CRTCs.'
+                                  )
+        for port in port_tuple:
+            if port not in fixed_crtc_dict and not try_assign(port, set()):
+                raise TransitionError(f'No free CRTC usable by the output {port}.')
+        return {**{port: crtc for crtc, port in crtc_owner_dict.items()}, **fixed_crtc_dict}
+
+    def plan(self, command):
+        """Returns a tuple of Xrandr commands, which change into the layout of the given Xrandr command when run one
+        after another: outputs to turn off are disabled first, then the framebuffer is resized and the outputs are
+        enabled with explicitly assigned CRTCs. Returns only one command, if that's safe.
+        Raises TransitionError, if the target layout is impossible.
+        """
+        outputs_dict = self.randr_state['outputs']
+        maximum_width, maximum_height = self.randr_state['screen']['maximum']
+        layout_dict = self.get_target_layout(command)
+        output_arguments_dict = parse_output_arguments(command)
+
+        target_size = self.get_framebuffer_size(layout_dict.values())
+        if target_size[0] > maximum_width or target_size[1] > maximum_height:
+            raise TransitionError(
+                f'The layout needs a {target_size[0]}x{target_size[1]} framebuffer, '
+                f'but the maximum is {maximum_width}x{maximum_height}.'
+                                  )
+        enabled_port_tuple = tuple(port for port, geometry in layout_dict.items() if geometry is not None)
+        # outputs the command doesn't mention keep their CRTC, the command can't move them:
+        #
+        fixed_crtc_dict = {
+            port: outputs_dict[port]['crtc'] for port in enabled_port_tuple
+            if port not in output_arguments_dict and outputs_dict[port]['crtc'] is not None
+                           }
+        for port in enabled_port_tuple:
+            crtc = get_argument_value(output_arguments_dict.get(port, []), '--crtc')
+            if crtc is not None:
+                fixed_crtc_dict[port] = int(crtc)
+        crtc_dict = self.assign_crtcs(enabled_port_tuple, fixed_crtc_dict)
+
+        final_command = (command[0], '--fb', f'{target_size[0]}x{target_size[1]}')
+        for port, arguments in output_arguments_dict.items():
+            final_command += ('--output', port, *arguments)
+            if layout_dict[port] is None:
+                continue
+            if '--crtc' not in arguments:
+                final_command += ('--crtc', str(crtc_dict[port]))
+            # Xrandr keeps the current position of outputs without a position, which might lie outside the new
+            # framebuffer after the layout was moved to the origin:
+            #
+            if '--pos' not in arguments and not any(flag in arguments for flag in RELATIVE_FLAGS):
+                final_command += ('--pos', f'{layout_dict[port][2]}x{layout_dict[port][3]}')
+
+        disable_port_tuple = tuple(
+            port for port, geometry in layout_dict.items()
+            if geometry is None and outputs_dict[port]['geometry'] is not None
+                                   )
+        if not disable_port_tuple:
+            return final_command,
+
+        # one command is only safe, if the outputs to turn off don't block a CRTC needed by another output
+        # and the intermediate framebuffer of the old and new layout fits into the maximum size:
+        #
+        intermediate_size = self.get_framebuffer_size(
+            [outputs_dict[port]['geometry'] for port in disable_port_tuple] + list(layout_dict.values())
+                                                      )
+        blocked_crtcs = {outputs_dict[port]['crtc'] for port in disable_port_tuple}
+        if (intermediate_size[0] <= maximum_width and intermediate_size[1] <= maximum_height
+                and not blocked_crtcs.intersection(crtc_dict.values())):
+            return final_command,
+
+        disable_command = (command[0],)
+        for port in disable_port_tuple:
+            disable_command += ('--output', port, '--off')
+        return disable_command, final_command
+
+
+def get_unreached_outputs(randr_state, command):
+    """Compares the given RandR state with the target of the given Xrandr command. Returns a tuple of the ports of all
+    outputs, which aren't turned off or don't show the target mode and rate.
+    """
+    unreached_port_tuple = ()
+    for port, arguments in parse_output_arguments(command).items():
+        output = randr_state['outputs'].get(port)
+        if output is None:
+            unreached_port_tuple += (port,)
+        elif '--off' in arguments:
+            if output['geometry'] is not None:
+                unreached_port_tuple += (port,)
+        elif output['geometry'] is None:
+            unreached_port_tuple += (port,)
+        else:
+            resolution = get_argument_value(arguments, '--mode')
+            rate = get_argument_value(arguments, '--rate')
+            if resolution is not None and output['mode'] != resolution:
+                unreached_port_tuple += (port,)
+            elif rate is not None and (output['rate'] is None or abs(float(output['rate']) - float(rate)) > 0.05):
+                unreached_port_tuple += (port,)
+    return unreached_port_tuple
+
+
+def get_partial_command(command, port_tuple):
+    """Returns the part of the given Xrandr command, which only changes the outputs with the given ports.
+    """
+    partial_command = (command[0],)
+    for port, arguments in parse_output_arguments(command).items():
+        if port in port_tuple:
+            partial_command += ('--output', port, *arguments)
+    return partial_command
+
+
+def get_enabled_ports(command):
+    """Returns a tuple of the ports the given Xrandr command doesn't turn off.
+    """
+    return tuple(port for port, arguments in parse_output_arguments(command).items() if '--off' not in arguments)
+
+
+def get_provider_commands(command, randr_state, display_name=None):
+    """Returns a tuple of Xrandr commands, which set up the providers (GPUs) of the given X display (default: $DISPLAY)
+    not associated yet as output sinks (PRIME), if the given Xrandr command enables an output missing in the given RandR
+    state. The X server only lists the outputs of a provider after this, so which of them drives the output can't be
+    known before.
+    Returns an empty tuple without listing the providers, if all enabled outputs are listed.
+    """
+    if all(port in randr_state['outputs'] for port in get_enabled_ports(command)):
+        return ()
+    return tuple(
+        (command[0], *provider_arguments)
+        for provider_arguments in randr.get_provider_sink_commands(randr.get_providers(display_name))
+                 )
+
+
+def get_unused_provider_commands(command, randr_state, provider_command_tuple, display_name=None):
+    """Returns a tuple of Xrandr commands, which detach the providers set up by the given provider commands (see
+    'get_provider_commands') on the given X display (default: $DISPLAY), if they drive none of the outputs the given
+    Xrandr command enables. The outputs of the given RandR state, read after the setup, are mapped to their providers
+    with the output counts of the providers.
+    Returns an empty tuple, if the outputs can't be mapped.
+    """
+    set_up_id_set = {provider_command[2] for provider_command in provider_command_tuple}
+    provider_list = randr.get_providers(display_name)
+    port_provider_dict = randr.get_provider_ports(provider_list, tuple(randr_state['outputs']))
+    if not port_provider_dict:
+        return ()
+    used_provider_set = {port_provider_dict.get(port) for port in get_enabled_ports(command)}
+    return tuple(
+        (command[0], '--setprovideroutputsource', provider['id'], '0x0') for provider in provider_list
+        if provider['id'] in set_up_id_set and provider['index'] not in used_provider_set
+                 )
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import functools
+from pathlib import Path
+from PyQt5 import QtWidgets
+from PyQt5.QtGui import QCursor
+from asset_bundle import ASSETS
+import randr
+import auto_profiles
+from switch_queue import SwitchQueue
+from snapshot import undo_last_switch
+from config_store import ConfigCache
+from transition_planner import TransitionError
+from multi_mon import MultiMon, ScreenSetup, MODE_TUPLE, MODE_TOOL_TIP_TUPLE, load_screen_config, ask_to_keep_mode
+
+
+class MultiMonTray(QtWidgets.QSystemTrayIcon):
+    """Tray icon of MultiMon. Its menu lists the modes enabled in the Customize section with their layout icons and
+    checks the current mode. The menu and the Xrandr commands of all modes are prepared at start and after a change
+    of the conf file. The transitions from the current RandR state are planned, when the menu is shown, so choosing a
+    mode only reads the RandR state to check that it didn't change and runs the planned Xrandr commands.
+    The current mode is taken from a cached RandR state, which is read again only after a mode change or a screen
+    change reported by Qt.
+    """
+    def __init__(self, parent=None):
+        super().__init__(ASSETS.icon(Path('icons') / 'tray_icon.svg'), parent)
+        self.setToolTip('MultiMon')
+        self.config_cache = ConfigCache()
+        self.menu = QtWidgets.QMenu()
+        self.action_group = QtWidgets.QActionGroup(self.menu)
+        self.action_dict = {}
+        self.command_dict = {}
+        self.current_mode = None
+        self.randr_state_stale = True
+        self.build_menu()
+        self.setContextMenu(self.menu)
+        self.menu.aboutToShow.connect(self.update_menu)
+        self.activated.connect(self.show_menu_on_click)
+        app = QtWidgets.QApplication.instance()
+        for screen_signal in (app.screenAdded, app.screenRemoved, app.primaryScreenChanged):
+            screen_signal.connect(self.invalidate_randr_state)
+
+    def build_menu(self):
+        """Loads the screen setup from the conf file, prepares the Xrandr commands of the enabled modes and creates an
+        action with the layout icon for each of them.
+        """
+        self.config = self.config_cache.get_config()
+        self.tuples_all_screens = load_screen_config(self.config)
+        self.screen_setup = ScreenSetup(*self.tuples_all_screens, config=self.config)
+        type_list = [tuple_screen[3] for tuple_screen in self.tuples_all_screens]
+        icon_dir = MultiMon.get_icon_dir_name(self.config.getint('Screens', 'screen_count'), type_list)
+        self.menu.clear()
+        for action in self.action_group.actions():
+            self.action_group.removeAction(action)
+        self.action_dict = {}
+        self.command_dict = {}
+        possible_mode_tuple = self.screen_setup.get_possible_modes()
+        for mode, tool_tip in zip(MODE_TUPLE, MODE_TOOL_TIP_TUPLE):
+            if mode not in possible_mode_tuple or not self.config.getboolean('Customize', mode, fallback=False):
+                continue
+            self.command_dict[mode] = self.screen_setup.get_command_for_mode(mode)
+            action = self.menu.addAction(ASSETS.icon(icon_dir / f'{mode}.svg'), tool_tip)
+            action.setCheckable(True)
+            action.triggered.connect(functools.partial(self.switch_to_mode, mode))
+            self.action_group.addAction(action)
+            self.action_dict[mode] = action
+        self.menu.addSeparator()
+        self.menu.addAction('Quit').triggered.connect(QtWidgets.QApplication.quit)
+        self.invalidate_randr_state()
+
+    def invalidate_randr_state(self):
+        """Marks the cached RandR state as outdated, so it is read again before the menu is shown the next time.
+        """
+        self.randr_state_stale = True
+
+    def update_menu(self):
+        """Rebuilds the menu, if the conf file changed, checks the action of the current mode and plans the
+        transitions of all modes from the current RandR state.
+        """
+        if self.config_cache.is_changed():
+            self.build_menu()
+        if self.randr_state_stale:
+            randr_state = randr.get_randr_state()
+            self.current_mode = self.screen_setup.get_mode_from_randr_state(randr_state)
+            self.randr_state_stale = False
+            for command in self.command_dict.values():
+                try:
+                    self.screen_setup.get_plan(command, randr_state)
+                except TransitionError:
+                    continue
+        for mode, action in self.action_dict.items():
+            action.setChecked(mode == self.current_mode)
+
+    def show_menu_on_click(self, reason):
+        """Shows the menu on a left click too.
+        """
+        if reason == QtWidgets.QSystemTrayIcon.Trigger:
+            self.menu.popup(QCursor.pos())
+
+    def switch_to_mode(self, mode):
+        """Changes into the mode with the given label with its prepared Xrandr command and remembers it as auto profile
+        for the connected screens. The switch is queued behind a switch in progress of another MultiMon process.
+        """
+        switch_result = SwitchQueue().run_or_submit(
+            functools.partial(self.screen_setup.change_to_prepared_mode, mode, self.command_dict[mode]),
+            mode, self.tuples_all_screens
+                                                    )
+        if switch_result and not ask_to_keep_mode(self.config):
+            print(undo_last_switch())
+        elif switch_result:
+            auto_profiles.remember_mode(mode, self.tuples_all_screens)
+        elif switch_result is not None:
+            self.showMessage('MultiMon', str(switch_result), QtWidgets.QSystemTrayIcon.Warning)
+        self.invalidate_randr_state()
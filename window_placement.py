@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*
+
+import json
+import randr
+from switch_queue import get_runtime_file
+try:
+    from Xlib import X, error as xlib_error
+    from Xlib.protocol import request, event
+except ImportError:
+    xlib_error = None
+
+PLACEMENTS_NAME = 'windows.json'
+# _NET_MOVERESIZE_WINDOW flags: static gravity, x and y given, sent by a pager:
+MOVE_FLAGS = 10 | 1 << 8 | 1 << 9 | 2 << 12
+# _NET_WM_STATE actions:
+STATE_REMOVE = 0
+STATE_ADD = 1
+# window states, which have to be removed to move a window and are restored afterwards:
+STATE_NAME_TUPLE = ('_NET_WM_STATE_MAXIMIZED_VERT', '_NET_WM_STATE_MAXIMIZED_HORZ', '_NET_WM_STATE_FULLSCREEN')
+
+
+def get_output_at(randr_state, x, y):
+    """Returns the port of the enabled output of the given RandR state showing the given point of the X screen.
+    Returns None, if the point isn't shown on any output.
+    """
+    for port, output in randr_state['outputs'].items():
+        geometry = output['geometry']
+        if geometry is not None and geometry[2] <= x < geometry[2] + geometry[0] and \
+                geometry[3] <= y < geometry[3] + geometry[1]:
+            return port
+    return None
+
+
+class WindowPlacements(object):
+    """Placements of all client windows (EWMH _NET_CLIENT_LIST) on the outputs, read and restored over one python-xlib
+    connection. All requests of one pass are sent at once and their replies read afterwards, so recording or restoring
+    hundreds of windows costs about one round-trip to the X server.
+    The placements are saved in the runtime directory: {window id: {'output': port, 'x': x, 'y': y, 'states': tuple of
+    state names}} with the position relative to the output.
+    """
+    def __init__(self, display, display_name=None):
+        self.display = display
+        self.root = display.screen().root
+        self.placements_file = get_runtime_file(PLACEMENTS_NAME, display_name)
+        self.atom_dict = {
+            name: display.intern_atom(name)
+            for name in ('_NET_CLIENT_LIST', '_NET_WM_STATE', '_NET_MOVERESIZE_WINDOW', *STATE_NAME_TUPLE)
+                          }
+
+    def load(self):
+        """Returns the saved placements. Returns an empty dict, if there are none.
+        """
+        try:
+            with self.placements_file.open('r') as placements_file:
+                return json.load(placements_file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, placement_dict):
+        """Saves the given placements.
+        """
+        temp_file = self.placements_file.with_name(f'{self.placements_file.name}.tmp')
+        try:
+            with temp_file.open('w') as placements_file:
+                json.dump(placement_dict, placements_file)
+            temp_file.replace(self.placements_file)
+        except OSError as error:
+            print(f'Could not save the window placements: {error}')
+
+    def get_client_windows(self):
+        """Returns a list of the ids of all client windows managed by the window manager.
+        """
+        client_list = self.root.get_full_property(self.atom_dict['_NET_CLIENT_LIST'], X.AnyPropertyType)
+        return list(client_list.value) if client_list is not None else []
+
+    def query_windows(self, window_id_list):
+        """Returns a dict {window id: (x, y, width, height, state names)} with the position of the client area of all
+        given windows on the X screen. Sends all requests before reading the first reply. Windows closed in the
+        meantime are left out.
+        """
+        request_list = []
+        for window_id in window_id_list:
+            request_list.append((
+                window_id,
+                request.TranslateCoords(display=self.display.display, defer=True, src_wid=window_id,
+                                        dst_wid=self.root.id, src_x=0, src_y=0),
+                request.GetGeometry(display=self.display.display, defer=True, drawable=window_id),
+                request.GetProperty(display=self.display.display, defer=True, delete=False, window=window_id,
+                                    property=self.atom_dict['_NET_WM_STATE'], type=X.AnyPropertyType,
+                                    long_offset=0, long_length=32)
+                                ))
+        self.display.flush()
+        state_name_dict = {self.atom_dict[name]: name for name in STATE_NAME_TUPLE}
+        window_dict = {}
+        for window_id, translate_request, geometry_request, state_request in request_list:
+            try:
+                translate_request.reply()
+                geometry_request.reply()
+                state_request.reply()
+            except xlib_error.XError:
+                continue
+            state_tuple = tuple(
+                state_name_dict[atom] for atom in (state_request.value or ()) if atom in state_name_dict
+                                )
+            window_dict[window_id] = (translate_request.x, translate_request.y,
+                                      geometry_request.width, geometry_request.height, state_tuple)
+        return window_dict
+
+    def record(self, randr_state):
+        """Records the output and position of all client windows in the given RandR state before a switch.
+        Keeps the recorded placement of windows, whose output is turned off, because the window manager moved them
+        away from it and they shall return to it.
+        """
+        outputs_dict = randr_state['outputs']
+        old_placement_dict = self.load()
+        placement_dict = {}
+        for window_id, (x, y, width, height, state_tuple) in self.query_windows(self.get_client_windows()).items():
+            old_placement = old_placement_dict.get(str(window_id))
+            if old_placement is not None and outputs_dict.get(old_placement['output'], {}).get('geometry') is None:
+                placement_dict[str(window_id)] = old_placement
+                continue
+            port = get_output_at(randr_state, x + width//2, y + height//2)
+            if port is None:
+                continue
+            geometry = outputs_dict[port]['geometry']
+            placement_dict[str(window_id)] = {'output': port, 'x': x - geometry[2], 'y': y - geometry[3],
+                                              'states': state_tuple}
+        self.save(placement_dict)
+
+    def send_client_message(self, window_id, message_type, data):
+        """Queues a client message to the window manager about the given window. Doesn't flush.
+        """
+        client_message = event.ClientMessage(window=window_id, client_type=message_type, data=(32, data))
+        self.root.send_event(client_message, event_mask=X.SubstructureRedirectMask | X.SubstructureNotifyMask)
+
+    def restore(self, randr_state):
+        """Moves all client windows back to their recorded output, if it is enabled in the given RandR state after a
+        switch and the window isn't on it. Sends all requests in one batch.
+        Returns the number of moved windows.
+        """
+        outputs_dict = randr_state['outputs']
+        placement_dict = self.load()
+        moved_count = 0
+        window_dict = self.query_windows([int(window_id) for window_id in placement_dict])
+        for window_id, (x, y, width, height, state_tuple) in window_dict.items():
+            placement = placement_dict[str(window_id)]
+            geometry = outputs_dict.get(placement['output'], {}).get('geometry')
+            if geometry is None or get_output_at(randr_state, x + width//2, y + height//2) == placement['output']:
+                continue
+            state_atom_list = [self.atom_dict[state_name] for state_name in placement['states']]
+            for index in range(0, len(state_atom_list), 2):
+                self.send_client_message(window_id, self.atom_dict['_NET_WM_STATE'],
+                                         [STATE_REMOVE, *(state_atom_list[index:index + 2] + [0])[:2], 2, 0])
+            self.send_client_message(
+                window_id, self.atom_dict['_NET_MOVERESIZE_WINDOW'],
+                [MOVE_FLAGS, geometry[2] + placement['x'], geometry[3] + placement['y'], 0, 0]
+                                     )
+            for index in range(0, len(state_atom_list), 2):
+                self.send_client_message(window_id, self.atom_dict['_NET_WM_STATE'],
+                                         [STATE_ADD, *(state_atom_list[index:index + 2] + [0])[:2], 2, 0])
+            moved_count += 1
+        self.display.flush()
+        return moved_count
+
+    def close(self):
+        """Closes the connection to the X server.
+        """
+        self.display.close()
+
+
+def open_window_placements(display_name=None):
+    """Returns the WindowPlacements of the given X display (default: $DISPLAY) with a new connection to the X server,
+    which the caller closes (see 'WindowPlacements.close'). Returns None, if python-xlib isn't installed or there is no
+    connection to the X server.
+    """
+    if xlib_error is None:
+        return None
+    try:
+        display = randr.open_x_display(display_name)
+    except (OSError, xlib_error.DisplayError):
+        return None
+    return WindowPlacements(display, display_name) if display is not None else None